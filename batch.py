@@ -0,0 +1,285 @@
+"""
+batch.py
+
+This module plays thousands of games at once, for training and evaluating bots.
+
+A BatchGame holds K games on one shared maze template as arrays: one entry per
+game for the hero's position, stats, coins and potions, and one bitmap row per
+game of the cells it has emptied. step takes one action per game and advances
+every game in a handful of NumPy operations, following the same rules as
+GameEngine.step. Given dice.combat_dice of the games' seeds, fights are rolled
+as in a stochastic GameEngine with the same seed.
+
+Actions and modes are small integers. ACTIONS lists the action names in order
+of their numbers, so ACTIONS.index("right") is the number of the "right" action.
+"""
+import numpy as np
+
+from combat import HERO_WINS, MONSTER_WINS, attack_damage, roll_fights
+from game_engine import DIRECTIONS, STATS
+from game_model import HealingPotion, Shopkeeper
+from maze import MONSTER, CHEST, POTION, SHOPKEEPER
+from population import MONSTER_ACCURACY
+
+# Action numbers: the moves come first, in DIRECTIONS order
+ACTIONS = tuple(DIRECTIONS) + ("heal", "quit", "potion") + STATS + ("leave",)
+HEAL, QUIT, BUY_POTION = ACTIONS.index("heal"), ACTIONS.index("quit"), ACTIONS.index("potion")
+LEAVE = ACTIONS.index("leave")
+UPGRADES = tuple(ACTIONS.index(stat) for stat in STATS)
+
+# Modes
+MAZE_MODE = 0
+SHOP_MODE = 1
+
+# Outcomes
+PLAYING = 0
+WON = 1
+LOST = 2
+QUIT_GAME = 3
+OUTCOMES = (None, "won", "lost", "quit")
+
+# Which actions each mode accepts, by action number
+MAZE_ACCEPTS = np.array([action in DIRECTIONS or action in ("heal", "quit") for action in ACTIONS])
+SHOP_ACCEPTS = ~MAZE_ACCEPTS | (np.array(ACTIONS) == "quit")
+
+# Row and column change of each action (zero for those that are not moves)
+ROW_STEP = np.array([DIRECTIONS[action][0] if action in DIRECTIONS else 0 for action in ACTIONS])
+COL_STEP = np.array([DIRECTIONS[action][1] if action in DIRECTIONS else 0 for action in ACTIONS])
+
+POTION_EFFECT = HealingPotion().effect
+PRICES = Shopkeeper().store
+HERO_FIELDS = ("health", "max_health", "power", "accuracy", "defence", "stealth", "coins", "potions")
+
+
+class BatchGame(object):
+    """K games on the same maze, stepped together.
+
+    Games that are over ignore their actions until reset. Invalid actions are
+    ignored and, as in GameEngine, do not count as turns.
+
+    Attributes:
+        maze (Maze): The shared maze template
+        size (int): Number of games, K
+        goal (tuple): The (row, col) cell that wins
+        row, col (numpy.ndarray): The hero's position in each game
+        mode (numpy.ndarray): MAZE_MODE or SHOP_MODE
+        health, max_health, power (numpy.ndarray): float64 hero stats
+        accuracy, defence, stealth (numpy.ndarray): int64 hero stats
+        coins, potions, turns (numpy.ndarray): int64 counters
+        outcome (numpy.ndarray): PLAYING, WON, LOST or QUIT_GAME
+        cleared (numpy.ndarray): uint8 bitmaps of shape (K, ceil(cells / 8)), a
+            set bit for every cell the game has emptied
+        dice (dice.BlockRNG): The combat dice, one lane per game, or None for
+            fights without chance
+    """
+
+    def __init__(self, maze, heroes, size=None, goal=None, dice=None):
+        """Start K new games.
+
+        Args:
+            maze (Maze): The maze template
+            heroes: One Character to copy into every game, or a list of K of them
+            size (int): Number of games, if heroes is a single Character
+            goal (tuple): The winning cell. Defaults to the bottom-right corner.
+            dice (dice.BlockRNG): Combat dice with one lane per game, to roll
+                fights as GameEngine(stochastic=True) does. Resetting a game does
+                not rewind its lane.
+        """
+        if not isinstance(heroes, (list, tuple)):
+            heroes = [heroes] * (size or 1)
+        self.maze = maze
+        self.size = len(heroes)
+        self.goal = goal if goal is not None else (maze.rows - 1, maze.cols - 1)
+        if dice is not None and dice.lanes != self.size:
+            raise ValueError(f"{self.size} games need {self.size} lanes of dice, not {dice.lanes}")
+        self.dice = dice
+        self._kinds = maze.kinds.reshape(-1)
+        monsters = maze.monsters
+        self._monster_health = monsters.health.astype(np.float64)
+        self._monster_power = monsters.power.astype(np.float64)
+        self._monster_defence = monsters.defence.astype(np.float64)
+        self._monster_stealth = monsters.stealth.astype(np.float64)
+        self._chest_coins = maze.chest_coins.astype(np.int64)
+        self._start = {field: np.array([getattr(hero, field) for hero in heroes],
+                                       dtype=np.float64 if field in ("health", "max_health", "power") else np.int64)
+                       for field in HERO_FIELDS}
+        self.cleared = np.zeros((self.size, -(-maze.rows * maze.cols // 8)), dtype=np.uint8)
+        self.reset()
+
+    def reset(self, games=None):
+        """Start some games, or all of them, again from the beginning.
+
+        Args:
+            games: Index, boolean mask or slice of the games to reset. Defaults to all.
+        """
+        if games is None:
+            games = slice(None)
+            for field in ("row", "col", "mode", "turns", "outcome"):
+                setattr(self, field, np.zeros(self.size, dtype=np.int64))
+            for field, values in self._start.items():
+                setattr(self, field, values.copy())
+        else:
+            for field in ("row", "col", "mode", "turns", "outcome"):
+                getattr(self, field)[games] = 0
+            for field, values in self._start.items():
+                getattr(self, field)[games] = values[games]
+        self.cleared[games] = 0
+
+    @property
+    def done(self):
+        """Whether each game is over."""
+        return self.outcome != PLAYING
+
+    def observation(self) -> dict:
+        """Return every game's state, one array per field of GameEngine.observation.
+
+        The arrays are the games' own; copy them to keep them past the next step.
+        """
+        return {
+            "row": self.row,
+            "col": self.col,
+            "mode": self.mode,
+            "health": self.health,
+            "max_health": self.max_health,
+            "accuracy": self.accuracy,
+            "defence": self.defence,
+            "stealth": self.stealth,
+            "coins": self.coins,
+            "potions": self.potions,
+            "turns": self.turns,
+            "outcome": self.outcome,
+        }
+
+    def is_cleared(self, games, cells):
+        """Return whether each given game has emptied the given cell (flat index)."""
+        return (self.cleared[games, cells >> 3] >> (cells & 7)) & 1 == 1
+
+    def step(self, actions):
+        """Apply one action to every game.
+
+        Args:
+            actions (numpy.ndarray): K action numbers, see ACTIONS
+
+        Returns:
+            tuple: (observation, reward, done). reward is 1 for games won by this
+                step, -1 for games lost, 0 otherwise.
+        """
+        actions = np.asarray(actions)
+        playing = self.outcome == PLAYING
+        in_shop = self.mode == SHOP_MODE
+        valid = playing & np.where(in_shop, SHOP_ACCEPTS[actions], MAZE_ACCEPTS[actions])
+        self.turns += valid
+        reward = np.zeros(self.size, dtype=np.int64)
+
+        quitting = valid & (actions == QUIT)
+        self.outcome[quitting] = QUIT_GAME
+        self.mode[quitting] = MAZE_MODE
+
+        self._heal(np.flatnonzero(valid & (actions == HEAL)))
+        self._shop(valid & in_shop, actions)
+        self._move(valid & ~in_shop & (actions < len(DIRECTIONS)), actions, reward)
+        return self.observation(), reward, self.done
+
+    def _heal(self, games):
+        """Drink a potion in each game that has one and is hurt."""
+        drinking = games[(self.potions[games] > 0) & (self.health[games] < self.max_health[games])]
+        self.health[drinking] = np.minimum(self.health[drinking] + POTION_EFFECT, self.max_health[drinking])
+        self.potions[drinking] -= 1
+
+    def _shop(self, shopping, actions):
+        """Apply the shop actions of the games at a shopkeeper."""
+        leaving = shopping & (actions == LEAVE)
+        self.mode[leaving] = MAZE_MODE
+
+        buying = np.flatnonzero(shopping & (actions == BUY_POTION))
+        buying = buying[self.coins[buying] >= PRICES["healing_potion"]]
+        self.potions[buying] += 1
+        self.coins[buying] -= PRICES["healing_potion"]
+
+        for stat, action in zip(STATS, UPGRADES):
+            values = getattr(self, stat)
+            upgrading = np.flatnonzero(shopping & (actions == action))
+            price = PRICES[f"{stat}_boost"]
+            upgrading = upgrading[(self.coins[upgrading] >= price) & (values[upgrading] < 10)]
+            values[upgrading] += 1
+            self.coins[upgrading] -= price
+
+    def _move(self, moving, actions, reward):
+        """Move the heroes and resolve the cells they enter."""
+        games = np.flatnonzero(moving)
+        new_row = self.row[games] + ROW_STEP[actions[games]]
+        new_col = self.col[games] + COL_STEP[actions[games]]
+        inside = (new_row >= 0) & (new_row < self.maze.rows) & (new_col >= 0) & (new_col < self.maze.cols)
+        games, new_row, new_col = games[inside], new_row[inside], new_col[inside]
+        self.row[games] = new_row
+        self.col[games] = new_col
+
+        won = (new_row == self.goal[0]) & (new_col == self.goal[1])
+        self.outcome[games[won]] = WON
+        reward[games[won]] = 1
+        games = games[~won]
+        cells = new_row[~won] * self.maze.cols + new_col[~won]
+        kinds = np.where(self.is_cleared(games, cells), 0, self._kinds[cells])
+
+        found = kinds == CHEST
+        slots = np.searchsorted(self.maze.chest_cells, cells[found])
+        self.coins[games[found]] += self._chest_coins[slots]
+        self._clear(games[found], cells[found])
+
+        found = kinds == POTION
+        self.potions[games[found]] += 1
+        self._clear(games[found], cells[found])
+
+        self.mode[games[kinds == SHOPKEEPER]] = SHOP_MODE
+
+        found = kinds == MONSTER
+        self._fight(games[found], cells[found], reward)
+
+    def _fight(self, games, cells, reward):
+        """Fight the monster in each game's cell, as resolve_fight does."""
+        slots = np.searchsorted(self.maze.monster_cells, cells)
+        hero = {"power": self.power[games], "accuracy": self.accuracy[games],
+                "defence": self.defence[games], "stealth": self.stealth[games]}
+        monster = {"power": self._monster_power[slots], "accuracy": MONSTER_ACCURACY,
+                   "defence": self._monster_defence[slots], "stealth": self._monster_stealth[slots]}
+        if self.dice is not None:
+            self._roll_fight(games, cells, slots, hero, monster, reward)
+            return
+        hero_damage = attack_damage(hero, monster)
+        monster_damage = attack_damage(monster, hero)
+
+        # Neither side can hurt the other: the monster stays and nothing happens
+        fighting = (hero_damage != 0) | (monster_damage != 0)
+        games, cells = games[fighting], cells[fighting]
+        hero_damage, monster_damage = hero_damage[fighting], monster_damage[fighting]
+        hero_health = self.health[games]
+        with np.errstate(divide="ignore"):
+            hero_hits = np.ceil(self._monster_health[slots[fighting]] / hero_damage)
+            monster_hits = np.ceil(hero_health / monster_damage)
+        hero_wins = hero_hits <= monster_hits
+
+        winners = games[hero_wins]
+        self.health[winners] = hero_health[hero_wins] - (hero_hits[hero_wins] - 1) * monster_damage[hero_wins]
+        self._clear(winners, cells[hero_wins])
+        losers = games[~hero_wins]
+        self.health[losers] = 0
+        self.outcome[losers] = LOST
+        reward[losers] = -1
+
+    def _roll_fight(self, games, cells, slots, hero, monster, reward):
+        """Fight the monsters with dice, as roll_fight does, on each game's lane."""
+        hero["health"] = self.health[games]
+        monster["health"] = self._monster_health[slots]
+        results = roll_fights(hero, monster, self.dice, games)
+
+        won = results.outcome == HERO_WINS
+        self.health[games[won]] = results.hero_health[won]
+        self._clear(games[won], cells[won])
+        losers = games[results.outcome == MONSTER_WINS]
+        self.health[losers] = 0
+        self.outcome[losers] = LOST
+        reward[losers] = -1
+
+    def _clear(self, games, cells):
+        """Mark cells as emptied, one per game."""
+        self.cleared[games, cells >> 3] |= (1 << (cells & 7)).astype(np.uint8)
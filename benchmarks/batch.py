@@ -0,0 +1,49 @@
+"""
+batch.py
+
+Benchmark for batch.BatchGame.
+
+Steps K games in lockstep with random moves, restarting games as they finish,
+and reports game steps per second. With "dice", fights are rolled with combat
+dice instead of worked out in one go.
+
+Usage:
+    python -m benchmarks.batch [games] [steps] [maze size] [dice]
+"""
+import sys
+import time
+
+import numpy as np
+
+from batch import BatchGame
+from dice import combat_dice
+from game_engine import DIRECTIONS
+from game_model import Warrior
+from maze import generate_maze
+
+
+def bench_batch(games=100000, steps=50, size=32, seed=0, stochastic=False):
+    """Step a batch of games with random moves.
+
+    Returns:
+        dict: games, steps, seconds and steps_per_sec (game steps, i.e. games x steps)
+    """
+    dice = combat_dice(range(seed, seed + games)) if stochastic else None
+    batch = BatchGame(generate_maze(size, size, seed=seed), Warrior("Bench"), size=games, dice=dice)
+    actions = np.random.default_rng(seed).integers(0, len(DIRECTIONS), (steps, games))
+    start = time.perf_counter()
+    for step_actions in actions:
+        _, _, done = batch.step(step_actions)
+        if done.any():
+            batch.reset(done)
+    seconds = time.perf_counter() - start
+    return {"games": games, "steps": steps, "seconds": seconds, "steps_per_sec": games * steps / seconds}
+
+
+if __name__ == "__main__":
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    size = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+    result = bench_batch(games, steps, size, stochastic=sys.argv[4:5] == ["dice"])
+    print(f"{result['games']:,} games x {result['steps']} steps in {result['seconds']:.2f}s: "
+          f"{result['steps_per_sec']:,.0f} game steps/s")
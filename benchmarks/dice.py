@@ -0,0 +1,89 @@
+"""
+dice.py
+
+Benchmark for stochastic combat with block dice.
+
+Rolls the same fights three ways and reports fights per second for each:
+game_engine.roll_fight drawing a round of rolls at a time from a BlockRNG,
+combat.roll_fights rolling every fight in a batch together, and, as a baseline,
+the same rules calling random.random() once per roll.
+
+Usage:
+    python -m benchmarks.dice [fights]
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+from combat import roll_fights, roll_monsters, stat_block
+from dice import combat_dice
+from game_engine import CRITICAL_CHANCE, GLANCING_CHANCE, MAX_ROUNDS, roll_fight
+from game_model import Monster, Warrior
+
+
+def roll_fight_per_roll(hero, enemy, rng):
+    """The rules of roll_fight with one random() call per roll, for comparison."""
+    hero_health, enemy_health = hero.health, enemy.health
+    for _ in range(MAX_ROUNDS):
+        for attacker, defender in ((hero, enemy), (enemy, hero)):
+            if rng.random() < attacker.accuracy / 10 and rng.random() >= defender.dodge_chance():
+                tier = rng.random()
+                damage = attacker.power * (1.5 if tier < CRITICAL_CHANCE else 0.5 if tier >= 1 - GLANCING_CHANCE else 1)
+            else:
+                rng.random()
+                damage = 0
+            if attacker is hero:
+                enemy_health = max(enemy_health - damage, 0)
+                if enemy_health <= 0:
+                    return "hero"
+            else:
+                hero_health = max(hero_health - damage, 0)
+                if hero_health <= 0:
+                    return "enemy"
+    return None
+
+
+def bench_dice(fights=100000, seed=0):
+    """Roll a Warrior's fights against random monsters.
+
+    Returns:
+        dict: fights, and fights per second for "scalar", "batch" and "per_roll"
+    """
+    monster_stats = roll_monsters(fights, np.random.default_rng(seed))
+    monsters = []
+    for i in range(fights):
+        monster = Monster("Bench")
+        monster.max_health = monster.health = monster_stats["health"][i]
+        for field in ("power", "defence", "stealth"):
+            setattr(monster, field, int(monster_stats[field][i]))
+        monsters.append(monster)
+    hero = Warrior("Bench")
+
+    dice = combat_dice([seed])
+    start = time.perf_counter()
+    for monster in monsters:
+        roll_fight(hero, monster, dice)
+    scalar = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for monster in monsters:
+        roll_fight_per_roll(hero, monster, rng)
+    per_roll = time.perf_counter() - start
+
+    lanes = np.arange(fights)
+    dice = combat_dice(range(fights))
+    start = time.perf_counter()
+    roll_fights(stat_block([hero]), monster_stats, dice, lanes)
+    batch = time.perf_counter() - start
+    return {"fights": fights, "scalar": fights / scalar, "batch": fights / batch,
+            "per_roll": fights / per_roll}
+
+
+if __name__ == "__main__":
+    fights = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    result = bench_dice(fights)
+    print(f"{result['fights']:,} fights: {result['scalar']:,.0f}/s scalar, {result['batch']:,.0f}/s batch, "
+          f"{result['per_roll']:,.0f}/s with a random() call per roll")
@@ -0,0 +1,49 @@
+"""
+maze_generation.py
+
+Benchmark for maze.generate_maze.
+
+Generates square mazes of 1e4, 1e6 and 1e8 cells and reports the time taken,
+the generation rate and the memory used per cell.
+
+Usage:
+    python -m benchmarks.maze_generation [cells ...]
+"""
+import math
+import sys
+import time
+
+from maze import generate_maze
+
+SIZES = (10**4, 10**6, 10**8)
+
+
+def bench_generate(cells, seed=0):
+    """Generate one square maze with about the given number of cells.
+
+    Args:
+        cells (int): Number of cells
+        seed (int): Seed for the generator
+
+    Returns:
+        dict: cells, seconds, cells_per_sec, bytes_per_cell
+    """
+    side = math.isqrt(cells)
+    start = time.perf_counter()
+    maze = generate_maze(side, side, seed=seed)
+    seconds = time.perf_counter() - start
+    cells = side * side
+    return {
+        "cells": cells,
+        "seconds": seconds,
+        "cells_per_sec": cells / seconds,
+        "bytes_per_cell": maze.nbytes / cells,
+    }
+
+
+if __name__ == "__main__":
+    sizes = [int(float(arg)) for arg in sys.argv[1:]] or SIZES
+    for cells in sizes:
+        result = bench_generate(cells)
+        print(f"{result['cells']:>12,} cells: {result['seconds']:8.3f}s "
+              f"({result['cells_per_sec']:,.0f} cells/s, {result['bytes_per_cell']:.2f} bytes/cell)")
@@ -0,0 +1,52 @@
+"""
+mcts.py
+
+Benchmark for the Monte Carlo tree search bot in mcts.py.
+
+Plays one game with MCTSPolicy and reports the simulated games and engine steps
+per second of search. Most of those steps are rollouts, so this also measures
+the engine's per-step throughput on clones.
+
+Usage:
+    python -m benchmarks.mcts [maze size] [budget per move] [workers]
+"""
+import random
+import sys
+import time
+
+from game_model import Mage
+from game_engine import GameEngine, TurnScheduler
+from maze import generate_maze
+from mcts import MCTSPolicy
+
+
+def bench_mcts(size=12, budget=0.05, workers=0, seed=0, max_turns=200):
+    """Play one game with the MCTS bot.
+
+    Returns:
+        dict: outcome, turns, seconds, iterations_per_sec and steps_per_sec
+    """
+    engine = GameEngine(Mage("Bench"), generate_maze(size, size, seed=seed))
+    bot = MCTSPolicy(random.Random(seed), budget=budget, workers=workers)
+    start = time.perf_counter()
+    try:
+        TurnScheduler(engine, bot).run(max_ticks=max_turns)
+    finally:
+        bot.close()
+    seconds = time.perf_counter() - start
+    return {
+        "outcome": engine.outcome,
+        "turns": engine.turns,
+        "seconds": seconds,
+        "iterations_per_sec": bot.iterations / seconds,
+        "steps_per_sec": bot.steps / seconds,
+    }
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    result = bench_mcts(size, budget, workers)
+    print(f"{result['outcome']} in {result['turns']} turns, {result['seconds']:.2f}s: "
+          f"{result['iterations_per_sec']:,.0f} simulated games/s, {result['steps_per_sec']:,.0f} steps/s")
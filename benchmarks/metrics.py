@@ -0,0 +1,60 @@
+"""
+metrics.py
+
+Benchmark for the cost of metrics.Metrics.
+
+Plays the same scripted games with metrics uninstalled and installed, reports
+steps per second for both, and lists the phases by the time spent in them.
+
+Usage:
+    python -m benchmarks.metrics [games]
+"""
+import random
+import sys
+import time
+
+from game_engine import GameEngine
+from game_model import Warrior
+from maze import generate_maze
+from metrics import Metrics
+from policies import GreedyPolicy
+
+
+def play(maze, games):
+    """Play scripted games on a maze, returning the number of steps taken."""
+    steps = 0
+    for seed in range(games):
+        engine = GameEngine(Warrior("Bench"), maze, verbose=True, seed=seed)
+        policy = GreedyPolicy(random.Random(seed))
+        while not engine.done and engine.turns < 500:
+            engine.step(policy(engine))
+        steps += engine.turns
+    return steps
+
+
+def bench_metrics(games=200, size=32, seed=0):
+    """Play scripted games without and with metrics.
+
+    Returns:
+        dict: steps_per_sec_off, steps_per_sec_on, overhead (fraction of the time
+            without metrics) and phases (phase, seconds) from the run with metrics
+    """
+    maze = generate_maze(size, size, seed=seed)
+    play(maze, 5)
+    start = time.perf_counter()
+    steps = play(maze, games)
+    off = time.perf_counter() - start
+    with Metrics() as metrics:
+        start = time.perf_counter()
+        play(maze, games)
+        on = time.perf_counter() - start
+    return {"steps_per_sec_off": steps / off, "steps_per_sec_on": steps / on, "overhead": on / off - 1,
+            "phases": metrics.dominant_phases()}
+
+
+if __name__ == "__main__":
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    result = bench_metrics(games)
+    print(f"{result['steps_per_sec_off']:,.0f} steps/s without metrics, {result['steps_per_sec_on']:,.0f} with "
+          f"({result['overhead']:+.1%})")
+    print("time by phase: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in result["phases"]))
@@ -0,0 +1,69 @@
+"""
+pathfinding.py
+
+Benchmark for pathfinding.find_path and pathfinding.DistanceField.
+
+On a square maze, reports the time to cost every cell, to answer one A* query
+from corner to corner, to build the distance field, to read a route off it, and
+the mean time of an incremental update after a monster is slain.
+
+Usage:
+    python -m benchmarks.pathfinding [side] [updates]
+"""
+import sys
+import time
+
+from game_model import Warrior
+from maze import generate_maze
+from pathfinding import DistanceField, cell_costs, find_path
+
+
+def timed(function, *args, **kwargs):
+    """Call a function and return (result, seconds)."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_pathfinding(side=1000, updates=1000, seed=0):
+    """Time each pathfinding operation on one maze.
+
+    Args:
+        side (int): Width and height of the maze
+        updates (int): Number of monsters to slay, one update each
+        seed (int): Seed for the maze
+
+    Returns:
+        dict: cells, costs_s, astar_s, field_s, route_s and update_us
+    """
+    maze = generate_maze(side, side, seed=seed)
+    hero = Warrior("Bench")
+    view = maze.session()
+    costs, costs_seconds = timed(cell_costs, view, hero)
+    _, astar_seconds = timed(find_path, view, hero, costs=costs)
+    field, field_seconds = timed(DistanceField, view, hero)
+    _, route_seconds = timed(field.route, 0, 0)
+
+    cells = [divmod(int(index), side) for index in maze.monster_cells[:updates]]
+    start = time.perf_counter()
+    for row, col in cells:
+        view.clear(row, col)
+        field.update(row, col)
+    update_seconds = time.perf_counter() - start
+    return {
+        "cells": side * side,
+        "costs_s": costs_seconds,
+        "astar_s": astar_seconds,
+        "field_s": field_seconds,
+        "route_s": route_seconds,
+        "update_us": update_seconds / max(len(cells), 1) * 1e6,
+    }
+
+
+if __name__ == "__main__":
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    result = bench_pathfinding(side, updates)
+    print(f"{result['cells']:,} cells: costs {result['costs_s']:.3f}s, A* {result['astar_s']:.3f}s, "
+          f"field {result['field_s']:.3f}s, route {result['route_s'] * 1000:.2f}ms, "
+          f"update {result['update_us']:.1f}us")
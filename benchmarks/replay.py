@@ -0,0 +1,144 @@
+"""
+replay.py
+
+Benchmark for the binary replay logs in replay.py.
+
+Records scripted games into one log per game, then reports the log size per
+action, how fast logs are written and parsed, and how fast they are replayed.
+Then records one long session and reports how fast it is parsed and replayed,
+against REPLAY_TARGET actions per second. The exit status is 1 if the long log
+replays slower than that.
+
+Usage:
+    python -m benchmarks.replay [games] [long log actions]
+"""
+import io
+import random
+import sys
+import time
+
+from game_engine import DIRECTIONS, SHOP, GameEngine
+from game_interface import UNDO_LEVELS
+from game_model import Warrior
+from maze import MONSTER, default_maze
+from policies import GreedyPolicy
+from replay import ReplayWriter, parse
+
+# Actions per second a long log must replay at
+REPLAY_TARGET = 1_000_000
+
+
+def record(games, turns=500):
+    """Play scripted games on the default maze, returning the actions of each."""
+    maze = default_maze(0)
+    scripts = []
+    for seed in range(games):
+        engine = GameEngine(Warrior("Bench"), maze, seed=seed)
+        policy = GreedyPolicy(random.Random(seed))
+        actions = []
+        while not engine.done and engine.turns < turns:
+            action = policy(engine)
+            actions.append(action)
+            engine.step(action)
+        scripts.append(actions)
+    return scripts
+
+
+def bench_replay(games=200):
+    """Write, parse and replay the logs of scripted games.
+
+    Returns:
+        dict: actions, bytes_per_action, writes_per_sec and parses_per_sec (actions
+            per second), and replays_per_sec (actions replayed per second)
+    """
+    scripts = record(games)
+    actions = sum(len(script) for script in scripts)
+
+    start = time.perf_counter()
+    logs = []
+    for seed, script in enumerate(scripts):
+        file = io.BytesIO()
+        log = ReplayWriter(file)
+        log.game(0, seed)
+        log.hero(Warrior("Bench"))
+        for action in script:
+            log.action(action)
+        log.flush()
+        logs.append(file.getvalue())
+    write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    replays = [parse(data) for data in logs]
+    read = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for replay in replays:
+        replay.play()
+    play = time.perf_counter() - start
+    return {"actions": actions, "bytes_per_action": sum(map(len, logs)) / actions,
+            "writes_per_sec": actions / write, "parses_per_sec": actions / read,
+            "replays_per_sec": actions / play}
+
+
+def record_long(actions, seed=0):
+    """Record one long session on the default maze, returning its log.
+
+    The player wanders at random for as long as it takes, going round monsters
+    and the goal, and leaves every shop at once. The log has the undo levels of
+    a terminal session.
+    """
+    maze = default_maze(seed)
+    engine = GameEngine(Warrior("Bench"), maze, seed=seed)
+    rng = random.Random(seed)
+    directions = list(DIRECTIONS)
+    file = io.BytesIO()
+    log = ReplayWriter(file)
+    log.game(seed, seed, UNDO_LEVELS)
+    log.hero(Warrior("Bench"))
+    events = []
+    while engine.turns < actions:
+        if engine.mode == SHOP:
+            action = "leave"
+        else:
+            action = rng.choice(directions)
+            row_offset, col_offset = DIRECTIONS[action]
+            row, col = engine.hero_position[0] + row_offset, engine.hero_position[1] + col_offset
+            if (row, col) == engine.goal or (0 <= row < maze.rows and 0 <= col < maze.cols
+                                             and engine.grid.kind(row, col) == MONSTER):
+                continue
+        log.action(action)
+        engine.act(action, events)
+        events.clear()
+    log.flush()
+    return file.getvalue()
+
+
+def bench_long_replay(actions=1_000_000):
+    """Parse and replay one long log.
+
+    Returns:
+        dict: actions, parses_per_sec and replays_per_sec (actions per second)
+    """
+    data = record_long(actions)
+    start = time.perf_counter()
+    replay = parse(data)
+    read = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine = replay.play()
+    play = time.perf_counter() - start
+    assert engine.turns == actions and not engine.done
+    return {"actions": actions, "parses_per_sec": actions / read, "replays_per_sec": actions / play}
+
+
+if __name__ == "__main__":
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    result = bench_replay(games)
+    print(f"{result['actions']:,} actions, {result['bytes_per_action']:.2f} bytes each: "
+          f"{result['writes_per_sec']:,.0f} written/s, {result['parses_per_sec']:,.0f} parsed/s, "
+          f"{result['replays_per_sec']:,.0f} replayed/s")
+    long = bench_long_replay(int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000)
+    status = "ok" if long["replays_per_sec"] >= REPLAY_TARGET else "BELOW TARGET"
+    print(f"long log of {long['actions']:,} actions: {long['parses_per_sec']:,.0f} parsed/s, "
+          f"{long['replays_per_sec']:,.0f} replayed/s (target {REPLAY_TARGET:,}/s)  {status}")
+    sys.exit(0 if long["replays_per_sec"] >= REPLAY_TARGET else 1)
@@ -0,0 +1,58 @@
+"""
+savegame.py
+
+Benchmark for saving and loading games with savegame.py.
+
+Saves a game on a large generated maze, then reports how long a full save, a
+load and an incremental save after a few moves take, and the size of the file.
+
+Usage:
+    python -m benchmarks.savegame [side] [directory]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from game_engine import GameEngine
+from game_model import Warrior
+from maze import generate_maze
+
+
+def bench_savegame(side=4000, directory=None, moves=50):
+    """Save, load and save again a game on a side x side maze.
+
+    Returns:
+        dict: cells, file_bytes, and full_save, load and incremental_save in seconds
+    """
+    maze = generate_maze(side, side, seed=0)
+    engine = GameEngine(Warrior("Bench"), maze, seed=0)
+    with tempfile.TemporaryDirectory(dir=directory) as folder:
+        path = os.path.join(folder, "game.mmsv")
+        start = time.perf_counter()
+        engine.save(path)
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loaded = GameEngine.load(path)
+        load = time.perf_counter() - start
+
+        for turn in range(moves):
+            loaded.step("right" if turn % 2 else "down")
+            loaded.step("leave")
+        start = time.perf_counter()
+        loaded.save(path)
+        incremental = time.perf_counter() - start
+        size = os.path.getsize(path)
+        # Drop the mapped maze before the directory is removed
+        del loaded
+    return {"cells": side * side, "file_bytes": size, "full_save": full, "load": load,
+            "incremental_save": incremental}
+
+
+if __name__ == "__main__":
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    result = bench_savegame(side, sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"{result['cells']:,} cells, {result['file_bytes'] / 2 ** 20:.1f} MiB: full save "
+          f"{result['full_save'] * 1000:.1f} ms, load {result['load'] * 1000:.2f} ms, "
+          f"incremental save {result['incremental_save'] * 1000:.2f} ms")
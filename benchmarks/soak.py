@@ -0,0 +1,67 @@
+"""
+soak.py
+
+Soak benchmark for the turn scheduler.
+
+Plays a long scripted session (one million moves by default) through
+TurnScheduler and reports the move rate, the stack depth seen by the action
+source and the peak resident memory. The stack depth must stay flat for the
+whole run.
+
+Usage:
+    python -m benchmarks.soak [moves]
+"""
+import resource
+import sys
+import time
+
+from game_model import Warrior
+from game_engine import GameEngine, TurnScheduler
+
+
+def soak(moves=1_000_000):
+    """Walk a hero back and forth across an empty maze for a number of moves.
+
+    Args:
+        moves (int): Number of moves to play
+
+    Returns:
+        dict: moves, seconds, moves_per_sec, min_depth, max_depth, peak_rss_kb
+    """
+    grid = [[None] * 3 for _ in range(3)]
+    engine = GameEngine(Warrior("Soak"), grid)
+    depths = [sys.maxsize, 0]
+
+    def bounce(engine):
+        depth = 0
+        frame = sys._getframe()
+        while frame is not None:
+            depth += 1
+            frame = frame.f_back
+        if depth < depths[0]:
+            depths[0] = depth
+        if depth > depths[1]:
+            depths[1] = depth
+        return "right" if engine.hero_position[1] == 0 else "left"
+
+    scheduler = TurnScheduler(engine, bounce)
+    start = time.perf_counter()
+    scheduler.run(max_ticks=moves)
+    seconds = time.perf_counter() - start
+    return {
+        "moves": engine.turns,
+        "seconds": seconds,
+        "moves_per_sec": engine.turns / seconds,
+        "min_depth": depths[0],
+        "max_depth": depths[1],
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+if __name__ == "__main__":
+    moves = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    result = soak(moves)
+    print(f"{result['moves']} moves in {result['seconds']:.2f}s "
+          f"({result['moves_per_sec']:,.0f} moves/s)")
+    print(f"stack depth: {result['min_depth']}..{result['max_depth']}")
+    print(f"peak RSS: {result['peak_rss_kb']} KB")
@@ -0,0 +1,59 @@
+"""
+spatial.py
+
+Benchmark for spatial.SpatialIndex.
+
+On a square maze, reports the time to build the index and the mean time of a
+nearest-shopkeeper query, a monsters-within-radius query, a chest count and a
+cell being emptied, each from random positions.
+
+Usage:
+    python -m benchmarks.spatial [side] [queries]
+"""
+import random
+import sys
+import time
+
+from maze import generate_maze, MONSTER, CHEST, SHOPKEEPER
+from spatial import SpatialIndex
+
+
+def per_call_us(function, arguments):
+    """Call a function once per argument tuple and return the mean time in microseconds."""
+    start = time.perf_counter()
+    for args in arguments:
+        function(*args)
+    return (time.perf_counter() - start) / len(arguments) * 1e6
+
+
+def bench_spatial(side=1000, queries=10000, radius=5, seed=0):
+    """Time the index on one maze.
+
+    Returns:
+        dict: cells, build_s, nearest_us, within_us, count_us and remove_us
+    """
+    maze = generate_maze(side, side, seed=seed)
+    view = maze.session()
+    start = time.perf_counter()
+    index = SpatialIndex(view)
+    build_seconds = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    positions = [(rng.randrange(side), rng.randrange(side)) for _ in range(queries)]
+    return {
+        "cells": side * side,
+        "build_s": build_seconds,
+        "nearest_us": per_call_us(index.nearest, [(SHOPKEEPER, row, col) for row, col in positions]),
+        "within_us": per_call_us(index.within, [(MONSTER, row, col, radius) for row, col in positions]),
+        "count_us": per_call_us(index.count, [(CHEST,)] * queries),
+        "remove_us": per_call_us(index.remove, positions),
+    }
+
+
+if __name__ == "__main__":
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    result = bench_spatial(side, queries)
+    print(f"{result['cells']:,} cells: build {result['build_s']:.3f}s, "
+          f"nearest shopkeeper {result['nearest_us']:.1f}us, monsters within 5 {result['within_us']:.1f}us, "
+          f"chest count {result['count_us']:.2f}us, remove {result['remove_us']:.2f}us")
@@ -0,0 +1,78 @@
+"""
+startup.py
+
+Benchmark for how long the game takes to start, with a budget for each case.
+
+Every scenario runs in a fresh interpreter, as a session worker would, and is
+timed from its first import on; the interpreter's own startup is left out.
+Bytecode is written and a warm-up run made first, so the times are those of an
+installed game rather than of compiling its sources. The best of a few runs is
+compared with the scenario's budget in STARTUP_BUDGETS, and the exit status is 1
+if any scenario is over budget.
+
+Usage:
+    python -m benchmarks.startup [runs]
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> code timed in a fresh interpreter. It may restart the clock by setting start.
+SCENARIOS = {
+    "import.game_engine": "import game_engine",
+    "import.project": "import project",
+    "import.server": "import server",
+    "first_game": "from game_interface import Game\nfrom game_model import Warrior\nGame(Warrior('Bench'), seed=1)",
+    # The player takes half a second to answer the prompts, while preload() runs
+    "first_game.preloaded": ("from game_interface import Game, preload\nfrom game_model import Warrior\n"
+                             "preload()\ntime.sleep(0.5)\nstart = time.perf_counter()\n"
+                             "Game(Warrior('Bench'), seed=1)"),
+}
+
+# The most seconds each scenario may take, with room for a noisy machine
+STARTUP_BUDGETS = {
+    "import.game_engine": 0.03,
+    "import.project": 0.06,
+    "import.server": 0.2,
+    "first_game": 0.15,
+    "first_game.preloaded": 0.03,
+}
+
+CHILD = "import time\nstart = time.perf_counter()\n{code}\nprint(time.perf_counter() - start)\n"
+
+
+def time_scenario(code, runs=5) -> float:
+    """Run code in fresh interpreters, returning its best time in seconds."""
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    best = None
+    for run in range(runs + 1):
+        output = subprocess.run([sys.executable, "-c", CHILD.format(code=code)], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        seconds = float(output.split()[-1])
+        # The first run writes the bytecode
+        if run and (best is None or seconds < best):
+            best = seconds
+    return best
+
+
+def bench_startup(runs=5):
+    """Time every scenario.
+
+    Returns:
+        dict: name -> (seconds, budget in seconds)
+    """
+    return {name: (time_scenario(code, runs), STARTUP_BUDGETS[name]) for name, code in SCENARIOS.items()}
+
+
+if __name__ == "__main__":
+    result = bench_startup(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
+    over = []
+    for name, (seconds, budget) in result.items():
+        status = "ok" if seconds <= budget else "OVER BUDGET"
+        print(f"{name:22s} {seconds * 1000:7.1f} ms  (budget {budget * 1000:.0f} ms)  {status}")
+        if seconds > budget:
+            over.append(name)
+    sys.exit(1 if over else 0)
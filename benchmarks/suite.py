@@ -0,0 +1,243 @@
+"""
+suite.py
+
+Micro and macro benchmark suite with stored baselines.
+
+Micro benchmarks time one model operation: an attack, the stat setters,
+rolling a monster or a chest, and buying an upgrade. Macro benchmarks time a
+whole fight as the terminal game plays it, complete scripted games and maze
+generation at several sizes.
+
+For each benchmark the suite reports operations per second, the best of a few
+timed runs, and allocations per operation: the memory blocks each call leaves
+allocated, its result included. Both are compared with the baselines stored in
+baselines.json next to this file, and the exit status is 1 if any benchmark
+is slower than its baseline by more than the threshold or allocates more.
+Baselines depend on the machine, so save new ones after moving to another.
+
+Usage:
+    python -m benchmarks.suite [--save] [--threshold FRACTION] [name ...]
+"""
+import argparse
+import functools
+import gc
+import json
+import os
+import random
+import sys
+import timeit
+
+from game_engine import GameEngine
+from game_model import Monster, Shopkeeper, TreasureChest, Warrior
+from maze import generate_maze
+from policies import GreedyPolicy
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# A benchmark is slower if it runs at less than (1 - THRESHOLD) of its baseline rate
+THRESHOLD = 0.25
+
+# A benchmark allocates more if it leaves over ALLOCATION_GROWTH more blocks per
+# operation than its baseline, plus ALLOCATION_SLACK for counts that jitter
+ALLOCATION_GROWTH = 0.1
+ALLOCATION_SLACK = 0.5
+
+# Sides of the square mazes generated by the maze benchmarks
+MAZE_SIDES = (32, 256, 1024)
+
+# name -> function returning the operation to time, in the order they run
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a benchmark. The decorated function sets it up and returns its operation."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+@benchmark("micro.attack")
+def bench_attack():
+    hero, monster = Warrior("Bench"), Monster.from_stats("Blob", 80, 10, 6, 6)
+    return lambda: hero.attack(monster)
+
+
+@benchmark("micro.setters")
+def bench_setters():
+    hero = Warrior("Bench")
+
+    def set_stats():
+        hero.accuracy = 5
+        hero.defence = 6
+        hero.stealth = 7
+        hero.health = 50
+    return set_stats
+
+
+@benchmark("micro.monster")
+def bench_monster():
+    rng = random.Random(0)
+    return lambda: Monster("Blob", rng)
+
+
+@benchmark("micro.chest")
+def bench_chest():
+    rng = random.Random(0)
+    return lambda: TreasureChest(rng=rng)
+
+
+@benchmark("micro.upgrade_stat")
+def bench_upgrade_stat():
+    hero, shopkeeper = Warrior("Bench"), Shopkeeper()
+
+    def upgrade():
+        hero.coins = 20
+        hero.accuracy = 5
+        return shopkeeper.upgrade_stat(hero, "accuracy")
+    return upgrade
+
+
+@benchmark("macro.fight")
+def bench_fight():
+    # Verbose, as the terminal game plays it, with every attack reported
+    hero, monster = Warrior("Bench"), Monster.from_stats("Blob", 80, 10, 6, 6)
+    engine = GameEngine(hero, [[None, monster]], verbose=True)
+
+    def fight():
+        hero.health = hero.max_health
+        monster.health = monster.max_health
+        events = []
+        engine.fight(monster, events)
+        return events
+    return fight
+
+
+@benchmark("macro.game")
+def bench_game():
+    maze = generate_maze(16, 16, seed=0)
+
+    def play():
+        engine = GameEngine(Warrior("Bench"), maze, seed=0)
+        policy = GreedyPolicy(random.Random(0))
+        while not engine.done and engine.turns < 500:
+            engine.step(policy(engine))
+        return engine.outcome
+    return play
+
+
+def bench_maze(side):
+    return lambda: generate_maze(side, side, seed=0)
+
+
+for side in MAZE_SIDES:
+    benchmark(f"macro.maze_{side}")(functools.partial(bench_maze, side))
+
+
+def measure(operation, repeat=7):
+    """Time an operation and count what it allocates.
+
+    Args:
+        operation: Function of no arguments
+        repeat (int): Timed runs, of which the fastest counts
+
+    Returns:
+        dict: ops_per_sec and allocations (memory blocks left allocated per call)
+    """
+    timer = timeit.Timer(operation)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat, number))
+
+    # Keep every result, so whatever a call allocates is still there to count
+    calls = min(number, 10000)
+    results = [None] * calls
+    gc.collect()
+    gc.disable()
+    try:
+        before = sys.getallocatedblocks()
+        for i in range(calls):
+            results[i] = operation()
+        allocated = sys.getallocatedblocks() - before
+    finally:
+        gc.enable()
+    return {"ops_per_sec": number / best, "allocations": allocated / calls}
+
+
+def load_baselines(path=BASELINES) -> dict:
+    """Return the stored baselines, or an empty dict if none were saved."""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def compare(result, baseline, threshold=THRESHOLD):
+    """List how a result falls short of its baseline.
+
+    Returns:
+        list: Descriptions of the regressions, empty if there are none
+    """
+    problems = []
+    if result["ops_per_sec"] < baseline["ops_per_sec"] * (1 - threshold):
+        problems.append(f"{1 - result['ops_per_sec'] / baseline['ops_per_sec']:.0%} slower")
+    if result["allocations"] > baseline["allocations"] * (1 + ALLOCATION_GROWTH) + ALLOCATION_SLACK:
+        problems.append(f"{result['allocations'] - baseline['allocations']:+.1f} allocations/op")
+    return problems
+
+
+def run(names=None, threshold=THRESHOLD, baselines=None):
+    """Run benchmarks and compare them with their baselines, printing one line each.
+
+    Args:
+        names (list): Benchmarks to run, or names they start with. Defaults to all.
+        threshold (float): Fraction slower than the baseline that counts as a regression
+        baselines (dict): name -> stored result. Defaults to baselines.json.
+
+    Returns:
+        tuple: (results, regressions), dicts keyed by benchmark name
+    """
+    baselines = load_baselines() if baselines is None else baselines
+    results, regressions = {}, {}
+    for name, setup in BENCHMARKS.items():
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+        result = results[name] = measure(setup())
+        baseline = baselines.get(name)
+        if baseline is None:
+            verdict = "no baseline"
+        else:
+            problems = compare(result, baseline, threshold)
+            if problems:
+                regressions[name] = problems
+            change = result["ops_per_sec"] / baseline["ops_per_sec"] - 1
+            verdict = f"{change:+.0%} vs baseline" + (f"  REGRESSION: {', '.join(problems)}" if problems else "")
+        print(f"{name:<20} {result['ops_per_sec']:>14,.1f} ops/s {result['allocations']:>8.1f} allocs/op  {verdict}")
+    return results, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite against stored baselines.")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, or prefixes such as 'micro'")
+    parser.add_argument("--save", action="store_true", help="store these results as the new baselines")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="fraction slower than the baseline that fails (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    results, regressions = run(args.names, args.threshold)
+    if args.save:
+        baselines = load_baselines()
+        baselines.update(results)
+        with open(BASELINES, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Saved {len(results)} baselines to {BASELINES}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+world.py
+
+Benchmark for the endless chunked maze in world.py.
+
+Walks a hero diagonally through the endless world for longer and longer walks,
+with and without undo, and reports steps per second (slowed down by
+tracemalloc), the chunks generated and spilled, and at the end of each walk the
+memory held by the world's chunks and all the memory allocated since the walk
+started and still held, by the world, the game and its history. Neither should
+grow with the length of the walk.
+
+Usage:
+    python -m benchmarks.world [steps]
+"""
+import sys
+import time
+import tracemalloc
+
+from game_engine import GameEngine
+from game_model import Warrior
+from world import ChunkedMaze
+
+# No monsters, so the hero never dies on the way
+DENSITIES = {"monster_density": 0, "chest_density": 0.1, "potion_density": 0.05, "shopkeeper_density": 0}
+
+
+def walk(steps, seed=0, undo_levels=0):
+    """Walk a hero diagonally for a number of steps.
+
+    Returns:
+        tuple: (world, seconds, bytes held by the world's chunks, bytes held in all)
+    """
+    tracemalloc.start()
+    world = ChunkedMaze(seed, **DENSITIES)
+    engine = GameEngine(Warrior("Bench"), world, seed=seed, undo_levels=undo_levels)
+    start = time.perf_counter()
+    for turn in range(steps):
+        engine.step("right" if turn % 2 else "down")
+    seconds = time.perf_counter() - start
+    total = tracemalloc.get_traced_memory()[0]
+    world.chunks.clear()
+    held = total - tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return world, seconds, held, total
+
+
+def bench_world(steps=100_000, undo_levels=(0, 10)):
+    """Walk for a tenth of the steps, then for all of them, with each number of undo levels.
+
+    Returns:
+        dict: Per walk, keyed by (steps, undo levels): steps_per_sec, generated,
+            spilled, chunk_bytes (memory held by the chunks in memory at the end)
+            and total_bytes (all memory allocated during the walk and still held)
+    """
+    result = {}
+    for levels in undo_levels:
+        for count in (steps // 10, steps):
+            world, seconds, held, total = walk(count, undo_levels=levels)
+            result[count, levels] = {"steps_per_sec": count / seconds, "generated": world.generated,
+                                     "spilled": world.spilled, "chunk_bytes": held, "total_bytes": total}
+    return result
+
+
+if __name__ == "__main__":
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for (count, levels), walked in bench_world(steps).items():
+        print(f"{count:,} steps, {levels} undo levels: {walked['steps_per_sec']:,.0f} steps/s, "
+              f"{walked['generated']:,} chunks generated, {walked['spilled']:,} spilled, "
+              f"{walked['chunk_bytes'] / 2 ** 20:.2f} MiB of chunks and "
+              f"{walked['total_bytes'] / 2 ** 20:.2f} MiB in all in memory")
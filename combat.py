@@ -0,0 +1,232 @@
+"""
+combat.py
+
+This module resolves fights between heroes and monsters in bulk with NumPy.
+
+The rules are the same as Character.attack, Monster.attack and GameEngine.fight:
+each round the hero attacks first and the monster counter-attacks if it survives.
+The damage of an attack depends only on the attacker's hit chance, so every fight
+in a batch is advanced one round at a time with array operations instead of
+Python method calls.
+
+Stochastic fights, rolled with dice as in game_engine.roll_fight, are advanced
+the same way by roll_fights, with one block of dice rolls per round.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from game_engine import (CRITICAL_CHANCE, CRITICAL_MULTIPLIER, GLANCING_CHANCE, GLANCING_MULTIPLIER,
+                         MAX_ROUNDS, ROLLS_PER_ROUND)
+
+# Fields of a stat block, matching the attributes of Character and Monster
+STAT_FIELDS = ("health", "power", "accuracy", "defence", "stealth")
+
+# Fight outcomes
+STALEMATE = 0
+HERO_WINS = 1
+MONSTER_WINS = 2
+
+FightResults = namedtuple("FightResults", ["outcome", "rounds", "hero_health", "monster_health"])
+
+
+def stat_block(characters):
+    """Collect the stats of a sequence of characters into arrays.
+
+    Args:
+        characters (list): Character or Monster objects
+
+    Returns:
+        dict: One array per field in STAT_FIELDS
+    """
+    return {field: np.array([getattr(c, field) for c in characters], dtype=np.float64)
+            for field in STAT_FIELDS}
+
+
+def roll_monsters(n, rng):
+    """Roll the stats of n monsters the same way Monster.__init__ does.
+
+    Args:
+        n (int): Number of monsters
+        rng (numpy.random.Generator): Source of randomness
+
+    Returns:
+        dict: One array per field in STAT_FIELDS
+    """
+    return {
+        "health": rng.integers(40, 81, n).astype(np.float64),
+        "power": rng.integers(5, 16, n).astype(np.float64),
+        "accuracy": np.full(n, 8.0),
+        "defence": rng.integers(5, 9, n).astype(np.float64),
+        "stealth": rng.integers(5, 9, n).astype(np.float64),
+    }
+
+
+def attack_damage(attacker, defender):
+    """Work out the damage of every attack in a batch.
+
+    Mirrors Character.hit_chance and the thresholds in Character.attack.
+
+    Args:
+        attacker (dict): Stat block of the attacking side
+        defender (dict): Stat block of the defending side
+
+    Returns:
+        numpy.ndarray: Damage dealt by each attack (0 when it cannot hurt)
+    """
+    dodge = np.asarray(defender["stealth"]) * defender["defence"] / 100
+    hit = (1 - dodge) * np.asarray(attacker["accuracy"]) / 10
+    multiplier = np.select([hit > 0.7, hit > 0.5, hit > 0.3], [1.5, 1.0, 0.5], 0.0)
+    return np.asarray(attacker["power"]) * multiplier
+
+
+def simulate_fights(heroes, monsters):
+    """Resolve a batch of fights, one hero stat block against one monster each.
+
+    Stat blocks are dicts of arrays keyed by STAT_FIELDS. Scalars broadcast, so a
+    single hero can fight a million monsters.
+
+    Args:
+        heroes (dict): Stat blocks of the heroes
+        monsters (dict): Stat blocks of the monsters
+
+    Returns:
+        FightResults: outcome (STALEMATE, HERO_WINS or MONSTER_WINS), rounds and
+            the remaining health of both sides, one entry per fight
+    """
+    hero_damage = attack_damage(heroes, monsters)
+    monster_damage = attack_damage(monsters, heroes)
+    shape = np.broadcast(hero_damage, monster_damage,
+                         np.asarray(heroes["health"]), np.asarray(monsters["health"])).shape
+    hero_damage = np.broadcast_to(hero_damage, shape)
+    monster_damage = np.broadcast_to(monster_damage, shape)
+    hero_health = np.array(np.broadcast_to(heroes["health"], shape), dtype=np.float64)
+    monster_health = np.array(np.broadcast_to(monsters["health"], shape), dtype=np.float64)
+    rounds = np.zeros(shape, dtype=np.int64)
+
+    # Neither side can hurt the other: nobody fights
+    stalemate = (hero_damage == 0) & (monster_damage == 0)
+    hero_health_flat = hero_health.reshape(-1)
+    monster_health_flat = monster_health.reshape(-1)
+    rounds_flat = rounds.reshape(-1)
+
+    # Work on compact copies of the fights still in progress, writing each fight
+    # back to the result arrays once it is over.
+    index = np.flatnonzero(~stalemate & (hero_health > 0) & (monster_health > 0))
+    hero_damage = hero_damage.reshape(-1)[index]
+    monster_damage = monster_damage.reshape(-1)[index]
+    heroes_left = hero_health_flat[index]
+    monsters_left = monster_health_flat[index]
+    round_number = 0
+
+    while index.size:
+        round_number += 1
+        # The hero strikes first
+        monsters_left = np.maximum(monsters_left - hero_damage, 0)
+        # The survivors strike back
+        alive = monsters_left > 0
+        heroes_left = np.where(alive, np.maximum(heroes_left - monster_damage, 0), heroes_left)
+        over = ~alive | (heroes_left <= 0)
+        if over.any():
+            finished = index[over]
+            rounds_flat[finished] = round_number
+            hero_health_flat[finished] = heroes_left[over]
+            monster_health_flat[finished] = monsters_left[over]
+            going = ~over
+            index = index[going]
+            hero_damage = hero_damage[going]
+            monster_damage = monster_damage[going]
+            heroes_left = heroes_left[going]
+            monsters_left = monsters_left[going]
+
+    outcome = np.where(monster_health <= 0, HERO_WINS, MONSTER_WINS)
+    outcome = np.where(stalemate, STALEMATE, outcome)
+    return FightResults(outcome, rounds, hero_health, monster_health)
+
+
+def _attack_rolls(rolls, accuracy, dodge, power):
+    """Damage of a batch of stochastic attacks, from their (hit, dodge, tier) rolls."""
+    lands = (rolls[:, 0] < accuracy) & (rolls[:, 1] >= dodge)
+    multiplier = np.select([rolls[:, 2] < CRITICAL_CHANCE, rolls[:, 2] >= 1 - GLANCING_CHANCE],
+                           [CRITICAL_MULTIPLIER, GLANCING_MULTIPLIER], 1.0)
+    return np.where(lands, power * multiplier, 0.0)
+
+
+def roll_fights(heroes, monsters, dice, lanes):
+    """Roll a batch of fights with dice, as game_engine.roll_fight does one.
+
+    Each fight rolls on its own lane of the dice, so a fight gets the same result
+    here as roll_fight gives it on that lane. Stat blocks are dicts of arrays keyed
+    by STAT_FIELDS, one entry per fight; scalars broadcast.
+
+    Args:
+        heroes (dict): Stat blocks of the heroes
+        monsters (dict): Stat blocks of the monsters
+        dice (dice.BlockRNG): Source of the rolls
+        lanes (numpy.ndarray): Distinct lane of each fight
+
+    Returns:
+        FightResults: outcome (STALEMATE, HERO_WINS or MONSTER_WINS), rounds and
+            the remaining health of both sides, one entry per fight
+    """
+    lanes = np.asarray(lanes)
+    shape = lanes.shape
+
+    def field(block, name):
+        return np.broadcast_to(np.asarray(block[name], dtype=np.float64), shape)
+
+    hero_accuracy, monster_accuracy = field(heroes, "accuracy") / 10, field(monsters, "accuracy") / 10
+    hero_dodge = field(heroes, "stealth") * field(heroes, "defence") / 100
+    monster_dodge = field(monsters, "stealth") * field(monsters, "defence") / 100
+    hero_power, monster_power = field(heroes, "power"), field(monsters, "power")
+    hero_health = np.array(field(heroes, "health"))
+    monster_health = np.array(field(monsters, "health"))
+    rounds = np.zeros(shape, dtype=np.int64)
+    outcome = np.full(shape, STALEMATE)
+    outcome[monster_health <= 0] = HERO_WINS
+    outcome[(monster_health > 0) & (hero_health <= 0)] = MONSTER_WINS
+
+    # Neither side can ever land an attack: nobody fights
+    stalemate = ((1 - monster_dodge) * hero_accuracy <= 0) & ((1 - hero_dodge) * monster_accuracy <= 0)
+    index = np.flatnonzero(~stalemate & (hero_health > 0) & (monster_health > 0))
+    outcome[stalemate] = STALEMATE
+    round_number = 0
+
+    while index.size and round_number < MAX_ROUNDS:
+        round_number += 1
+        rolls = dice.draw_rows(lanes[index], ROLLS_PER_ROUND)
+        # The hero strikes first
+        monsters_left = np.maximum(monster_health[index] - _attack_rolls(
+            rolls, hero_accuracy[index], monster_dodge[index], hero_power[index]), 0)
+        monster_health[index] = monsters_left
+        # The survivors strike back
+        alive = monsters_left > 0
+        heroes_left = np.maximum(hero_health[index] - _attack_rolls(
+            rolls[:, 3:], monster_accuracy[index], hero_dodge[index], monster_power[index]), 0)
+        heroes_left = np.where(alive, heroes_left, hero_health[index])
+        hero_health[index] = heroes_left
+        over = ~alive | (heroes_left <= 0)
+        rounds[index] = round_number
+        outcome[index[~alive]] = HERO_WINS
+        outcome[index[alive & (heroes_left <= 0)]] = MONSTER_WINS
+        index = index[~over]
+
+    # Still fighting after MAX_ROUNDS
+    outcome[index] = STALEMATE
+    return FightResults(outcome, rounds, hero_health, monster_health)
+
+
+def win_rate(hero, n, rng=None):
+    """Estimate how often a hero beats a randomly rolled monster.
+
+    Args:
+        hero (Character): The hero to test
+        n (int): Number of monsters to fight
+        rng (numpy.random.Generator): Source of randomness
+
+    Returns:
+        float: Fraction of fights the hero wins
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    results = simulate_fights(stat_block([hero]), roll_monsters(n, rng))
+    return float(np.mean(results.outcome == HERO_WINS))
@@ -0,0 +1,198 @@
+"""
+dice.py
+
+This module supplies the random numbers of stochastic combat in blocks.
+
+Drawing one number at a time from Python costs far more than the number itself.
+A BlockRNG instead fills a block of uniform numbers per game with a single NumPy
+call and hands them out by position. A scalar fight reads a lane's block as a
+Python list with its own read position, and a batch of fights takes one fancy
+index per round.
+
+Every game has its own lane: a block, a read position and the NumPy generator
+that refills it. A lane is refilled whenever a request does not fit in what is
+left of its block, so a game's numbers depend only on its seed and on how many
+it has used, not on whether it is played alone or in a batch of thousands. As
+long as whole blocks are used, the block size does not change the numbers either.
+"""
+import numpy as np
+
+from rng import COMBAT_STREAM, as_game_rng
+
+# Numbers per lane drawn at once. Multiples of the 6 numbers used per fight round,
+# so no numbers are thrown away: a single game draws DICE_BLOCK, while a batch
+# shares DICE_BUDGET numbers between its lanes, with at least MIN_DICE_BLOCK each.
+DICE_BLOCK = 6 * 1024
+MIN_DICE_BLOCK = 6 * 10
+DICE_BUDGET = 1 << 22
+
+
+class BlockRNG(object):
+    """Uniform random numbers in [0, 1), drawn in blocks, one lane per game.
+
+    Attributes:
+        generators (list): The numpy.random.Generator of each lane
+        block_size (int): Numbers drawn per lane at a time
+        blocks (numpy.ndarray): float64 array of shape (lanes, block_size)
+        positions (numpy.ndarray): Index of the next unused number in each lane
+        refills (int): Blocks drawn so far, over all lanes
+    """
+    __slots__ = ("generators", "block_size", "blocks", "positions", "refills", "_lists", "_states")
+
+    def __init__(self, generators, block_size=DICE_BLOCK):
+        """Set up the lanes and draw their first blocks.
+
+        Args:
+            generators (list): One numpy.random.Generator per lane
+            block_size (int): Numbers drawn per lane at a time
+        """
+        self.generators = list(generators)
+        self.block_size = block_size
+        self.blocks = np.empty((len(self.generators), block_size))
+        self.positions = np.zeros(len(self.generators), dtype=np.int64)
+        self.refills = 0
+        self._lists = [None] * len(self.generators)
+        # Generator state of each lane after its block was drawn, taken when first asked for
+        self._states = [None] * len(self.generators)
+        for lane in range(len(self.generators)):
+            self.refill(lane)
+
+    @property
+    def lanes(self) -> int:
+        return len(self.generators)
+
+    def refill(self, lane):
+        """Replace a lane's block with fresh numbers and start reading it from the top."""
+        generator = self.generators[lane]
+        if generator is None:
+            # Copied or rewound lanes get their generator back only when they need it
+            generator = self.generators[lane] = _generator(self._states[lane])
+        generator.random(out=self.blocks[lane])
+        self.positions[lane] = 0
+        self.refills += 1
+        self._lists[lane] = None
+        self._states[lane] = None
+
+    def generator_state(self, lane=0) -> dict:
+        """Return the state of a lane's generator, as of when its block was drawn."""
+        state = self._states[lane]
+        if state is None:
+            state = self._states[lane] = self.generators[lane].bit_generator.state
+        return state
+
+    def lane_state(self, lane=0) -> tuple:
+        """Return where a lane is, to go back to later with set_lane_state.
+
+        Returns:
+            tuple: (list of the block's numbers, position, generator state)
+        """
+        values, position = self.open_lane(lane)
+        return values, position, self.generator_state(lane)
+
+    def set_lane_state(self, lane, state):
+        """Put a lane back where lane_state found it, so it rolls the same numbers again."""
+        values, position, generator_state = state
+        if self._lists[lane] is not values:
+            self.blocks[lane] = values
+            self._lists[lane] = values
+            self.generators[lane] = None
+            self._states[lane] = generator_state
+        self.positions[lane] = position
+
+    def copy(self):
+        """Return independent dice that roll exactly what these would from here on."""
+        twin = BlockRNG.__new__(BlockRNG)
+        twin._states = [self.generator_state(lane) for lane in range(self.lanes)]
+        twin.generators = [None] * self.lanes
+        twin.block_size = self.block_size
+        twin.blocks = self.blocks.copy()
+        twin.positions = self.positions.copy()
+        twin.refills = self.refills
+        twin._lists = list(self._lists)
+        return twin
+
+    def open_lane(self, lane=0):
+        """Start reading a lane from Python, for a scalar fight.
+
+        Read numbers from the list starting at the position, call next_block when
+        it runs out and close_lane when done.
+
+        Returns:
+            tuple: (list of the block's numbers, position of the next unused one)
+        """
+        values = self._lists[lane]
+        if values is None:
+            values = self._lists[lane] = self.blocks[lane].tolist()
+        return values, int(self.positions[lane])
+
+    def next_block(self, lane=0) -> list:
+        """Refill a lane being read from Python and return its new numbers, read from 0."""
+        self.refill(lane)
+        return self.open_lane(lane)[0]
+
+    def close_lane(self, lane, position):
+        """Finish reading a lane from Python, recording how far it got."""
+        self.positions[lane] = position
+
+    def draw(self, count, lane=0) -> list:
+        """Take the next numbers of one lane, for a scalar fight.
+
+        Args:
+            count (int): How many numbers, at most block_size
+            lane (int): The game's lane
+
+        Returns:
+            list: count Python floats
+        """
+        values, position = self.open_lane(lane)
+        if position + count > self.block_size:
+            values, position = self.next_block(lane), 0
+        self.close_lane(lane, position + count)
+        return values[position:position + count]
+
+    def draw_rows(self, lanes, count):
+        """Take the next numbers of many lanes at once, for a batch of fights.
+
+        Gives every lane the same numbers a run of draw calls would.
+
+        Args:
+            lanes (numpy.ndarray): Distinct lane numbers
+            count (int): How many numbers per lane, at most block_size
+
+        Returns:
+            numpy.ndarray: float64 array of shape (len(lanes), count)
+        """
+        positions = self.positions[lanes]
+        for lane in lanes[positions + count > self.block_size].tolist():
+            self.refill(lane)
+        positions = self.positions[lanes]
+        self.positions[lanes] = positions + count
+        return self.blocks[lanes[:, None], positions[:, None] + np.arange(count)]
+
+
+def _generator(state):
+    """Build a numpy.random.Generator from the state of another one."""
+    bit_generator = getattr(np.random, state["bit_generator"])()
+    bit_generator.state = state
+    return np.random.Generator(bit_generator)
+
+
+def combat_dice(seeds, block_size=None):
+    """Build the combat dice of some games, from each game's combat stream.
+
+    GameEngine(stochastic=True, seed=s) rolls from combat_dice([s]), so a batch
+    built from the same seeds rolls exactly what the single games do.
+
+    Args:
+        seeds (list): One seed or rng.GameRNG per game
+        block_size (int): Numbers drawn per lane at a time. Defaults to a size
+            that keeps all the blocks within DICE_BUDGET numbers.
+
+    Returns:
+        BlockRNG: One lane per game, in order
+    """
+    generators = [as_game_rng(seed).generator(COMBAT_STREAM) for seed in seeds]
+    if block_size is None:
+        share = DICE_BUDGET // max(len(generators), 1) // 6 * 6
+        block_size = min(DICE_BLOCK, max(MIN_DICE_BLOCK, share))
+    return BlockRNG(generators, block_size)
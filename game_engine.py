@@ -0,0 +1,938 @@
+"""
+game_engine.py
+
+This module contains the headless rules engine for Mazes and Monsters.
+
+The engine never reads input, prints anything or exits the process. Each call to
+GameEngine.step applies a single action and reports what happened as a list of
+events, so the same rules can be driven by the terminal interface, by tests or by
+bots at machine speed.
+
+NumPy takes longer to import than the rest of the game put together, so the
+terminal game, the engine and the bots never import it, nor any module built on
+it (maze, world, dice, savegame, spatial, pathfinding), at module level. Those
+are imported where they are first needed.
+"""
+from collections import deque, namedtuple
+import copy
+import math
+
+from game_model import Monster, TreasureChest, HealingPotion, Shopkeeper
+from rng import as_game_rng
+from transposition import cell_key
+
+# Possible movement directions and their coordinate changes
+DIRECTIONS = {'up': (-1, 0), 'down': (1, 0), 'left': (0, -1), 'right': (0, 1)}
+
+# Stats that can be upgraded at a shopkeeper
+STATS = ("accuracy", "defence", "stealth")
+
+# Modes the engine can be in. In SHOP mode only shop actions are accepted.
+MAZE = "maze"
+SHOP = "shop"
+
+MAZE_ACTIONS = frozenset(DIRECTIONS) | {"heal", "quit"}
+SHOP_ACTIONS = frozenset(STATS) | {"potion", "leave", "quit"}
+
+# Empty cells GameEngine.run remembers at once, to keep a walk through the endless world bounded
+RUN_EMPTY_CELLS = 1 << 16
+
+FightOutcome = namedtuple("FightOutcome", ["winner", "rounds", "hero_damage", "enemy_damage",
+                                           "hero_health", "enemy_health"])
+
+# Damage tiers of an attack that lands in stochastic combat: the chance of each
+# and its multiplier of the attacker's power. Other attacks do normal damage.
+CRITICAL_CHANCE, CRITICAL_MULTIPLIER = 0.1, 1.5
+GLANCING_CHANCE, GLANCING_MULTIPLIER = 0.2, 0.5
+
+# Random numbers used per round of stochastic combat: hit, dodge and tier for each side
+ROLLS_PER_ROUND = 6
+
+# A stochastic fight still going after this many rounds ends in a stalemate
+MAX_ROUNDS = 1000
+
+
+def resolve_fight(hero, enemy):
+    """Work out the result of a fight without playing it round by round.
+
+    With fixed stats every attack by the same side does the same damage, so the
+    number of hits each side needs to win is known up front. The hero strikes
+    first each round, so the hero wins if it needs no more hits than the enemy.
+
+    Args:
+        hero (Character): The hero
+        enemy (Character): The monster the hero is fighting
+
+    Returns:
+        FightOutcome: winner ("hero", "enemy" or None for a stalemate), the number
+            of rounds, the damage of one attack from each side and the health both
+            sides are left with
+    """
+    hero_damage = hero.damage_against(enemy)
+    enemy_damage = enemy.damage_against(hero)
+    hero_health = hero.health
+    enemy_health = enemy.health
+
+    # Neither side can hurt the other
+    if not hero_damage and not enemy_damage:
+        return FightOutcome(None, 0, hero_damage, enemy_damage, hero_health, enemy_health)
+    if enemy_health <= 0:
+        return FightOutcome("hero", 0, hero_damage, enemy_damage, hero_health, enemy_health)
+    if hero_health <= 0:
+        return FightOutcome("enemy", 0, hero_damage, enemy_damage, hero_health, enemy_health)
+
+    hero_hits = math.ceil(enemy_health / hero_damage) if hero_damage else math.inf
+    enemy_hits = math.ceil(hero_health / enemy_damage) if enemy_damage else math.inf
+    if hero_hits <= enemy_hits:
+        return FightOutcome("hero", hero_hits, hero_damage, enemy_damage,
+                            hero_health - (hero_hits - 1) * enemy_damage, 0)
+    return FightOutcome("enemy", enemy_hits, hero_damage, enemy_damage,
+                        0, enemy_health - enemy_hits * hero_damage)
+
+
+def roll_fight(hero, enemy, dice, lane=0, events=None):
+    """Play out a fight with dice, round by round.
+
+    Every attack rolls to hit against the attacker's accuracy, then the defender
+    rolls to dodge against its dodge chance, so an attack lands with the
+    attacker's hit_chance. An attack that lands rolls its damage tier: critical,
+    normal or glancing. The hero strikes first each round and the enemy
+    counter-attacks if it survives. Each round uses ROLLS_PER_ROUND numbers from
+    the dice whether or not the enemy survives, which keeps it in step with
+    combat.roll_fights.
+
+    Args:
+        hero (Character): The hero
+        enemy (Character): The monster the hero is fighting
+        dice (dice.BlockRNG): Source of the rolls
+        lane (int): The game's lane of the dice
+        events (list): If given, every attack is reported here as in verbose mode
+
+    Returns:
+        FightOutcome: winner ("hero", "enemy" or None for a stalemate), the number
+            of rounds, the total damage dealt by each side and the health both
+            sides are left with
+    """
+    hero_health = hero.health
+    enemy_health = enemy.health
+    hero_accuracy, enemy_accuracy = hero.accuracy / 10, enemy.accuracy / 10
+    hero_dodge, enemy_dodge = hero.dodge_chance(), enemy.dodge_chance()
+    hero_power, enemy_power = hero.power, enemy.power
+
+    # Neither side can ever land an attack
+    if hero.hit_chance(enemy) <= 0 and enemy.hit_chance(hero) <= 0:
+        return FightOutcome(None, 0, 0, 0, hero_health, enemy_health)
+    if enemy_health <= 0:
+        return FightOutcome("hero", 0, 0, 0, hero_health, enemy_health)
+    if hero_health <= 0:
+        return FightOutcome("enemy", 0, 0, 0, hero_health, enemy_health)
+
+    glancing = 1 - GLANCING_CHANCE
+    winner = None
+    rounds = 0
+    rolls, position = dice.open_lane(lane)
+    while rounds < MAX_ROUNDS:
+        rounds += 1
+        if position + ROLLS_PER_ROUND > len(rolls):
+            rolls, position = dice.next_block(lane), 0
+        hit, dodge, tier, counter_hit, counter_dodge, counter_tier = rolls[position:position + ROLLS_PER_ROUND]
+        position += ROLLS_PER_ROUND
+        if hit < hero_accuracy and dodge >= enemy_dodge:
+            damage = hero_power * (CRITICAL_MULTIPLIER if tier < CRITICAL_CHANCE else
+                                   GLANCING_MULTIPLIER if tier >= glancing else 1)
+            enemy_health = max(enemy_health - damage, 0)
+            if events is not None:
+                events.append(("hero_attack", damage, enemy_health))
+        elif events is not None:
+            events.append(("hero_miss",))
+        if enemy_health <= 0:
+            winner = "hero"
+            break
+        if counter_hit < enemy_accuracy and counter_dodge >= hero_dodge:
+            damage = enemy_power * (CRITICAL_MULTIPLIER if counter_tier < CRITICAL_CHANCE else
+                                    GLANCING_MULTIPLIER if counter_tier >= glancing else 1)
+            hero_health = max(hero_health - damage, 0)
+            if events is not None:
+                events.append(("monster_attack", damage))
+        elif events is not None:
+            events.append(("monster_miss",))
+        if hero_health <= 0:
+            winner = "enemy"
+            break
+    dice.close_lane(lane, position)
+    return FightOutcome(winner, rounds, enemy.health - enemy_health, hero.health - hero_health,
+                        hero_health, enemy_health)
+
+
+class ObjectGrid(object):
+    """A maze stored as a list of lists holding one game object (or None) per cell.
+
+    GameEngine talks to every kind of maze through the same small interface:
+    rows, cols, cell(row, col) and clear(row, col). This class provides it for
+    hand-built grids; maze.MazeView provides it for maze templates.
+
+    Attributes:
+        cells (List[List]): The 2D maze grid containing game objects
+        rows (int): Number of rows
+        cols (int): Number of columns
+    """
+
+    def __init__(self, cells):
+        self.cells = cells
+        self.rows = len(cells)
+        self.cols = len(cells[0])
+
+    def __getitem__(self, row):
+        return self.cells[row]
+
+    def cell(self, row, col):
+        """Return the object in a cell, or None if it is empty."""
+        return self.cells[row][col]
+
+    def clear(self, row, col):
+        """Empty a cell, e.g. once its chest has been looted."""
+        self.cells[row][col] = None
+
+    def put(self, row, col, cell):
+        """Put an object back in a cell, e.g. when a move is undone."""
+        self.cells[row][col] = cell
+
+    def copy(self):
+        """Return an independent copy of the grid.
+
+        Fights change a monster's health, so monsters are copied too. Other game
+        objects never change and are shared.
+        """
+        return ObjectGrid([[copy.copy(cell) if isinstance(cell, Monster) else cell for cell in row]
+                           for row in self.cells])
+
+
+class Change(object):
+    """One change to a game's maze, as a node in the tree of its histories.
+
+    Each node points to the change before it, so histories that branch from the
+    same point share every change up to it, and the maze of any snapshot can be
+    reached from any other by undoing and redoing the changes between them.
+    Changes are only recorded while a game can go back, and the history is cut
+    off at the oldest state undo can reach, so it does not grow with the game.
+    The change it is cut at is marked, so that snapshots from before the cut are
+    refused instead of restored wrongly.
+
+    A change either empties a cell (row and col set, cell holds what was there)
+    or changes the health of a monster object (row and col None).
+
+    Attributes:
+        parent (Change): The change before this one, None for the first one kept
+        depth (int): Number of changes up to and including this one
+        row (int): Row of the emptied cell
+        col (int): Column of the emptied cell
+        cell: The object that was in the cell, or the monster whose health changed
+        before (float): The monster's health before the change
+        after (float): The monster's health after the change
+        cut (bool): Whether the history was cut off before this change
+    """
+    __slots__ = ("parent", "depth", "row", "col", "cell", "before", "after", "cut")
+
+    def __init__(self, parent, row, col, cell, before=None, after=None):
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 1
+        self.row = row
+        self.col = col
+        self.cell = cell
+        self.before = before
+        self.after = after
+        self.cut = False
+
+
+# Engine attributes saved by a snapshot, besides the hero and the maze
+# GameEngine.save_moves relies on the hero's position coming first and the turns second to last
+SNAPSHOT_FIELDS = ("hero_position", "mode", "shopkeeper", "done", "outcome", "turns", "cleared_key")
+
+Snapshot = namedtuple("Snapshot", ["change", "hero", "fields", "dice"])
+Snapshot.__doc__ = """A saved game state, from GameEngine.snapshot.
+
+Holds the latest maze change, the hero's stats, the engine's own fields and, in
+a stochastic game, where the dice were, so it takes the same small amount of
+memory whatever the size of the maze. Fights played again after a restore roll
+the same numbers.
+"""
+
+
+class GameEngine(object):
+    """The rules of the game, without any user interface.
+
+    Actions are plain strings:
+    - In the maze: "up", "down", "left", "right", "heal" or "quit"
+    - At a shopkeeper: "potion", "accuracy", "defence", "stealth", "leave" or "quit"
+
+    Events are tuples whose first item names what happened, e.g. ("chest", 35)
+    or ("hero_attack", 30, 20). The interface decides how to describe them.
+
+    Attributes:
+        hero (Character): The player's character
+        grid (ObjectGrid): The maze. Any object with rows, cols, cell() and clear().
+        hero_position (tuple): Current (row, col) position of hero in the maze
+        goal (tuple): The (row, col) cell that wins the game
+        mode (str): MAZE, or SHOP while trading with a shopkeeper
+        done (bool): Whether the game has finished
+        outcome (str): None while playing, then "won", "lost" or "quit"
+        turns (int): Number of accepted actions so far
+        verbose (bool): Whether fights report every attack
+        stochastic (bool): Whether fights are rolled with dice by roll_fight
+            instead of worked out by resolve_fight
+        index (SpatialIndex): Where things are in the maze, once spatial_index()
+            has been called
+        cleared_key (int): Zobrist hash of the cells this game has emptied, see
+            transposition.state_key
+        change (Change): The latest change to the maze, None before the first
+            recorded
+        recording (bool): Whether changes to the maze are recorded for restore:
+            with undo, or once a snapshot has been taken
+        undo_levels (int): How many actions "undo" can take back
+        rng (GameRNG): This game's random streams
+        dice (dice.BlockRNG): The combat dice of a stochastic game, else None
+        saved (tuple): (path, maze template, cleared cells) of the last save or
+            load, so that the next save to that file only writes what changed
+    """
+
+    def __init__(self, hero, grid, goal=None, verbose=False, seed=None, undo_levels=0,
+                 stochastic=False):
+        """Initialise a new game engine.
+
+        Args:
+            hero (Character): The player's chosen character
+            grid (List[List]): The 2D maze grid, or a shared maze.Maze template
+            goal (tuple): The winning cell. Defaults to the bottom-right corner.
+            verbose (bool): Whether fights report every attack, for a human watching
+            seed (int): Seed, or a rng.GameRNG, for this game's random streams
+            undo_levels (int): How many actions the "undo" action can take back.
+                With 0, "undo" and "redo" are not accepted.
+            stochastic (bool): Whether fights are rolled with dice, see roll_fight
+        """
+        self.hero = hero
+        self.rng = as_game_rng(seed)
+        if isinstance(grid, list):
+            grid = ObjectGrid(grid)
+        elif hasattr(grid, "session"):
+            # A shared maze template: play on this game's own view of it
+            grid = grid.session()
+        self.grid = grid
+        self.rows = grid.rows
+        self.cols = grid.cols
+        self.hero_position = (0, 0)  # Start at top-left corner
+        self.goal = goal if goal is not None else (self.rows - 1, self.cols - 1)
+        self.mode = MAZE
+        self.shopkeeper = None
+        self.done = False
+        self.outcome = None
+        self.turns = 0
+        self.verbose = verbose
+        self.stochastic = stochastic
+        self.dice = None
+        if stochastic:
+            from dice import combat_dice
+            self.dice = combat_dice([self.rng])
+        self.index = None
+        self.cleared_key = 0
+        self.change = None
+        self.recording = bool(undo_levels)
+        self.undo_levels = undo_levels
+        self.undo_stack = []
+        self.redo_stack = []
+        self.saved = None
+
+    @classmethod
+    def load(cls, path, verbose=False, seed=None):
+        """Load a game saved with save.
+
+        The maze is mapped from the file rather than read, see savegame.py.
+
+        Args:
+            path (str): The save file
+            verbose (bool): Whether fights report every attack
+            seed (int): Seed, or a rng.GameRNG, for the game's new random streams
+
+        Returns:
+            GameEngine: The game, as it was saved
+        """
+        from savegame import read_game, SAVED_FIELDS
+        saved = read_game(path)
+        engine = cls.__new__(cls)
+        GameEngine.__init__(engine, saved.hero, saved.template, goal=saved.goal, verbose=verbose, seed=seed,
+                            undo_levels=saved.undo_levels, stochastic=saved.stochastic)
+        engine.grid.cleared = saved.cleared
+        for field, value in zip(SAVED_FIELDS, saved.fields):
+            setattr(engine, field, value)
+        if engine.mode == SHOP:
+            engine.shopkeeper = engine.grid.cell(*engine.hero_position)
+        engine.saved = (path, saved.template, frozenset(saved.cleared))
+        return engine
+
+    def save(self, path):
+        """Save the game to a file, to carry on later with load.
+
+        Saving again to the same file only writes the cells cleared or put back
+        since, and the hero. Only games played on a maze template can be saved.
+        The history for undo is not saved.
+
+        Args:
+            path (str): The file to save to
+        """
+        from savegame import save_game
+        save_game(self, path)
+
+    def clone(self):
+        """Return an independent copy of this game, e.g. for a bot to try moves on.
+
+        Only what a move can change is copied: the hero and this game's view of
+        the maze, and the dice of a stochastic game, so fights on the copy do not
+        use up this game's rolls. The maze template, the shopkeeper and the random
+        streams, which the engine only draws from when it is created, are shared,
+        and the spatial index is rebuilt on demand. The copy starts with no
+        history, so snapshots of this game cannot be restored on it.
+
+        Returns:
+            GameEngine: The copy
+        """
+        twin = self.__class__.__new__(self.__class__)
+        twin.__dict__.update(self.__dict__)
+        twin.hero = copy.copy(self.hero)
+        twin.grid = self.grid.copy()
+        if self.dice is not None:
+            twin.dice = self.dice.copy()
+        twin.index = None
+        twin.change = None
+        twin.recording = bool(self.undo_levels)
+        twin.undo_stack = []
+        twin.redo_stack = []
+        twin.saved = None
+        return twin
+
+    def snapshot(self):
+        """Save the state of the game, to go back to later with restore.
+
+        Takes O(1) time and memory: the maze is saved as a pointer into the
+        shared history of changes. From the first snapshot on, every change to the
+        maze is recorded. In a game with undo, the history is cut off at the oldest
+        state undo can reach, and restoring an older snapshot raises ValueError.
+
+        Returns:
+            Snapshot: A token for restore
+        """
+        self.recording = True
+        return Snapshot(self.change, self.hero.get_state(),
+                        tuple(getattr(self, field) for field in SNAPSHOT_FIELDS),
+                        self.dice.lane_state() if self.dice is not None else None)
+
+    def restore(self, token):
+        """Put the game back in a saved state.
+
+        The maze is brought back by undoing the changes made since the histories
+        of the two states parted and redoing those leading to the saved state, so
+        the work is proportional to the number of cells that differ. Any snapshot
+        of this game can be restored, in any order, except those from before the
+        oldest state undo can reach in a game with undo.
+
+        Args:
+            token (Snapshot): A token from snapshot
+
+        Raises:
+            ValueError: If the history leading to the token has been cut off
+        """
+        undo, redo = [], []
+        current, target = self.change, token.change
+        while current is not target:
+            if target is None or (current is not None and current.depth > target.depth):
+                change = current
+                undo.append(current)
+                current = current.parent
+            else:
+                change = target
+                redo.append(target)
+                target = target.parent
+            if change.cut:
+                raise ValueError("The snapshot is older than the game's undo history")
+        for change in undo:
+            self.apply_change(change, undo=True)
+        for change in reversed(redo):
+            self.apply_change(change, undo=False)
+        self.change = token.change
+        self.hero.set_state(token.hero)
+        for field, value in zip(SNAPSHOT_FIELDS, token.fields):
+            setattr(self, field, value)
+        if token.dice is not None:
+            self.dice.set_lane_state(0, token.dice)
+
+    def apply_change(self, change, undo):
+        """Undo or redo one change to the maze.
+
+        Args:
+            change (Change): The change
+            undo (bool): True to undo it, False to make it again
+        """
+        if change.row is None:
+            change.cell.health = change.before if undo else change.after
+            return
+        if undo:
+            self.grid.put(change.row, change.col, change.cell)
+            if self.index is not None:
+                from spatial import kind_of
+                self.index.add(change.row, change.col, kind_of(change.cell))
+        else:
+            self.grid.clear(change.row, change.col)
+            if self.index is not None:
+                self.index.remove(change.row, change.col)
+
+    def trim_history(self):
+        """Drop the undo states beyond undo_levels and forget the changes from before the oldest left."""
+        undo_stack = self.undo_stack
+        if len(undo_stack) <= self.undo_levels:
+            return
+        del undo_stack[:-self.undo_levels]
+        oldest = undo_stack[0].change
+        if oldest is not None and oldest.parent is not None:
+            oldest.parent = None
+            oldest.cut = True
+
+    def undo(self, events):
+        """Take back the last action, if undo is enabled and there is one.
+
+        Args:
+            events (list): Events are appended to this list
+        """
+        if not self.undo_stack:
+            events.append(("nothing_to_undo",))
+            return
+        self.redo_stack.append(self.snapshot())
+        self.restore(self.undo_stack.pop())
+        events.append(("undone", self.hero_position))
+
+    def redo(self, events):
+        """Make an action that was taken back again.
+
+        Args:
+            events (list): Events are appended to this list
+        """
+        if not self.redo_stack:
+            events.append(("nothing_to_redo",))
+            return
+        self.undo_stack.append(self.snapshot())
+        self.restore(self.redo_stack.pop())
+        events.append(("redone", self.hero_position))
+
+    def observation(self) -> dict:
+        """Return a snapshot of everything a player can see.
+
+        Returns:
+            dict: The hero's position, stats and inventory plus the game mode
+        """
+        hero = self.hero
+        return {
+            "position": self.hero_position,
+            "mode": self.mode,
+            "health": hero.health,
+            "max_health": hero.max_health,
+            "accuracy": hero.accuracy,
+            "defence": hero.defence,
+            "stealth": hero.stealth,
+            "coins": hero.coins,
+            "potions": hero.potions,
+            "turns": self.turns,
+            "outcome": self.outcome,
+        }
+
+    def step(self, action):
+        """Apply one action to the game.
+
+        Args:
+            action (str): The action to take
+
+        Returns:
+            tuple: (observation, events, done)
+        """
+        events = []
+        self.act(action, events)
+        return self.observation(), events, self.done
+
+    def act(self, action, events):
+        """Apply one action, like step, without building an observation.
+
+        Args:
+            action (str): The action to take
+            events (list): Events are appended to this list
+        """
+        if self.done:
+            return
+
+        if self.undo_levels and action in ("undo", "redo"):
+            if action == "undo":
+                self.undo(events)
+            else:
+                self.redo(events)
+            return
+
+        if self.mode == SHOP:
+            valid = action in SHOP_ACTIONS
+        else:
+            valid = action in MAZE_ACTIONS
+        if not valid:
+            events.append(("invalid_action", action))
+            return
+
+        if self.undo_levels:
+            self.undo_stack.append(self.snapshot())
+            self.trim_history()
+            self.redo_stack.clear()
+
+        self.turns += 1
+        if action == "quit":
+            self.finish("quit")
+            events.append(("quit",))
+        elif self.mode == SHOP:
+            self.trade(action, events)
+        elif action == "heal":
+            self.heal(events)
+        else:
+            self.move(action, events)
+
+    def run(self, actions):
+        """Apply many actions in turn, as act would, without reporting any events.
+
+        The fast path for replaying long logs. Moves into empty cells and into
+        the edge of the maze, most of a long game, change nothing but the hero's
+        position and the turn count, so they are made in a tight loop that keeps
+        those in locals; every other action goes through act. With undo, the
+        states before such moves are only added to the undo history when the
+        loop hands over to act, and only the last undo_levels of them.
+
+        A game whose class overrides step, act, move or enter_cell, or has them
+        wrapped by metrics.Metrics, plays every action through step instead.
+
+        Args:
+            actions (iterable): The actions to take
+        """
+        owner = type(self)
+        if (owner.step, owner.act, owner.move, owner.enter_cell) != _RUN_METHODS:
+            step = self.step
+            for action in actions:
+                step(action)
+            return
+
+        act = self.act
+        events = []
+        directions = DIRECTIONS
+        rows, cols = self.rows, self.cols
+        goal = self.goal
+        cell = self.grid.cell
+        # Flat indices of cells seen empty. Only undo and redo fill a cell again.
+        empty = set()
+        # (row, col, turns) before each move of the loop not yet in the undo history
+        moved = deque(maxlen=self.undo_levels) if self.undo_levels else None
+        row, col = self.hero_position
+        turns = self.turns
+        fast = self.mode == MAZE and not self.done
+        for action in actions:
+            offset = directions.get(action)
+            if fast and offset is not None:
+                new_row = row + offset[0]
+                new_col = col + offset[1]
+                if not (0 <= new_row < rows and 0 <= new_col < cols):
+                    if moved is not None:
+                        moved.append((row, col, turns))
+                    turns += 1
+                    continue
+                index = new_row * cols + new_col
+                if index in empty or ((new_row, new_col) != goal and cell(new_row, new_col) is None):
+                    if len(empty) >= RUN_EMPTY_CELLS:
+                        empty.clear()
+                    empty.add(index)
+                    if moved is not None:
+                        moved.append((row, col, turns))
+                    row, col = new_row, new_col
+                    turns += 1
+                    continue
+            self.hero_position = (row, col)
+            self.turns = turns
+            if moved:
+                self.save_moves(moved)
+            act(action, events)
+            events.clear()
+            if self.done:
+                return
+            if action == "undo" or action == "redo":
+                empty.clear()
+            row, col = self.hero_position
+            turns = self.turns
+            fast = self.mode == MAZE
+        self.hero_position = (row, col)
+        self.turns = turns
+        if moved:
+            self.save_moves(moved)
+
+    def save_moves(self, moved):
+        """Add the states before the moves run made in its loop to the undo history.
+
+        Those moves changed only the hero's position and the turn count, so the
+        states are the current one with those put back.
+
+        Args:
+            moved (collections.deque): (row, col, turns) before each move, emptied here
+        """
+        change, hero, fields, dice = self.snapshot()
+        middle = fields[1:-2]
+        append = self.undo_stack.append
+        for row, col, turns in moved:
+            append(Snapshot(change, hero, ((row, col),) + middle + (turns, fields[-1]), dice))
+        moved.clear()
+        self.trim_history()
+        self.redo_stack.clear()
+
+    def finish(self, outcome):
+        """Mark the game as finished.
+
+        Args:
+            outcome (str): "won", "lost" or "quit"
+        """
+        self.done = True
+        self.outcome = outcome
+        self.mode = MAZE
+        self.shopkeeper = None
+
+    def move(self, direction, events):
+        """Move the hero one cell and resolve whatever is in the new cell.
+
+        Args:
+            direction (str): One of the keys of DIRECTIONS
+            events (list): Events are appended to this list
+        """
+        row_offset, col_offset = DIRECTIONS[direction]
+        new_row = self.hero_position[0] + row_offset
+        new_col = self.hero_position[1] + col_offset
+
+        # Check if move is within grid bounds
+        if not (0 <= new_row < self.rows and 0 <= new_col < self.cols):
+            events.append(("blocked", direction))
+            return
+
+        self.hero_position = (new_row, new_col)
+        if self.hero_position == self.goal:
+            self.finish("won")
+            events.append(("won", self.hero_position))
+            return
+        events.append(("moved", self.hero_position))
+        self.enter_cell(events)
+
+    def spatial_index(self):
+        """Return the index of what is where in this game's maze, building it on first use.
+
+        Returns:
+            spatial.SpatialIndex: The index, kept up to date as cells are emptied
+        """
+        if self.index is None:
+            from spatial import SpatialIndex
+            self.index = SpatialIndex(self.grid)
+        return self.index
+
+    def clear_cell(self, row, col):
+        """Empty a cell of the maze, once it has been looted or its monster slain.
+
+        The change is added to the game's history for restore, if recording, and
+        the spatial index (if built) and the cleared-cell hash are updated too, so
+        each cell must only be emptied once.
+        """
+        if self.recording:
+            self.change = Change(self.change, row, col, self.grid.cell(row, col))
+        self.grid.clear(row, col)
+        self.cleared_key ^= cell_key(row * self.cols + col)
+        if self.index is not None:
+            self.index.remove(row, col)
+
+    def enter_cell(self, events):
+        """Process events at hero's current position.
+
+        Args:
+            events (list): Events are appended to this list
+        """
+        row, col = self.hero_position
+        cell = self.grid.cell(row, col)
+
+        if cell is None:
+            events.append(("empty",))
+        elif isinstance(cell, Monster):
+            events.append(("monster", cell.name))
+            self.fight(cell, events)
+        elif isinstance(cell, TreasureChest):
+            self.hero.empty_chest(cell)
+            events.append(("chest", cell.num_of_coins))
+            self.clear_cell(row, col)
+        elif isinstance(cell, HealingPotion):
+            self.hero.potions += 1
+            events.append(("potion_found", self.hero.potions))
+            self.clear_cell(row, col)
+        elif isinstance(cell, Shopkeeper):
+            self.mode = SHOP
+            self.shopkeeper = cell
+            events.append(("shop_open",))
+        else:
+            events.append(("unknown_cell",))
+
+    def fight(self, enemy, events):
+        """Fight the enemy until either side is defeated.
+
+        The result is worked out in one go by resolve_fight, or rolled by
+        roll_fight in a stochastic game. A ("fight", ...) event summarises it; in
+        verbose mode the attacks of every round are reported first.
+        If neither side is able to harm the other, the fight is a stalemate and the
+        monster is left where it is.
+
+        Args:
+            enemy (Monster): The monster the hero is fighting
+            events (list): Events are appended to this list
+        """
+        hero = self.hero
+        if self.stochastic:
+            attacks = [] if self.verbose else None
+            result = roll_fight(hero, enemy, self.dice, events=attacks)
+        else:
+            result = resolve_fight(hero, enemy)
+        if result.winner is None:
+            events.append(("stalemate", enemy.name))
+            return
+
+        if self.stochastic:
+            if attacks:
+                events.extend(attacks)
+        elif self.verbose:
+            self.replay_fight(result, enemy, events)
+        hero.health = result.hero_health
+        if enemy.health != result.enemy_health:
+            if self.recording:
+                self.change = Change(self.change, None, None, enemy, enemy.health, result.enemy_health)
+            enemy.health = result.enemy_health
+        events.append(("fight", result.rounds, hero.health, enemy.health))
+
+        if result.winner == "hero":
+            events.append(("monster_slain", enemy.name))
+            row, col = self.hero_position
+            self.clear_cell(row, col)
+        else:
+            self.finish("lost")
+            events.append(("defeated",))
+
+    def replay_fight(self, result, enemy, events):
+        """Report every attack of a resolved fight, round by round.
+
+        Args:
+            result (FightOutcome): The resolved fight
+            enemy (Monster): The monster the hero fought
+            events (list): Events are appended to this list
+        """
+        hero_health = self.hero.health
+        enemy_health = enemy.health
+        for round_number in range(1, result.rounds + 1):
+            if result.hero_damage:
+                enemy_health = max(enemy_health - result.hero_damage, 0)
+                events.append(("hero_attack", result.hero_damage, enemy_health))
+            else:
+                events.append(("hero_miss",))
+            if enemy_health <= 0:
+                break
+            if result.enemy_damage:
+                hero_health = max(hero_health - result.enemy_damage, 0)
+                events.append(("monster_attack", result.enemy_damage))
+            else:
+                events.append(("monster_miss",))
+
+    def heal(self, events):
+        """Drink a healing potion if the hero has one and is hurt.
+
+        Args:
+            events (list): Events are appended to this list
+        """
+        hero = self.hero
+        if not hero.potions:
+            events.append(("no_potions",))
+        elif hero.health >= hero.max_health:
+            events.append(("full_health",))
+        else:
+            hero.heal(HealingPotion())
+            events.append(("healed", hero.health))
+
+    def trade(self, action, events):
+        """Buy something from the current shopkeeper, or leave the shop.
+
+        Args:
+            action (str): "potion", one of STATS, or "leave"
+            events (list): Events are appended to this list
+        """
+        hero = self.hero
+        shopkeeper = self.shopkeeper
+        if action == "leave":
+            self.mode = MAZE
+            self.shopkeeper = None
+            events.append(("shop_closed",))
+        elif action == "potion":
+            if hero.coins < shopkeeper.store["healing_potion"]:
+                events.append(("not_enough_coins",))
+            else:
+                shopkeeper.sell_potion(hero)
+                events.append(("bought_potion", hero.potions, hero.coins))
+        else:
+            if hero.coins < shopkeeper.store[f"{action}_boost"]:
+                events.append(("not_enough_coins",))
+            elif getattr(hero, action) >= 10:
+                events.append(("stat_maxed", action))
+            else:
+                shopkeeper.upgrade_stat(hero, action)
+                events.append(("upgraded", action, getattr(hero, action), hero.coins))
+
+
+# The methods GameEngine.run can skip: only while they are these does it take its fast path
+_RUN_METHODS = (GameEngine.step, GameEngine.act, GameEngine.move, GameEngine.enter_cell)
+
+
+class TurnScheduler(object):
+    """Runs a game one turn at a time in a flat loop.
+
+    The scheduler is a small state machine. On each tick it asks the action source
+    for the next action, applies it with GameEngine.step and hands the events to
+    the listener, until the engine reports that the game is done. Nothing calls back
+    into the loop, so the stack depth stays the same however long a session runs.
+
+    Attributes:
+        engine (GameEngine): The game being played
+        choose_action (callable): Called with the engine, returns the next action
+            or None if there is nothing to apply this tick
+        on_events (callable): Called with the events of every applied action
+        ticks (int): Number of times an action has been requested
+    """
+
+    def __init__(self, engine, choose_action, on_events=None):
+        self.engine = engine
+        self.choose_action = choose_action
+        self.on_events = on_events
+        self.ticks = 0
+
+    def run(self, max_ticks=None):
+        """Play until the game is done or max_ticks actions have been requested.
+
+        Args:
+            max_ticks (int): Optional limit on the number of ticks
+
+        Returns:
+            bool: Whether the game is done
+        """
+        engine = self.engine
+        choose_action = self.choose_action
+        on_events = self.on_events
+        while not engine.done:
+            if max_ticks is not None and self.ticks >= max_ticks:
+                break
+            self.ticks += 1
+            action = choose_action(engine)
+            if action is None:
+                continue
+            events = engine.step(action)[1]
+            if on_events is not None:
+                on_events(events)
+        return engine.done
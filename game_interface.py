@@ -6,234 +6,290 @@ This module creates the interface through which the user plays the game.
 This module focuses on creating the interaction between the users and the game, as well
 as the visuals of the game.
 """
+import importlib
+import threading
+
 from game_model import *
-import sys
+from game_engine import GameEngine, TurnScheduler, DIRECTIONS, STATS, SHOP
+
+
+# How many moves a player can take back
+UNDO_LEVELS = 20
+
+
+# Modules a game needs that are slow to import, see preload
+SLOW_MODULES = ("maze", "numpy.random")
+
 
 class QuitGameException(Exception):
     pass
 
-class Game(object):
-    """A class representing the state and flow of the game.
-    
-    This class manages the game state, including the hero's position, movement,
-    combat, interactions with items and NPCs, and overall game progression.
-    
+
+def preload():
+    """Start importing the modules that build the maze in a background thread.
+
+    Importing NumPy takes most of the time to start a game. Calling this before
+    waiting for the player lets it happen while they read and type; a game
+    created before it is done simply waits for the import to finish.
+
+    Returns:
+        threading.Thread: The thread doing the imports
+    """
+    thread = threading.Thread(target=lambda: [importlib.import_module(name) for name in SLOW_MODULES],
+                              name="preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def describe(event):
+    """Turn an engine event into the text shown to the player.
+
+    Args:
+        event (tuple): An event produced by GameEngine.step
+
+    Returns:
+        str: The message for the player
+    """
+    kind = event[0]
+    match kind:
+        case "invalid_action":
+            return "Invalid choice. Please try again."
+        case "blocked":
+            return "You can't move that way!"
+        case "won":
+            return f"{event[1]}\nWell done, you won!"
+        case "moved":
+            return ""
+        case "empty":
+            return "Yay! No scary monsters here."
+        case "monster":
+            return "Aaargh! A terrifying monster!"
+        case "hero_attack":
+            return f"You did {event[1]} damage. Enemy health: {event[2]}"
+        case "hero_miss":
+            return "Your accuracy is too low to harm this enemy."
+        case "monster_attack":
+            return f"The enemy did {event[1]} damage."
+        case "monster_miss":
+            return "The enemy's accuracy is too low to harm you."
+        case "fight":
+            return f"The fight lasted {event[1]} rounds."
+        case "monster_slain":
+            return "Yay! We smashed the nasty beastie to pieces!"
+        case "stalemate":
+            return f"Neither you nor the {event[1]} can land a blow. You slip away."
+        case "defeated":
+            return "💀 Game Over. You were defeated."
+        case "chest":
+            return f"Oooooh! A treasure chest. I hope there are a lot of coins inside!\nYou found {event[1]} coins!"
+        case "potion_found":
+            return "Wow! You found a healing potion! That's surely going to be useful!"
+        case "shop_open":
+            return "You found Bert the Shopkeeper!"
+        case "healed":
+            return f"You feel rejuvenated! You now have {event[1]} lifepoints."
+        case "full_health":
+            return "Don't waste your potions. You have full life points."
+        case "no_potions":
+            return "No healing potions available."
+        case "bought_potion":
+            return f"Healing potion added to pouch.\nYou have {event[2]} coins left."
+        case "upgraded":
+            return f"Your {event[1]} is now {event[2]}\nYou now have {event[3]} coins left"
+        case "stat_maxed":
+            return "Stat already at max."
+        case "not_enough_coins":
+            return "Not enough coins."
+        case "shop_closed":
+            return "You chose not to buy anything."
+        case "quit":
+            return "\nGoodbye. Come back soon!"
+        case "undone":
+            return f"Move taken back. You are at {event[1]}."
+        case "redone":
+            return f"Move made again. You are at {event[1]}."
+        case "nothing_to_undo":
+            return "There is nothing to undo."
+        case "nothing_to_redo":
+            return "There is nothing to redo."
+    return "Unexpected object encountered."
+
+
+class Game(GameEngine):
+    """The terminal front end of the game.
+
+    This class layers the prompting sequence on top of the rules in GameEngine.
+    Every choice the player makes is turned into an action for GameEngine.step and
+    the resulting events are printed.
+
     Attributes:
         hero (Character): The player's character (Warrior, Mage, or Archer)
-        grid (List[List]): The 2D maze grid containing game objects
+        grid (MazeView): This game's view of the maze
         hero_position (tuple): Current (row, col) position of hero in the maze
+        log (replay.ReplayWriter): Where the session is recorded, if anywhere
     """
-    def __init__(self, hero, grid = [
-            [None, TreasureChest(), Shopkeeper(), TreasureChest(), None],
-            [HealingPotion(), None, Monster("Orc"), None, None],
-            [None, TreasureChest(), None, Monster("Troll"), None],
-            [Monster("Skeleton"), None, HealingPotion(), None, Shopkeeper()],
-            [None, None, Monster("Dragon"), TreasureChest(), None]
-        ]):
+    def __init__(self, hero, grid=None, seed=None, log=None, endless=False):
         """Initialize a new game instance.
         
         Args:
             hero (Character): The player's chosen character
-            grid (List[List]): The 2D maze grid
+            grid (List[List]): The 2D maze grid. Defaults to a fresh view of the
+                shared default maze.
+            seed (int): Seed for the game, which also picks the default maze's rolls
+            log (replay.ReplayWriter): Records the game and every action, so it
+                can be replayed. Needs the default maze and a seed.
+            endless (bool): Play in the endless world of world.py, grown from the
+                seed, instead of the default maze
         """
-        self.hero = hero
-        self.rows = 5
-        self.cols = 5
-        self.grid = grid
-        self.hero_position = (0, 0)  # Start at top-left corner
+        if log is not None and (grid is not None or seed is None):
+            raise ValueError("A recorded game needs a seed and the default maze")
+        if endless:
+            if grid is not None:
+                raise ValueError("An endless game makes its own maze")
+            from world import ChunkedMaze
+            grid = ChunkedMaze(seed)
+        elif grid is None:
+            from maze import default_maze
+            grid = default_maze(seed)
+        super().__init__(hero, grid, verbose=True, seed=seed, undo_levels=UNDO_LEVELS)
+        self.log = log
+        if log is not None:
+            log.game(seed, seed, UNDO_LEVELS, endless=endless)
+            log.hero(hero)
         print(f"\nWelcome to the Maze, {hero.name}!")
+
+    @classmethod
+    def load(cls, path, seed=None):
+        """Load a game saved with save, to carry on playing it. It is not recorded."""
+        game = super().load(path, verbose=True, seed=seed)
+        game.log = None
+        return game
+
+    def clone(self):
+        """Return an independent copy of this game, which is not recorded."""
+        twin = super().clone()
+        twin.log = None
+        return twin
+
+    def act(self, action, events):
+        """Apply one action, recording it first if the game is being recorded."""
+        if self.log is not None:
+            self.log.action(action)
+        super().act(action, events)
+
+    def show(self, events):
+        """Print the description of each event.
+
+        Args:
+            events (list): Events returned by GameEngine.step
+        """
+        for event in events:
+            print(describe(event))
     
+    def play(self):
+        """Run the game in the terminal until it is over."""
+        TurnScheduler(self, self.next_action, self.game_turn).run()
+
     def user_turn(self):
         """Display turn indicator for the player."""
         print(f"\n🔹 It's {self.hero.name}'s turn 🔹")
         print(f"{self.hero_position} is your current position")
+
+    def next_action(self, engine):
+        """Ask the player for their next action.
+
+        Args:
+            engine (GameEngine): The game being played (this game)
+
+        Returns:
+            str: The chosen action, or None if the input was not a valid choice
+        """
+        if self.mode == SHOP:
+            return self.visit_shopkeeper()
+        return self.prompt_user()
         
     def prompt_user(self):
-        """Prompt user for their action choice and handle the input.
+        """Prompt user for their action choice.
         
         Available actions:
         - Move: Navigate the maze
         - Heal: Use a healing potion if available
         - Quit: End the game
-        
-        Raises:
-            QuitGameException: If player chooses to quit
+        - Undo / Redo: Take back the last action, or make it again
+
+        Returns:
+            str: The chosen action, or None if the input was not a valid choice
         """
-        while True:
-            # Display action menu
-            print("\nChoose an action:\nA. Move\nB. Heal\nC. Quit")
-            choice = input("Enter your choice: ").strip().lower()
-            
-            if choice == 'a':
-                self.move_hero()
-                break
-            elif choice == 'b':
-                if self.hero.potions:
-                    potion = HealingPotion()
-                    if self.hero.health < self.hero.max_health:
-                        self.hero.heal(potion)
-                        self.hero.potions -= 1
-                        print(f"You feel rejuvenated! {self.hero.name} now has {self.hero.health} lifepoints.")
-                    elif self.hero.health == self.hero.max_health:
-                        print("Don't waste your potions. You have full life points.")
-                else:
-                    print("No healing potions available.")
-            elif choice == 'c':
-                sys.exit("\nGoodbye. Come back soon!")
-            else:
-                print("Invalid choice. Please try again.")
+        # Display action menu
+        print("\nChoose an action:\nA. Move\nB. Heal\nC. Quit\nD. Undo\nE. Redo")
+        choice = input("Enter your choice: ").strip().lower()
+        
+        if choice == 'a':
+            return self.move_hero()
+        elif choice == 'b':
+            return "heal"
+        elif choice == 'c':
+            return "quit"
+        elif choice == 'd':
+            return "undo"
+        elif choice == 'e':
+            return "redo"
+        print("Invalid choice. Please try again.")
+        return None
     
     def move_hero(self):
-        """Handle hero movement in the maze.
-        
-        Gets direction input from user and updates hero position if valid.
-        Triggers appropriate events based on destination cell contents.
+        """Ask the player which direction to move the hero.
+
+        Returns:
+            str: The direction, or None if it was not a valid direction
         """
-        # Define possible movement directions and their coordinate changes
-        directions = {'up': (-1, 0), 'down': (1, 0), 'left': (0, -1), 'right': (0, 1)}
         direction = input("Which direction? (up/down/left/right): ").strip().lower()
 
-        if direction not in directions:
+        if direction not in DIRECTIONS:
             print("Invalid direction.")
-            return
-
-        # Calculate new position
-        row_offset, col_offset = directions[direction]
-        new_row = self.hero_position[0] + row_offset
-        new_col = self.hero_position[1] + col_offset
-
-        # Check if move is within grid bounds
-        if 0 <= new_row < len(self.grid) and 0 <= new_col < len(self.grid[0]):
-            self.hero_position = (new_row, new_col)
-            if self.hero_position == (4, 4):
-                print(self.hero_position, end="")
-                print("\nWell done, you won!")
-                exit()
-            self.game_turn()  # Process events at new position
-        else:
-            print("You can't move that way!")
-        
-    def game_turn(self):
-        """Process events at hero's current position.
+            return None
+        return direction
         
-        Handles interactions with:
-        - Monsters (combat)
-        - Treasure chests (coin collection)
-        - Healing potions (item pickup)
-        - Shopkeeper (trading)
-        """
-        cell = self.grid[self.hero_position[0]][self.hero_position[1]]
-        
-        print()
-        # Handle different cell contents
-        if cell is None:
-            print("Yay! No scary monsters here.")
-        elif isinstance(cell, Monster):
-            print("Aaargh! A terrifying monster!")
-            self.fight(cell)
-        elif isinstance(cell, TreasureChest):
-            print("Oooooh! A treasure chest. I hope there are a lot of coins inside!")
-            print(f"{self.hero.name} found {cell.num_of_coins} coins!")
-            self.hero.coins = cell.num_of_coins
-            self.grid[self.hero_position[0]][self.hero_position[1]] = None
-        elif isinstance(cell, HealingPotion):
-            print("Wow! You found a healing potion! That's surely going to be useful!")
-            self.hero.potions += 1
-            self.grid[self.hero_position[0]][self.hero_position[1]] = None
-        elif isinstance(cell, Shopkeeper):
-            print("You found Bert the Shopkeeper!")
-            self.visit_shopkeeper(cell)
-        else:
-            print("Unexpected object encountered.")
+    def game_turn(self, events):
+        """Show what happened after an action.
+
+        After a move into a new cell, or on leaving a shop, the turn indicator is
+        shown again.
         
-        # Continue game flow
-        self.user_turn()    
-        self.prompt_user()
-    
-    def fight(self, enemy):
-        """
-        Simulates a turn-based battle between the hero and an enemy.
-        The fight continues until either the hero or the enemy is defeated (health reaches 0).
-        Each turn consists of the hero attacking first, followed by the enemy's counter-attack
-        if they survive.
         Args:
-            enemy (Enemy): The enemy character object that the hero is fighting against
-        Returns:
-            None: The method either continues until combat is resolved or calls game_over()
-            if the hero is defeated
-        Side effects:
-            - Modifies hero and enemy health values during combat
-            - Prints combat results to console after each attack
-            - May trigger game_over() if hero is defeated
+            events (list): Events returned by GameEngine.step
         """
-        while self.hero.health > 0 and enemy.health > 0:
-            damage = self.hero.attack(enemy)
-            if type(damage) == float or type(damage) == int:
-                print(f"You did {damage} damage. Enemy health: {enemy.health}")
-            else:
-                print(damage)
-            if enemy.health <= 0:
-                print("Yay! We smashed the nasty beastie to pieces!")
-                return
-
-            damage = enemy.attack(self.hero)
-            if type(damage) == float or type(damage) == int:
-                print(f"The enemy did {damage} damage.")
-            else:
-                print(damage)
-            
-
-
-        if self.hero.health <= 0:
-            self.game_over()
+        self.show(events)
+        if self.done or self.mode == SHOP or not events:
+            return
+        if events[0][0] in ("moved", "shop_closed", "undone", "redone"):
+            self.user_turn()
     
-    def visit_shopkeeper(self, shopkeeper):
-        """Handle shopping interaction with the shopkeeper.
-        
-        Args:
-            shopkeeper (Shopkeeper): The shopkeeper NPC to interact with
+    def visit_shopkeeper(self):
+        """Ask the player what they would like to buy from the shopkeeper.
             
         Available purchases:
         - Healing Potion (10 coins)
         - Stat Upgrade (20 coins)
+
+        Returns:
+            str: The chosen shop action, or None if the input was not a valid choice
         """
-        while True:
-            print("\nWhat would you like to buy?\nA. Healing Potion (10 coins)\nB. Stat Upgrade (20 coins)\nC. Nothing")
-            choice = input("Enter your choice: ").strip().lower()
-
-            if choice == 'a':
-                if self.hero.coins >= 10:
-                    shopkeeper.sell_potion(self.hero)
-                    self.hero.potions += 1
-                    print("Healing potion added to pouch.")
-                    print(f"{self.hero.name} has {self.hero.coins} coins left.")
-                else:
-                    print("Not enough coins.")
-            elif choice == 'b':
-                if self.hero.coins >= 20:
-                    stat = input("Which stat would you like to upgrade? Accuracy, defence or stealth. ").lower()
-                    upgraded = shopkeeper.upgrade_stat(self.hero, stat)
-                    if upgraded:
-                        match stat:
-                            case "accuracy":
-                                print(f"Your {stat} is now {self.hero.accuracy}")
-                            case "defence": 
-                                print(f"Your {stat} is now {self.hero.defence}")
-                            case "stealth":
-                                print(f"Your {stat} is now {self.hero.stealth}")
-                        print(f"You now have {self.hero.coins} coins left")
-                    else:
-                        print("Stat already at max.")
-                else:
-                    print("Not enough coins.")
-            elif choice == 'c':
-                print("You chose not to buy anything.")
-                break
-            else:
-                print("Invalid choice.")
-    
-    def game_over(self):
-        """Handle game over state when hero is defeated."""
-        print("💀 Game Over. You were defeated.")
-        exit()
+        print("\nWhat would you like to buy?\nA. Healing Potion (10 coins)\nB. Stat Upgrade (20 coins)\nC. Nothing")
+        choice = input("Enter your choice: ").strip().lower()
 
+        if choice == 'a':
+            return "potion"
+        elif choice == 'b':
+            if self.hero.coins < 20:
+                print("Not enough coins.")
+                return None
+            stat = input("Which stat would you like to upgrade? Accuracy, defence or stealth. ").strip().lower()
+            if stat in STATS:
+                return stat
+            print("Invalid stat!")
+            return None
+        elif choice == 'c':
+            return "leave"
+        print("Invalid choice.")
+        return None
@@ -10,7 +10,51 @@
 
 from abc import ABC, abstractmethod
 import random
-import re
+
+
+def tier_multiplier(hit_chance):
+    """The multiplier of an attacker's power for an attack with this hit chance.
+
+    Args:
+        hit_chance (float): The attacker's hit chance against the defender
+
+    Returns:
+        float: 1.5, 1 or 0.5, or 0 if the attack cannot harm the defender
+    """
+    if hit_chance > 0.7:
+        return 1.5
+    elif hit_chance > 0.5:
+        return 1
+    elif hit_chance > 0.3:
+        return 0.5
+    return 0
+
+
+# Stats are whole numbers from 0 to 10, so the multiplier of every attack can be
+# looked up instead of worked out: DAMAGE_MULTIPLIERS[accuracy][defence][stealth]
+# is tier_multiplier of an attacker with that accuracy against a defender with
+# that defence and stealth.
+DAMAGE_MULTIPLIERS = tuple(
+    tuple(tuple(tier_multiplier((1 - stealth * defence / 100) * accuracy / 10) for stealth in range(11))
+          for defence in range(11))
+    for accuracy in range(11))
+
+
+def damage_multiplier(attacker, defender):
+    """Looks up the multiplier of an attacker's power against a defender.
+
+    Args:
+        attacker (Character): The attacking character
+        defender (Character): The defending character
+
+    Returns:
+        float: The same as tier_multiplier(attacker.hit_chance(defender))
+    """
+    try:
+        return DAMAGE_MULTIPLIERS[attacker._accuracy][defender._defence][defender._stealth]
+    except (IndexError, TypeError):
+        # A stat set outside the table's whole numbers from 0 to 10
+        return tier_multiplier(attacker.hit_chance(defender))
 
 
 class Character(ABC):
@@ -24,6 +68,9 @@ class Character(ABC):
         stealth (int): The Character's stealth rating
         health (int): The Character's current health
     """
+    # Fixed attribute slots instead of a per-instance __dict__
+    __slots__ = ("name", "max_health", "power", "_health", "_accuracy", "_defence",
+                 "_stealth", "_coins", "_potions")
 
     def __init__(self, name: str, max_health: float = 100, accuracy = 8, defence = 8, stealth = 8):
         """Initialises a Character object.
@@ -41,6 +88,42 @@ class Character(ABC):
         self._coins = 0
         self._potions = 1
     
+    def __copy__(self):
+        """Returns a copy of the character, e.g. for a bot to try out moves with.
+
+        Returns:
+            Character: A new character of the same class with the same stats
+        """
+        twin = self.__class__.__new__(self.__class__)
+        twin.name = self.name
+        twin.max_health = self.max_health
+        twin.power = self.power
+        twin._health = self._health
+        twin._accuracy = self._accuracy
+        twin._defence = self._defence
+        twin._stealth = self._stealth
+        twin._coins = self._coins
+        twin._potions = self._potions
+        return twin
+
+    def get_state(self) -> tuple:
+        """Returns every stat of the character that can change during a game.
+
+        Returns:
+            tuple: The stats, to be given back to set_state
+        """
+        return (self.max_health, self.power, self._health, self._accuracy, self._defence,
+                self._stealth, self._coins, self._potions)
+
+    def set_state(self, state):
+        """Puts back stats saved by get_state, e.g. when a move is undone.
+
+        Args:
+            state (tuple): The stats returned by get_state
+        """
+        (self.max_health, self.power, self._health, self._accuracy, self._defence,
+         self._stealth, self._coins, self._potions) = state
+
     @abstractmethod
     def __str__(self):
         pass
@@ -183,19 +266,27 @@ class Character(ABC):
         """
         return (1 - enemy.dodge_chance()) * self.accuracy / 10
 
+    def damage_against(self, enemy):
+        """The damage one of this Character's attacks would do to an enemy.
+
+        Uses the same hit chance thresholds as attack, without changing anything.
+
+        Args:
+            enemy (Character): An enemy object
+
+        Returns:
+            float: The damage of one attack, or 0 if it cannot harm the enemy
+        """
+        return self.power * damage_multiplier(self, enemy)
+
     def attack(self, enemy):
         """An attack method for attacking an enemy object"""
-        if self.hit_chance(enemy) > 0.7:
-            enemy.health -= self.power * 1.5
-            return self.power * 1.5
-        elif self.hit_chance(enemy) > 0.5:
-            enemy.health -= self.power 
-            return self.power
-        elif self.hit_chance(enemy) > 0.3:
-            enemy.health -= self.power * 0.5
-            return self.power * 0.5
-        else:
+        multiplier = damage_multiplier(self, enemy)
+        if not multiplier:
             return "Your accuracy is too low to harm this enemy."
+        damage = self.power * multiplier
+        enemy.health -= damage
+        return damage
         
 
     def heal(self, potion) -> float:
@@ -243,6 +334,8 @@ class Warrior(Character):
             power(int): How hard the Warrior hits
     """
 
+    __slots__ = ()
+
     def __init__(self, name: str, max_health: int = 100):
         """Initialises a Warrior object
 
@@ -279,6 +372,8 @@ class Mage(Character):
         accuracy (int): How accurate the Mage's attacks are
     """
 
+    __slots__ = ()
+
     def __init__(self, name: str, max_health = 75):
         """Initialises a Mage Character Instance.
 
@@ -318,6 +413,8 @@ class Archer(Character):
             accuracy (int): How accurate the Archer's attacks are
     """
 
+    __slots__ = ()
+
     def __init__(self, name: str, max_health: int = 50):
         """Initialises an Archer Object
 
@@ -342,46 +439,79 @@ Accuracy: {self.accuracy}
 """
 
 
+# The classes a player can pick for their hero
+HERO_CLASSES = (Warrior, Mage, Archer)
+
+
 class Monster(Character):
-    def __init__(self, name, seed = random.seed()):
-        """Instantiates a Monster Object that inherits its methods and attributes from the Character Class."""
+    __slots__ = ()
+
+    def __init__(self, name, rng=None):
+        """Instantiates a Monster Object that inherits its methods and attributes from the Character Class.
+
+        Args:
+            name (str): The monster's name
+            rng (random.Random): Stream to roll the stats from, e.g.
+                GameRNG.stream("monsters"). Defaults to the global random module.
+        """
         super().__init__(name)
-        self.seed = seed
-        self.max_health = random.randint(40, 80)
+        rng = rng or random
+        self.max_health = rng.randint(40, 80)
         self.health = self.max_health
-        self.defence = random.randint(5, 8)
-        self.stealth = random.randint(5, 8)
-        self.power = random.randint(5, 15)
+        self.defence = rng.randint(5, 8)
+        self.stealth = rng.randint(5, 8)
+        self.power = rng.randint(5, 15)
+
+    @classmethod
+    def from_stats(cls, name, max_health, power, defence, stealth):
+        """Creates a Monster with known stats instead of random ones.
+
+        Args:
+            name (str): The monster's name
+            max_health (int): The monster's maximum (and starting) health
+            power (int): How hard the monster hits
+            defence (int): How well the monster repels attacks
+            stealth (int): How well the monster dodges attacks
+
+        Returns:
+            Monster: The new monster
+        """
+        monster = cls.__new__(cls)
+        Character.__init__(monster, name, max_health)
+        monster.power = power
+        monster.defence = defence
+        monster.stealth = stealth
+        return monster
     
     def __str__(self):
         return f"{self.name} is a nasty monster with {self.health} life points."
     
     def attack(self, hero):
         """An attack method for attacking a hero object"""
-        if self.hit_chance(hero) > 0.7:
-            hero.health -= self.power * 1.5
-            return self.power * 1.5
-        elif self.hit_chance(hero) > 0.5:
-            hero.health -= self.power 
-            return self.power
-        elif self.hit_chance(hero) > 0.3:
-            hero.health -= self.power * 0.5
-            return self.power * 0.5
-        else:
+        multiplier = damage_multiplier(self, hero)
+        if not multiplier:
             return "The enemy's accuracy is too low to harm you."
+        damage = self.power * multiplier
+        hero.health -= damage
+        return damage
         
 
 
 class TreasureChest():
     """Defines a Treasure Chest item that contains a large number of coins."""
 
-    def __init__(self):
+    def __init__(self, num_of_coins=None, rng=None):
         """Defines the number of coins in the treasure chest.
 
         Args:
-            num_of_coins (int): Number of coins in the treasure chest.
+            num_of_coins (int): Number of coins in the treasure chest. Rolled at
+                random if not given.
+            rng (random.Random): Stream to roll the coins from, e.g.
+                GameRNG.stream("chests"). Defaults to the global random module.
         """
-        self.num_of_coins = random.randint(20, 50)
+        if num_of_coins is None:
+            num_of_coins = (rng or random).randint(20, 50)
+        self.num_of_coins = num_of_coins
 
 
 class HealingPotion:
@@ -416,14 +546,16 @@ class Shopkeeper:
         
         Args:
             character (Character): The character buying the potion
+
+        Returns:
+            str: A description of the purchase, or why it failed
         """
         if character.coins < self.store["healing_potion"]:
-            print("Not enough coins!")
-            return
+            return "Not enough coins!"
         
         character.potions += 1
         character.coins -= self.store["healing_potion"]
-        print(f"Bought healing potion for {self.store['healing_potion']} coins")
+        return f"Bought healing potion for {self.store['healing_potion']} coins"
 
     def upgrade_stat(self, character, stat):
         """Upgrades a character's stat if they have enough coins.
@@ -431,15 +563,16 @@ class Shopkeeper:
         Args:
             character (Character): The character to upgrade
             stat (str): The stat to upgrade (accuracy, defence, or stealth)
+
+        Returns:
+            str: A description of the upgrade, or why it failed
         """
         if stat not in ["accuracy", "defence", "stealth"]:
-            print("Invalid stat!")
-            return
+            return "Invalid stat!"
             
         cost = self.store[f"{stat}_boost"]
         if character.coins < cost:
-            print("Not enough coins!")
-            return
+            return "Not enough coins!"
 
         current_value = getattr(character, stat)
         setattr(character, stat, current_value + 1)
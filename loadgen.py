@@ -0,0 +1,152 @@
+"""
+loadgen.py
+
+Load generator for server.py.
+
+Opens many concurrent sessions that play like slow humans: they think for a
+while between moves, so most sessions are idle most of the time. Each session
+measures the time from sending an action to receiving the status line that ends
+the reply. When a game ends, the session starts a new one.
+
+Usage:
+    python loadgen.py [sessions] [seconds] [think time] [port | unix socket path]
+
+When no server address is given, a server is started in the same process. For
+latency figures, run the server in its own process so the two do not compete.
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+
+from server import GameServer
+
+MOVES = ("up", "down", "left", "right")
+
+
+async def read_reply(reader):
+    """Read lines until the status line and return its kind and observation."""
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        if line.startswith(b"OK ") or line.startswith(b"DONE "):
+            kind, _, observation = line.decode().partition(" ")
+            return kind, json.loads(observation)
+
+
+async def client(connect, rng, ramp, measure_from, deadline, think, latencies, counts):
+    """Play games one after another until the deadline.
+
+    Args:
+        connect (callable): Opens a connection, returning (reader, writer)
+        rng (random.Random): Source of randomness for this client
+        ramp (float): Seconds over which the sessions' first connections are spread
+        measure_from (float): time.monotonic() value from which latencies are kept
+        deadline (float): time.monotonic() value at which to stop
+        think (float): Mean pause between actions, in seconds
+        latencies (list): Turn latencies are appended to this list
+        counts (dict): Counters of games and errors
+    """
+    await asyncio.sleep(rng.uniform(0, ramp))
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await connect()
+        except OSError:
+            counts["errors"] += 1
+            await asyncio.sleep(0.1)
+            continue
+        try:
+            await read_reply(reader)
+            for line in (b"Bot\n", rng.choice((b"Warrior\n", b"Mage\n", b"Archer\n"))):
+                writer.write(line)
+                await read_reply(reader)
+            kind, mode = "OK", "maze"
+            while kind == "OK":
+                pause = rng.expovariate(1 / think)
+                if time.monotonic() + pause >= deadline:
+                    return
+                await asyncio.sleep(pause)
+                action = "leave" if mode == "shop" else rng.choice(MOVES)
+                start = time.perf_counter()
+                writer.write(action.encode() + b"\n")
+                kind, observation = await read_reply(reader)
+                if time.monotonic() >= measure_from:
+                    latencies.append(time.perf_counter() - start)
+                mode = observation["mode"]
+            counts["games"] += 1
+        except ConnectionError:
+            counts["errors"] += 1
+        finally:
+            writer.close()
+
+
+def percentile(values, fraction):
+    """Return the value below which the given fraction of the sorted values fall."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run(sessions=1000, seconds=20.0, think=2.0, target=None, ramp=5.0):
+    """Run the load test and return a summary.
+
+    Sessions connect gradually over the ramp period, and latencies are only
+    recorded once every session has had time to connect.
+
+    Args:
+        sessions (int): Number of concurrent sessions
+        seconds (float): How long to measure for, after the ramp
+        think (float): Mean pause between actions, in seconds
+        target (str): Port or Unix socket path of a running server. If None, a
+            server is started in this process on a free port.
+        ramp (float): Seconds over which the sessions connect
+
+    Returns:
+        dict: sessions, turns, turns_per_sec, p50_ms, p99_ms, max_ms, games, errors
+    """
+    listener = None
+    if target is None:
+        listener = await GameServer().serve(port=0)
+        target = str(listener.sockets[0].getsockname()[1])
+    if target.isdigit():
+        def connect():
+            return asyncio.open_connection("127.0.0.1", int(target), limit=1 << 16)
+    else:
+        def connect():
+            return asyncio.open_unix_connection(target, limit=1 << 16)
+
+    latencies = []
+    counts = {"games": 0, "errors": 0}
+    measure_from = time.monotonic() + ramp + think
+    deadline = measure_from + seconds
+    await asyncio.gather(*(client(connect, random.Random(index), ramp, measure_from, deadline,
+                                  think, latencies, counts)
+                           for index in range(sessions)))
+    if listener is not None:
+        listener.close()
+        await listener.wait_closed()
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "turns_per_sec": len(latencies) / seconds,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies, default=0) * 1000,
+        "games": counts["games"],
+        "errors": counts["errors"],
+    }
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 30.0
+    think = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+    target = sys.argv[4] if len(sys.argv) > 4 else None
+    result = asyncio.run(run(sessions, seconds, think, target))
+    print(f"{result['sessions']} sessions, {result['turns']} turns ({result['turns_per_sec']:,.0f}/s), "
+          f"{result['games']} games, {result['errors']} errors")
+    print(f"turn latency p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, "
+          f"max {result['max_ms']:.2f} ms")
@@ -0,0 +1,280 @@
+"""
+maze.py
+
+This module generates mazes of any size and stores them compactly.
+
+Instead of one Python object per cell, a Maze keeps a byte array of cell kinds
+plus side tables for the cells that need more than a kind: the stats of each
+monster and the coins in each chest. Game objects are only created when the
+hero steps onto a cell.
+
+A Maze is an immutable template. Each game plays on its own MazeView, which only
+records the cells that game has cleared, so many sessions can share one layout.
+"""
+import functools
+
+import numpy as np
+
+from game_model import TreasureChest, HealingPotion, Shopkeeper
+from population import MonsterPool, spawn_kinds, spawn_monsters
+from rng import as_game_rng, MAZE_STREAM, MONSTER_STREAM, CHEST_STREAM
+
+# Cell kinds
+EMPTY = 0
+MONSTER = 1
+CHEST = 2
+POTION = 3
+SHOPKEEPER = 4
+
+KIND_NAMES = ("empty", "monster", "chest", "potion", "shopkeeper")
+
+# Symbols used by maze_from_layout
+LAYOUT_SYMBOLS = {".": EMPTY, "C": CHEST, "P": POTION, "S": SHOPKEEPER,
+                  "O": MONSTER, "T": MONSTER, "K": MONSTER, "D": MONSTER}
+LAYOUT_MONSTERS = {"O": 0, "T": 1, "K": 2, "D": 3}
+
+# The maze played from the terminal
+DEFAULT_LAYOUT = (
+    ".CSC.",
+    "P.O..",
+    ".C.T.",
+    "K.P.S",
+    "..DC.",
+)
+
+# Number of cells generated at a time, to keep temporary arrays small
+BLOCK_CELLS = 1 << 22
+
+# Default maze templates kept for reuse, see default_maze
+DEFAULT_MAZE_CACHE = 64
+
+
+class Maze(object):
+    """A maze template stored as a cell-kind array plus side tables.
+
+    The arrays are read-only. Use session() to get a view that can be played.
+
+    Attributes:
+        rows (int): Number of rows
+        cols (int): Number of columns
+        kinds (numpy.ndarray): uint8 array of shape (rows, cols) holding cell kinds
+        monster_cells (numpy.ndarray): Sorted flat indices of the monster cells
+        monsters (MonsterPool): The stats of each monster, in monster_cells order
+        chest_cells (numpy.ndarray): Sorted flat indices of the chest cells
+        chest_coins (numpy.ndarray): uint8 number of coins in each chest
+    """
+
+    def __init__(self, kinds, monster_cells, monsters, chest_cells, chest_coins):
+        for array in (kinds, monster_cells, chest_cells, chest_coins):
+            array.flags.writeable = False
+        self.kinds = kinds
+        self.rows, self.cols = kinds.shape
+        self.monster_cells = monster_cells
+        self.monsters = monsters.freeze()
+        self.chest_cells = chest_cells
+        self.chest_coins = chest_coins
+        self._potion = HealingPotion()
+        self._shopkeeper = Shopkeeper()
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the maze's arrays in bytes."""
+        return (self.kinds.nbytes + self.monster_cells.nbytes + self.monsters.nbytes
+                + self.chest_cells.nbytes + self.chest_coins.nbytes)
+
+    def kind(self, row, col) -> int:
+        """Return the kind of a cell (EMPTY, MONSTER, CHEST, POTION or SHOPKEEPER)."""
+        return int(self.kinds[row, col])
+
+    def cell(self, row, col):
+        """Return a game object for a cell, or None if it is empty.
+
+        Monsters and chests are built from the side tables. Potions and
+        shopkeepers carry no per-cell data, so one of each is shared.
+        """
+        kind = self.kinds[row, col]
+        if kind == EMPTY:
+            return None
+        index = row * self.cols + col
+        if kind == MONSTER:
+            slot = np.searchsorted(self.monster_cells, index)
+            return self.monsters.monster(slot)
+        if kind == CHEST:
+            slot = np.searchsorted(self.chest_cells, index)
+            return TreasureChest(int(self.chest_coins[slot]))
+        if kind == POTION:
+            return self._potion
+        return self._shopkeeper
+
+    def count(self, kind) -> int:
+        """Return the number of cells of a kind."""
+        return int(np.count_nonzero(self.kinds == kind))
+
+    def session(self):
+        """Return a new, untouched view of this maze for one game."""
+        return MazeView(self)
+
+
+class MazeView(object):
+    """One game's view of a shared Maze template.
+
+    Cells only ever change by being emptied (a chest looted, a potion picked up, a
+    monster slain), so the view records the flat indices of cleared cells and
+    reads everything else from the template.
+
+    Attributes:
+        template (Maze): The shared maze
+        cleared (set): Flat indices of the cells this game has emptied
+    """
+    __slots__ = ("template", "cleared", "rows", "cols")
+
+    def __init__(self, template):
+        self.template = template
+        self.cleared = set()
+        self.rows = template.rows
+        self.cols = template.cols
+
+    def kind(self, row, col) -> int:
+        """Return the kind of a cell, taking cleared cells into account."""
+        if row * self.cols + col in self.cleared:
+            return EMPTY
+        return self.template.kind(row, col)
+
+    def cell(self, row, col):
+        """Return a game object for a cell, or None if it is empty."""
+        if row * self.cols + col in self.cleared:
+            return None
+        return self.template.cell(row, col)
+
+    def clear(self, row, col):
+        """Empty a cell for this game only."""
+        self.cleared.add(row * self.cols + col)
+
+    def put(self, row, col, cell):
+        """Undo clearing a cell. The cell gets back its contents from the template."""
+        self.cleared.discard(row * self.cols + col)
+
+    def copy(self):
+        """Return an independent view of the same template with the same cells cleared."""
+        view = MazeView(self.template)
+        view.cleared = set(self.cleared)
+        return view
+
+    def count(self, kind) -> int:
+        """Return the number of cells of a kind, taking cleared cells into account."""
+        kinds = self.template.kinds.reshape(-1)
+        if kind == EMPTY:
+            return self.template.count(EMPTY) + sum(1 for index in self.cleared if kinds[index] != EMPTY)
+        return self.template.count(kind) - sum(1 for index in self.cleared if kinds[index] == kind)
+
+
+@functools.lru_cache(maxsize=DEFAULT_MAZE_CACHE)
+def default_maze(seed=None):
+    """Return the shared template of the default 5x5 maze, building it on first use.
+
+    Templates of the DEFAULT_MAZE_CACHE seeds used last are kept, so games on the
+    same seed share one while every new seed does not add one for good.
+
+    Args:
+        seed (int): Seed for the monster stats and chest coins. Each seed has its
+            own template; games without a seed share one.
+
+    Returns:
+        Maze: The default maze template
+    """
+    return maze_from_layout(DEFAULT_LAYOUT, seed)
+
+
+def roll_chest_coins(rng, n):
+    """Roll the coins of n chests the same way TreasureChest does."""
+    return rng.integers(20, 51, n).astype(np.uint8)
+
+
+def maze_from_layout(layout, seed=None):
+    """Build a maze template from a hand-drawn layout.
+
+    Each row is a string of symbols: "." empty, "C" treasure chest, "P" healing
+    potion, "S" shopkeeper, and "O", "T", "K" or "D" for an Orc, Troll, Skeleton
+    or Dragon. Monster stats are rolled from their archetypes and chest coins as
+    usual.
+
+    Args:
+        layout (list): One string per row, all the same length
+        seed (int): Seed, or a rng.GameRNG, for the monster and chest streams
+
+    Returns:
+        Maze: The maze template
+    """
+    rng = as_game_rng(seed)
+    symbols = [symbol for row in layout for symbol in row]
+    kinds = np.array([LAYOUT_SYMBOLS[symbol] for symbol in symbols], dtype=np.uint8)
+    monster_cells = np.flatnonzero(kinds == MONSTER)
+    names = [LAYOUT_MONSTERS[symbols[index]] for index in monster_cells]
+    chest_cells = np.flatnonzero(kinds == CHEST)
+    return Maze(kinds.reshape(len(layout), len(layout[0])),
+                monster_cells, spawn_kinds(rng.generator(MONSTER_STREAM), names),
+                chest_cells, roll_chest_coins(rng.generator(CHEST_STREAM), chest_cells.size))
+
+
+def generate_maze(rows, cols, seed=None, monster_density=0.15, chest_density=0.1,
+                  potion_density=0.05, shopkeeper_density=0.02, archetype_weights=None):
+    """Generate a random maze.
+
+    Every cell independently holds a monster, chest, potion or shopkeeper with
+    the given probabilities, or is empty. The start (top-left) and goal
+    (bottom-right) cells are always empty. Work and memory grow linearly with
+    the number of cells.
+
+    Args:
+        rows (int): Number of rows
+        cols (int): Number of columns
+        seed (int): Seed, or a rng.GameRNG, for a reproducible maze. The layout,
+            monster stats and chest coins are drawn from separate streams.
+        monster_density (float): Fraction of cells holding a monster
+        chest_density (float): Fraction of cells holding a treasure chest
+        potion_density (float): Fraction of cells holding a healing potion
+        shopkeeper_density (float): Fraction of cells holding a shopkeeper
+        archetype_weights (list): Relative chance of each monster archetype in
+            population.ARCHETYPES. Defaults to equal chances.
+
+    Returns:
+        Maze: The generated maze template
+    """
+    densities = (monster_density, chest_density, potion_density, shopkeeper_density)
+    if rows < 1 or cols < 1:
+        raise ValueError("A maze needs at least one row and one column")
+    if min(densities) < 0 or sum(densities) > 1:
+        raise ValueError("Densities must be non-negative and add up to at most 1")
+
+    rng = as_game_rng(seed)
+    layout_rng = rng.generator(MAZE_STREAM)
+    monster_rng = rng.generator(MONSTER_STREAM)
+    chest_rng = rng.generator(CHEST_STREAM)
+    cells = rows * cols
+    thresholds = np.cumsum(densities, dtype=np.float32)
+    # np.digitize gives 0 below the first threshold, 4 above the last
+    kind_of_bin = np.array([MONSTER, CHEST, POTION, SHOPKEEPER, EMPTY], dtype=np.uint8)
+
+    kinds = np.empty(cells, dtype=np.uint8)
+    monster_cells, monsters, chest_cells, chest_coins = [], [], [], []
+    for start in range(0, cells, BLOCK_CELLS):
+        stop = min(start + BLOCK_CELLS, cells)
+        block = kind_of_bin[np.digitize(layout_rng.random(stop - start, dtype=np.float32), thresholds)]
+        # The hero starts top-left and wins bottom-right
+        if start == 0:
+            block[0] = EMPTY
+        if stop == cells:
+            block[-1] = EMPTY
+        kinds[start:stop] = block
+
+        found = np.flatnonzero(block == MONSTER)
+        monster_cells.append(found + start)
+        monsters.append(spawn_monsters(monster_rng, found.size, archetype_weights))
+
+        found = np.flatnonzero(block == CHEST)
+        chest_cells.append(found + start)
+        chest_coins.append(roll_chest_coins(chest_rng, found.size))
+
+    return Maze(kinds.reshape(rows, cols),
+                np.concatenate(monster_cells), MonsterPool.concatenate(monsters),
+                np.concatenate(chest_cells), np.concatenate(chest_coins))
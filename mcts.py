@@ -0,0 +1,345 @@
+"""
+mcts.py
+
+This module contains a bot that plans with Monte Carlo tree search.
+
+For each decision the bot plays as many short simulated games as it can within
+a fixed time budget, each on a clone of the real game. A simulated game first
+follows the most promising actions found so far, then finishes with quick
+rollouts by GreedyPolicy, and its result is credited to every action on the
+way. The action tried most often is played. Move, heal and shop actions,
+including which stat to upgrade, are all searched the same way.
+
+Search statistics are stored per game state in a transposition table, so move
+orders that lead to the same state share what has been learned, and knowledge
+is kept from one decision to the next. With workers, every worker process
+searches the same decision independently and their root statistics are added
+up. Each worker is a process of its own, seeded from rng.GameRNG.worker, so it
+keeps its own table and, searching a fixed number of games per decision, plays
+the same games every run.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import math
+import random
+import time
+
+from game_engine import DIRECTIONS, STATS, SHOP
+from maze import MazeView
+from policies import GreedyPolicy
+from rng import GameRNG
+from transposition import TranspositionTable, state_key
+
+# Most simulated games per search, whatever the time budget
+MAX_SEARCH_GAMES = 1_000_000
+
+
+def legal_actions(engine):
+    """List the actions worth considering in a game's current state.
+
+    Moves off the maze, healing at full health and purchases the hero cannot
+    afford are left out.
+
+    Args:
+        engine (GameEngine): The game
+
+    Returns:
+        list: Action strings for GameEngine.step
+    """
+    hero = engine.hero
+    if engine.mode == SHOP:
+        store = engine.shopkeeper.store
+        actions = ["leave"]
+        if hero.coins >= store["healing_potion"]:
+            actions.append("potion")
+        for stat in STATS:
+            if getattr(hero, stat) < 10 and hero.coins >= store[f"{stat}_boost"]:
+                actions.append(stat)
+        return actions
+    row, col = engine.hero_position
+    actions = [direction for direction, (row_offset, col_offset) in DIRECTIONS.items()
+               if 0 <= row + row_offset < engine.rows and 0 <= col + col_offset < engine.cols]
+    if hero.potions and hero.health < hero.max_health:
+        actions.append("heal")
+    return actions
+
+
+def evaluate(engine) -> float:
+    """Score a game state from 0 (lost or quit) to 1 (won).
+
+    Unfinished games score up to 0.5, for being close to the goal and healthy.
+    """
+    if engine.outcome == "won":
+        return 1.0
+    if engine.done:
+        return 0.0
+    row, col = engine.hero_position
+    goal_row, goal_col = engine.goal
+    progress = 1 - (abs(goal_row - row) + abs(goal_col - col)) / max(engine.rows + engine.cols - 2, 1)
+    hero = engine.hero
+    return 0.5 * progress * (0.5 + 0.5 * hero.health / hero.max_health)
+
+
+class Node(object):
+    """Search statistics of one game state.
+
+    Attributes:
+        visits (int): Simulated games that passed through this state
+        edges (dict): action -> [visits, total score] of the games that took it
+    """
+    __slots__ = ("visits", "edges")
+
+    def __init__(self, actions):
+        self.visits = 0
+        self.edges = {action: [0, 0.0] for action in actions}
+
+
+class TreeSearch(object):
+    """Monte Carlo tree search over GameEngine clones.
+
+    Attributes:
+        rng (random.Random): Source of randomness for tie breaks and rollouts
+        exploration (float): UCT exploration constant
+        tree_depth (int): Greatest number of actions taken inside the tree per game
+        rollout_depth (int): Greatest number of actions in a rollout
+        discount (float): Factor applied to a score for every action taken to get
+            it, so that quicker wins are preferred
+        table (TranspositionTable): Node of each game state seen
+        iterations (int): Simulated games played so far
+        steps (int): GameEngine.step calls made so far
+    """
+
+    def __init__(self, rng, exploration=1.4, tree_depth=30, rollout_depth=40, table_size=100000,
+                 discount=0.98):
+        self.rng = rng
+        self.exploration = exploration
+        self.discount = discount
+        self.tree_depth = tree_depth
+        self.rollout_depth = rollout_depth
+        self.table = TranspositionTable(table_size)
+        self.rollout_policy = GreedyPolicy(rng)
+        self.iterations = 0
+        self.steps = 0
+
+    def search(self, engine, budget=None, games=None):
+        """Play simulated games from a state until the time or game budget runs out.
+
+        Args:
+            engine (GameEngine): The real game. It is not changed.
+            budget (float): Seconds to search for
+            games (int): Number of games to play instead, which makes the search
+                reproducible
+
+        Returns:
+            dict: action -> [visits, total score] at the root
+        """
+        key = state_key(engine)
+        root = self.node(engine)
+        deadline = time.perf_counter() + budget if games is None else None
+        for _ in range(games if games is not None else MAX_SEARCH_GAMES):
+            # Always finish at least one game per action, however small the budget
+            if deadline is not None and root.visits >= len(root.edges) and time.perf_counter() >= deadline:
+                break
+            self.iterate(engine)
+            # Keep the root in the table, however many states the search adds
+            self.table.put(key, root)
+        return {action: list(edge) for action, edge in root.edges.items()}
+
+    def node(self, engine):
+        """Return the node of a state, adding one if it is new."""
+        key = state_key(engine)
+        node = self.table.get(key)
+        if node is None:
+            node = Node(legal_actions(engine))
+            self.table.put(key, node)
+        return node
+
+    def select(self, node):
+        """Pick an action by UCT, trying every action once first."""
+        log_visits = math.log(node.visits + 1)
+        best, best_score = [], -math.inf
+        for action, (visits, total) in node.edges.items():
+            if not visits:
+                score = math.inf
+            else:
+                score = total / visits + self.exploration * math.sqrt(log_visits / visits)
+            if score > best_score:
+                best, best_score = [action], score
+            elif score == best_score:
+                best.append(action)
+        return self.rng.choice(best)
+
+    def iterate(self, root_engine):
+        """Play one simulated game and credit its score along the way."""
+        engine = root_engine.clone()
+        path = []
+        seen = set()
+        while not engine.done and len(path) < self.tree_depth:
+            key = state_key(engine)
+            node = self.table.get(key)
+            if node is None or key in seen:
+                # A new state, or a loop back to one on this path: play it out
+                if node is None:
+                    self.table.put(key, Node(legal_actions(engine)))
+                break
+            seen.add(key)
+            action = self.select(node)
+            path.append((node, action, engine.turns))
+            engine.step(action)
+            self.steps += 1
+
+        score = self.rollout(engine)
+        for node, action, turns in path:
+            node.visits += 1
+            edge = node.edges[action]
+            edge[0] += 1
+            # Discounted by the number of actions between this state and the end
+            edge[1] += score * self.discount ** (engine.turns - turns)
+        self.iterations += 1
+
+    def rollout(self, engine):
+        """Finish a simulated game with quick greedy moves and score it."""
+        policy = self.rollout_policy
+        for _ in range(self.rollout_depth):
+            if engine.done:
+                break
+            engine.step(policy(engine))
+            self.steps += 1
+        return evaluate(engine)
+
+
+def best_action(edges, rng):
+    """Return the most visited action, breaking ties by mean score, then at random."""
+    def rank(action):
+        visits, total = edges[action]
+        return visits, total / visits if visits else 0.0
+    top = max(rank(action) for action in edges)
+    return rng.choice([action for action in edges if rank(action) == top])
+
+
+# Search state of a worker process: the maze template and the tree search
+_worker = {}
+
+
+def _start_worker(template, seed, options):
+    """Set up a worker process with the maze template shared by every request and its own seed."""
+    _worker["template"] = template
+    _worker["search"] = TreeSearch(random.Random(seed), **options)
+
+
+def _search_in_worker(engine, cleared, budget, games):
+    """Search one decision in a worker process.
+
+    The maze template was sent once when the worker started, so only this game's
+    cleared cells travel with each request.
+    """
+    if cleared is not None:
+        view = MazeView(_worker["template"])
+        view.cleared = cleared
+        engine.grid = view
+    search = _worker["search"]
+    iterations, steps = search.iterations, search.steps
+    edges = search.search(engine, budget, games)
+    return edges, search.iterations - iterations, search.steps - steps
+
+
+class MCTSPolicy(object):
+    """Chooses each action by Monte Carlo tree search with a fixed time or game budget.
+
+    Attributes:
+        rng (random.Random): Source of randomness
+        budget (float): Seconds of search per decision
+        games (int): Simulated games per decision and per worker, instead of a
+            time budget, or None
+        workers (int): Worker processes searching in parallel, or 0 to search in
+            this process
+        iterations (int): Simulated games played so far, over all processes
+        steps (int): GameEngine.step calls made so far, over all processes
+        history (set): State keys of the states this game has been in
+    """
+
+    def __init__(self, rng, budget=0.05, workers=0, games=None, **options):
+        """Create the bot.
+
+        Args:
+            rng (random.Random): Source of randomness
+            budget (float): Seconds of search per decision
+            games (int): Simulated games per decision and per worker, instead of
+                a time budget. The bot then plays the same way every time.
+            workers (int): Worker processes searching in parallel, or 0 to search
+                in this process
+            **options: exploration, tree_depth, rollout_depth and table_size for
+                TreeSearch
+        """
+        self.rng = rng
+        self.budget = budget
+        self.games = games
+        self.workers = workers
+        self.options = options
+        self.search = TreeSearch(rng, **options)
+        self.iterations = 0
+        self.steps = 0
+        self.history = set()
+        # One single-process pool per worker, so each worker keeps its own seed and table
+        self._pools = []
+        self._pool_template = None
+
+    def __call__(self, engine):
+        self.history.add(state_key(engine))
+        actions = legal_actions(engine)
+        if len(actions) == 1:
+            return actions[0]
+        if not self.workers:
+            iterations, steps = self.search.iterations, self.search.steps
+            edges = self.search.search(engine, self.budget, self.games)
+            self.iterations += self.search.iterations - iterations
+            self.steps += self.search.steps - steps
+        else:
+            edges = {action: [0, 0.0] for action in actions}
+            for worker_edges, iterations, steps in self.search_in_workers(engine):
+                self.iterations += iterations
+                self.steps += steps
+                for action, (visits, total) in worker_edges.items():
+                    edges[action][0] += visits
+                    edges[action][1] += total
+        return best_action(self.unvisited(engine, edges), self.rng)
+
+    def unvisited(self, engine, edges):
+        """Leave out the actions that lead back to a state this game has been in.
+
+        Scores do not depend on how a state was reached, so without this the bot
+        can walk back and forth between two states it rates equally.
+        """
+        fresh = {}
+        for action, edge in edges.items():
+            twin = engine.clone()
+            twin.step(action)
+            if state_key(twin) not in self.history:
+                fresh[action] = edge
+        return fresh or edges
+
+    def search_in_workers(self, engine):
+        """Have every worker search the current decision, returning their results."""
+        grid = engine.grid
+        template = grid.template if isinstance(grid, MazeView) else None
+        if not self._pools or template is not self._pool_template:
+            self.close()
+            seeds = GameRNG(self.rng.getrandbits(64))
+            self._pools = [ProcessPoolExecutor(1, initializer=_start_worker,
+                                               initargs=(template, seeds.worker(index).seed, self.options))
+                           for index in range(self.workers)]
+            self._pool_template = template
+        detached = engine.clone()
+        cleared = None
+        if template is not None:
+            detached.grid = None
+            cleared = grid.cleared
+        futures = [pool.submit(_search_in_worker, detached, cleared, self.budget, self.games)
+                   for pool in self._pools]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Shut down the worker processes, if any."""
+        for pool in self._pools:
+            pool.shutdown()
+        self._pools = []
+        self._pool_template = None
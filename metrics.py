@@ -0,0 +1,369 @@
+"""
+metrics.py
+
+This module measures where the game spends its time, for tuning under load.
+
+Metrics is an opt-in layer. install() wraps the functions of the phases being
+measured (a step, a move, a fight and its rounds, a trade, ...) so that each call
+records its latency, and wraps GameEngine.enter_cell, fight and trade to count
+encounters by cell type, fights by result and rounds, and shop actions.
+uninstall() puts the original methods back, so a game without metrics runs the
+same code as before and pays nothing.
+
+Everything is recorded into fixed-size arrays made up front. Latencies go into
+power-of-two buckets of nanoseconds, so recording one is a bit_length() and an
+array increment, with no allocation per call, and the memory used does not grow however long the game runs.
+snapshot() reads the arrays as a dict; write() saves it to a local file as JSON
+or in the Prometheus text format.
+"""
+from array import array
+import functools
+import importlib
+import inspect
+import json
+import os
+import time
+
+# Phases that can be timed: name -> (module, class, method) of every method timed as
+# it, with no class for a module's functions. Only the game's own work is timed: the
+# prompts of game_interface wait for the player, so they are left out.
+PHASES = {
+    "step": (("game_engine", "GameEngine", "step"),),
+    "move": (("game_engine", "GameEngine", "move"),),
+    "game_turn": (("game_interface", "Game", "game_turn"),),
+    "fight": (("game_engine", "GameEngine", "fight"),),
+    "resolve_fight": (("game_engine", None, "resolve_fight"), ("game_engine", None, "roll_fight")),
+    "trade": (("game_engine", "GameEngine", "trade"),),
+}
+
+# Latency buckets: bucket i counts calls taking less than 2 ** i nanoseconds. The
+# last bucket, from 2 ** 34 ns (about 17 seconds), also takes anything slower.
+LATENCY_BUCKETS = 36
+
+# Fights of ROUND_BUCKETS - 1 or more rounds are counted together
+ROUND_BUCKETS = 32
+
+# Labels of the counted events: the event name -> the label it is exported with
+ENCOUNTERS = {"empty": "empty", "monster": "monster", "chest": "chest", "potion_found": "potion",
+              "shop_open": "shopkeeper", "unknown_cell": "unknown"}
+FIGHT_RESULTS = {"monster_slain": "won", "defeated": "lost", "stalemate": "stalemate"}
+SHOP_RESULTS = {"bought_potion": "potion", "upgraded": "upgrade", "not_enough_coins": "not_enough_coins",
+                "stat_maxed": "stat_maxed", "shop_closed": "leave"}
+
+# The Metrics whose wrappers are in place, if any
+_installed = None
+
+
+class Histogram(object):
+    """Counts of nanosecond latencies in power-of-two buckets.
+
+    Attributes:
+        counts (array.array): Calls per bucket; bucket i is below 2 ** i ns
+        total (int): Sum of all latencies, in nanoseconds
+    """
+    __slots__ = ("counts", "total")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.counts = array("Q", bytes(8 * buckets))
+        self.total = 0
+
+    def record(self, nanoseconds):
+        """Count one latency."""
+        bucket = nanoseconds.bit_length()
+        counts = self.counts
+        counts[bucket if bucket < len(counts) else -1] += 1
+        self.total += nanoseconds
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class Counts(object):
+    """Counts of events by name, in a fixed array.
+
+    Attributes:
+        labels (dict): Event name -> label of each counted event
+        counts (array.array): Count per label, in the order of labels
+    """
+    __slots__ = ("labels", "counts", "_slots")
+
+    def __init__(self, labels):
+        self.labels = dict(labels)
+        self.counts = array("Q", bytes(8 * len(self.labels)))
+        self._slots = {name: slot for slot, name in enumerate(self.labels)}
+
+    def add(self, name):
+        """Count an event by its name. Names that are not counted are ignored."""
+        slot = self._slots.get(name)
+        if slot is not None:
+            self.counts[slot] += 1
+
+    def as_dict(self) -> dict:
+        return dict(zip(self.labels.values(), self.counts))
+
+
+class Metrics(object):
+    """Latency histograms per phase, plus fight, encounter and shop counters.
+
+    Use install() and uninstall(), or a with block, around the games to measure.
+    Only one Metrics can be installed at a time.
+
+    Attributes:
+        phases (dict): Phase name -> Histogram of its latencies
+        fight_rounds (array.array): Fights by number of rounds
+        fights (Counts): Fights by result
+        encounters (Counts): Cells entered, by what was in them
+        shop (Counts): Shop actions, by result
+    """
+
+    def __init__(self, phases=tuple(PHASES)):
+        """Set up empty counters.
+
+        Args:
+            phases (list): Names from PHASES of the phases to time. Defaults to all.
+        """
+        self.phases = {name: Histogram() for name in phases}
+        self.fight_rounds = array("Q", bytes(8 * ROUND_BUCKETS))
+        self.fights = Counts(FIGHT_RESULTS)
+        self.encounters = Counts(ENCOUNTERS)
+        self.shop = Counts(SHOP_RESULTS)
+        self._patches = []
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
+
+    @property
+    def installed(self) -> bool:
+        return _installed is self
+
+    def install(self):
+        """Wrap the measured methods, so that every game from now on is measured."""
+        global _installed
+        if _installed is not None:
+            raise RuntimeError("Metrics are already installed")
+        _installed = self
+        for name, histogram in self.phases.items():
+            for target in PHASES[name]:
+                self._patch(target, lambda original, histogram=histogram: _timed(original, histogram))
+        self._patch(("game_engine", "GameEngine", "enter_cell"),
+                    lambda original: _counted(original, self.encounters))
+        self._patch(("game_engine", "GameEngine", "trade"), lambda original: _counted(original, self.shop))
+        self._patch(("game_engine", "GameEngine", "fight"), self._count_fights)
+
+    def uninstall(self):
+        """Put the original methods back. The counts are kept."""
+        global _installed
+        while self._patches:
+            owner, method, original = self._patches.pop()
+            setattr(owner, method, original)
+        if _installed is self:
+            _installed = None
+
+    def _patch(self, target, wrap):
+        """Replace a method with wrap(method), remembering the method to put back."""
+        module, owner, method = target
+        module = importlib.import_module(module)
+        owner = module if owner is None else getattr(module, owner)
+        original = owner.__dict__[method]
+        self._patches.append((owner, method, original))
+        setattr(owner, method, functools.wraps(original)(wrap(original)))
+
+    def _count_fights(self, original):
+        """Wrap GameEngine.fight to count fights by result and number of rounds."""
+        rounds = self.fight_rounds
+        results = self.fights
+
+        def fight(engine, enemy, events):
+            start = len(events)
+            original(engine, enemy, events)
+            for event in events[start:]:
+                if event[0] == "fight":
+                    rounds[min(event[1], ROUND_BUCKETS - 1)] += 1
+                else:
+                    results.add(event[0])
+        return fight
+
+    def snapshot(self) -> dict:
+        """Return everything measured so far.
+
+        Returns:
+            dict: "phases" maps each phase to its count, total and mean seconds and
+                its latency buckets (upper bound in seconds -> calls). "fight_rounds"
+                maps rounds to fights, and "fights", "encounters" and "shop" map
+                labels to counts.
+        """
+        phases = {}
+        for name, histogram in self.phases.items():
+            count = histogram.count
+            phases[name] = {
+                "count": count,
+                "seconds": histogram.total / 1e9,
+                "mean_seconds": histogram.total / 1e9 / count if count else 0.0,
+                "buckets": {_bound(bucket): calls for bucket, calls in enumerate(histogram.counts) if calls},
+            }
+        return {
+            "time": time.time(),
+            "phases": phases,
+            "fight_rounds": {rounds: fights for rounds, fights in enumerate(self.fight_rounds) if fights},
+            "fights": self.fights.as_dict(),
+            "encounters": self.encounters.as_dict(),
+            "shop": self.shop.as_dict(),
+        }
+
+    def dominant_phases(self) -> list:
+        """List the phases by the total time spent in them, slowest first.
+
+        Phases nest: a step includes its move, a move its fight, and a fight the
+        rounds played out by resolve_fight.
+
+        Returns:
+            list: (phase, seconds) pairs
+        """
+        return sorted(((name, histogram.total / 1e9) for name, histogram in self.phases.items()),
+                      key=lambda pair: pair[1], reverse=True)
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = ["# HELP maze_phase_seconds Latency of each phase of the game.",
+                 "# TYPE maze_phase_seconds histogram"]
+        for name, histogram in self.phases.items():
+            cumulative = 0
+            for bucket, calls in enumerate(histogram.counts[:-1]):
+                cumulative += calls
+                lines.append(f'maze_phase_seconds_bucket{{phase="{name}",le="{_bound(bucket)}"}} {cumulative}')
+            cumulative += histogram.counts[-1]
+            lines.append(f'maze_phase_seconds_bucket{{phase="{name}",le="+Inf"}} {cumulative}')
+            lines.append(f'maze_phase_seconds_sum{{phase="{name}"}} {histogram.total / 1e9}')
+            lines.append(f'maze_phase_seconds_count{{phase="{name}"}} {cumulative}')
+
+        lines += ["# HELP maze_fight_rounds Rounds per fight.", "# TYPE maze_fight_rounds histogram"]
+        cumulative = 0
+        for rounds, fights in enumerate(self.fight_rounds[:-1]):
+            cumulative += fights
+            lines.append(f'maze_fight_rounds_bucket{{le="{rounds}"}} {cumulative}')
+        cumulative += self.fight_rounds[-1]
+        lines.append(f'maze_fight_rounds_bucket{{le="+Inf"}} {cumulative}')
+        lines.append(f"maze_fight_rounds_count {cumulative}")
+
+        for metric, label, counts, help_text in (
+                ("maze_fights_total", "result", self.fights, "Fights by result."),
+                ("maze_encounters_total", "cell", self.encounters, "Cells entered, by contents."),
+                ("maze_shop_actions_total", "result", self.shop, "Shop actions by result.")):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{{label}="{name}"}} {count}' for name, count in counts.as_dict().items()]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, format=None):
+        """Save a snapshot to a local file, replacing it in one step.
+
+        Args:
+            path (str): The file
+            format (str): "json" or "prometheus". Defaults to Prometheus for
+                paths ending in .prom, otherwise JSON.
+        """
+        if format is None:
+            format = "prometheus" if path.endswith(".prom") else "json"
+        if format not in ("json", "prometheus"):
+            raise ValueError(f"Unknown metrics format: {format}")
+        text = self.to_prometheus() if format == "prometheus" else self.to_json()
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            file.write(text)
+        os.replace(temporary, path)
+
+
+def _bound(bucket) -> str:
+    """Upper bound, in seconds, of a latency bucket."""
+    return f"{2 ** bucket / 1e9:.9g}"
+
+
+def _arity(function):
+    """Number of parameters of a function taking only required positional ones, else None."""
+    code = function.__code__
+    if function.__defaults__ or code.co_kwonlyargcount or code.co_flags & (inspect.CO_VARARGS | inspect.CO_VARKEYWORDS):
+        return None
+    return code.co_argcount
+
+
+def _timed(original, histogram):
+    """Wrap a method to record the latency of every call.
+
+    The wrapper takes the same positional parameters as the method when it can,
+    and records into the histogram's arrays directly, so that a call allocates
+    nothing more than the method itself does.
+    """
+    clock = time.perf_counter_ns
+    counts = histogram.counts
+    last = len(counts) - 1
+
+    def record(start):
+        elapsed = clock() - start
+        bucket = elapsed.bit_length()
+        counts[bucket if bucket < last else last] += 1
+        histogram.total += elapsed
+
+    arity = _arity(original)
+    if arity == 2:
+        def timed(first, second):
+            start = clock()
+            try:
+                return original(first, second)
+            finally:
+                record(start)
+    elif arity == 3:
+        def timed(first, second, third):
+            start = clock()
+            try:
+                return original(first, second, third)
+            finally:
+                record(start)
+    else:
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                record(start)
+    return timed
+
+
+def _counted(original, counts):
+    """Wrap a method taking an events list last, to count the first event it adds."""
+    slot_of = counts._slots.get
+    array = counts.counts
+
+    def count(events, start):
+        if len(events) > start:
+            slot = slot_of(events[start][0])
+            if slot is not None:
+                array[slot] += 1
+
+    arity = _arity(original)
+    if arity == 2:
+        def counted(engine, events):
+            start = len(events)
+            result = original(engine, events)
+            count(events, start)
+            return result
+    elif arity == 3:
+        def counted(engine, argument, events):
+            start = len(events)
+            result = original(engine, argument, events)
+            count(events, start)
+            return result
+    else:
+        def counted(*args):
+            events = args[-1]
+            start = len(events)
+            result = original(*args)
+            count(events, start)
+            return result
+    return counted
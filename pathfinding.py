@@ -0,0 +1,336 @@
+"""
+pathfinding.py
+
+This module finds the shortest and safest route through a maze.
+
+Every move costs one step, plus risk times the health the hero would lose
+fighting the monster in the cell it enters. Fights are worked out in closed form
+against the hero as it is now. Cells holding a monster that would beat the hero
+cannot be entered. The goal cell always costs one step, because reaching it wins
+the game whatever it holds.
+
+find_path answers a single query with A*. DistanceField keeps the cost of the
+best route from every cell to the goal, so repeated queries (e.g. one per turn)
+only follow a chain of pointers. When a cell changes, the field is repaired
+around it rather than rebuilt.
+"""
+from heapq import heapify, heappush, heappop
+import math
+
+import numpy as np
+
+from combat import HERO_WINS, MONSTER_WINS, simulate_fights, stat_block
+from game_engine import DIRECTIONS, resolve_fight
+from game_model import Monster
+from maze import MazeView
+
+# Direction of the move from a cell to each of its neighbours, by (row, col) offset
+OFFSET_DIRECTIONS = {offset: direction for direction, offset in DIRECTIONS.items()}
+
+
+def cell_cost(grid, hero, row, col, risk=1.0):
+    """Return the cost of moving into one cell.
+
+    Args:
+        grid: The maze. Any object with rows, cols and cell().
+        hero (Character): The hero making the move
+        row (int): Row of the cell
+        col (int): Column of the cell
+        risk (float): Cost of each point of health lost in a fight
+
+    Returns:
+        float: One step plus the weighted damage, or math.inf if the hero would lose
+    """
+    cell = grid.cell(row, col)
+    if not isinstance(cell, Monster):
+        return 1.0
+    result = resolve_fight(hero, cell)
+    if result.winner == "enemy":
+        return math.inf
+    return 1.0 + risk * (hero.health - result.hero_health)
+
+
+def cell_costs(grid, hero, risk=1.0):
+    """Return the cost of moving into every cell of a maze.
+
+    Maze templates and their views are costed with one batch of fights over the
+    monster pool; other grids cell by cell.
+
+    Args:
+        grid: The maze. A maze.Maze, a maze.MazeView or any object with rows,
+            cols and cell().
+        hero (Character): The hero making the moves
+        risk (float): Cost of each point of health lost in a fight
+
+    Returns:
+        numpy.ndarray: float64 array of shape (rows, cols), math.inf where the hero
+            would lose
+    """
+    template = grid.template if isinstance(grid, MazeView) else grid
+    if not hasattr(template, "monster_cells"):
+        return np.array([[cell_cost(grid, hero, row, col, risk) for col in range(grid.cols)]
+                         for row in range(grid.rows)])
+
+    costs = np.ones(grid.rows * grid.cols)
+    results = simulate_fights(stat_block([hero]), template.monsters.stat_block())
+    costs[template.monster_cells] = np.where(
+        results.outcome == MONSTER_WINS, math.inf,
+        np.where(results.outcome == HERO_WINS, 1.0 + risk * (hero.health - results.hero_health), 1.0))
+    if isinstance(grid, MazeView) and grid.cleared:
+        costs[np.fromiter(grid.cleared, dtype=np.int64)] = 1.0
+    return costs.reshape(grid.rows, grid.cols)
+
+
+def route_cost(costs, path):
+    """Return the total cost of following a path, not counting its first cell."""
+    return float(sum(costs[row][col] for row, col in path[1:]))
+
+
+def find_path(grid, hero, start=(0, 0), goal=None, risk=1.0, costs=None):
+    """Find the cheapest route between two cells with A*.
+
+    The heuristic is the Manhattan distance, which never overestimates because
+    every move costs at least one step.
+
+    Args:
+        grid: The maze
+        hero (Character): The hero making the moves
+        start (tuple): The (row, col) cell to start from
+        goal (tuple): The (row, col) cell to reach. Defaults to the bottom-right corner.
+        risk (float): Cost of each point of health lost in a fight
+        costs (numpy.ndarray): Cell costs from cell_costs, if already known
+
+    Returns:
+        tuple: (path, cost), where path lists the (row, col) cells from start to
+            goal. (None, math.inf) if the goal cannot be reached.
+    """
+    rows, cols = grid.rows, grid.cols
+    if goal is None:
+        goal = (rows - 1, cols - 1)
+    if costs is None:
+        costs = cell_costs(grid, hero, risk)
+    cost = costs.reshape(-1).tolist()
+    source = start[0] * cols + start[1]
+    target = goal[0] * cols + goal[1]
+    cost[target] = 1.0
+    goal_row, goal_col = goal
+
+    best = {source: 0.0}
+    came_from = {source: -1}
+    # Ties between equally promising cells go to the one furthest along, so the
+    # search runs straight down the many equal-cost routes instead of widening
+    heap = [(abs(goal_row - start[0]) + abs(goal_col - start[1]), -0.0, source)]
+    while heap:
+        _, distance, index = heappop(heap)
+        distance = -distance
+        if index == target:
+            path = []
+            while index != -1:
+                path.append(divmod(index, cols))
+                index = came_from[index]
+            return path[::-1], distance
+        if distance > best[index]:
+            continue
+        row, col = divmod(index, cols)
+        for neighbour, new_row, new_col in ((index - cols, row - 1, col), (index + cols, row + 1, col),
+                                            (index - 1, row, col - 1), (index + 1, row, col + 1)):
+            if not (0 <= new_row < rows and 0 <= new_col < cols):
+                continue
+            new_distance = distance + cost[neighbour]
+            if new_distance < best.get(neighbour, math.inf):
+                best[neighbour] = new_distance
+                came_from[neighbour] = index
+                heappush(heap, (new_distance + abs(goal_row - new_row) + abs(goal_col - new_col),
+                                -new_distance, neighbour))
+    return None, math.inf
+
+
+class DistanceField(object):
+    """The cost of the cheapest route from every cell of a maze to the goal.
+
+    The field is built once with Dijkstra's algorithm, run backwards from the
+    goal. Each cell also points to the next cell on its best route, so a route is
+    read off in O(length) and the next move in O(1).
+
+    Call update(row, col) whenever a cell may have changed, e.g. after a monster
+    is slain, a chest looted or the hero's health changed before a fight. Only
+    the cells whose routes are affected are recomputed: a cheaper cell offers
+    its neighbours a better route, which spreads outwards until it stops
+    helping; a dearer cell invalidates the routes through it, which are then
+    rebuilt from the cells around them.
+
+    Attributes:
+        grid: The maze
+        hero (Character): The hero whose fights the costs are based on
+        goal (tuple): The (row, col) cell the routes lead to
+        risk (float): Cost of each point of health lost in a fight
+        rows (int): Number of rows
+        cols (int): Number of columns
+        cost (list): Cost of moving into each cell, by flat index
+        distance (list): Cost of the best route from each cell, by flat index
+        next (list): Flat index of the next cell on each best route, -1 at the
+            goal and at cells that cannot reach it
+    """
+
+    def __init__(self, grid, hero, goal=None, risk=1.0):
+        self.grid = grid
+        self.hero = hero
+        self.rows = grid.rows
+        self.cols = grid.cols
+        self.goal = goal if goal is not None else (self.rows - 1, self.cols - 1)
+        self.risk = risk
+        self.rebuild()
+
+    def rebuild(self):
+        """Recompute every cost and route, e.g. after the hero's stats changed."""
+        self.cost = cell_costs(self.grid, self.hero, self.risk).reshape(-1).tolist()
+        target = self.goal[0] * self.cols + self.goal[1]
+        self.cost[target] = 1.0
+        self.distance = [math.inf] * len(self.cost)
+        self.next = [-1] * len(self.cost)
+        self.distance[target] = 0.0
+        self._spread([(0.0, target)])
+
+    def _neighbours(self, index):
+        """Return the flat indices of the cells next to a cell."""
+        cols = self.cols
+        col = index % cols
+        neighbours = []
+        if index >= cols:
+            neighbours.append(index - cols)
+        if index + cols < len(self.cost):
+            neighbours.append(index + cols)
+        if col:
+            neighbours.append(index - 1)
+        if col + 1 < cols:
+            neighbours.append(index + 1)
+        return neighbours
+
+    def _spread(self, heap):
+        """Run Dijkstra's algorithm backwards from the cells on the heap.
+
+        Args:
+            heap (list): (distance, flat index) of the cells whose distance has
+                just been lowered
+        """
+        cost, distance, following = self.cost, self.distance, self.next
+        cols = self.cols
+        cells = len(cost)
+        while heap:
+            reached, index = heappop(heap)
+            if reached > distance[index]:
+                continue
+            # Every neighbour that steps into this cell pays the same
+            offer = reached + cost[index]
+            if offer == math.inf:
+                continue
+            col = index % cols
+            if index >= cols and offer < distance[index - cols]:
+                distance[index - cols] = offer
+                following[index - cols] = index
+                heappush(heap, (offer, index - cols))
+            if index + cols < cells and offer < distance[index + cols]:
+                distance[index + cols] = offer
+                following[index + cols] = index
+                heappush(heap, (offer, index + cols))
+            if col and offer < distance[index - 1]:
+                distance[index - 1] = offer
+                following[index - 1] = index
+                heappush(heap, (offer, index - 1))
+            if col + 1 < cols and offer < distance[index + 1]:
+                distance[index + 1] = offer
+                following[index + 1] = index
+                heappush(heap, (offer, index + 1))
+
+    def update(self, row, col) -> bool:
+        """Re-cost one cell and repair the routes it affects.
+
+        Args:
+            row (int): Row of the cell
+            col (int): Column of the cell
+
+        Returns:
+            bool: Whether the cell's cost changed
+        """
+        index = row * self.cols + col
+        if (row, col) == self.goal:
+            return False
+        old = self.cost[index]
+        new = cell_cost(self.grid, self.hero, row, col, self.risk)
+        if new == old or math.isclose(new, old):
+            return False
+        self.cost[index] = new
+        distance, following = self.distance, self.next
+
+        if new < old:
+            offer = distance[index] + new
+            heap = []
+            for neighbour in self._neighbours(index):
+                if offer < distance[neighbour]:
+                    distance[neighbour] = offer
+                    following[neighbour] = index
+                    heap.append((offer, neighbour))
+            self._spread(heap)
+            return True
+
+        # Every route that enters this cell is now dearer: forget those routes...
+        orphans = self._dependants(index)
+        for orphan in orphans:
+            distance[orphan] = math.inf
+            following[orphan] = -1
+        # ...then give each one the best route offered by its neighbours
+        heap = []
+        for orphan in orphans:
+            for neighbour in self._neighbours(orphan):
+                offer = distance[neighbour] + self.cost[neighbour]
+                if offer < distance[orphan]:
+                    distance[orphan] = offer
+                    following[orphan] = neighbour
+            if distance[orphan] < math.inf:
+                heap.append((distance[orphan], orphan))
+        heapify(heap)
+        self._spread(heap)
+        return True
+
+    def _dependants(self, index):
+        """Return the cells whose best route passes through a cell, not including it."""
+        following = self.next
+        found = []
+        stack = [index]
+        while stack:
+            parent = stack.pop()
+            for neighbour in self._neighbours(parent):
+                if following[neighbour] == parent:
+                    found.append(neighbour)
+                    stack.append(neighbour)
+        return found
+
+    def distance_to_goal(self, row, col) -> float:
+        """Return the cost of the best route from a cell, math.inf if there is none."""
+        return self.distance[row * self.cols + col]
+
+    def route(self, row, col):
+        """Return the cells of the best route from a cell to the goal, or None.
+
+        Returns:
+            list: (row, col) of every cell on the route, including both ends
+        """
+        index = row * self.cols + col
+        if self.distance[index] == math.inf:
+            return None
+        path = [(row, col)]
+        while self.next[index] != -1:
+            index = self.next[index]
+            path.append(divmod(index, self.cols))
+        return path
+
+    def next_move(self, row, col):
+        """Return the direction of the first move of the best route, or None.
+
+        None means the hero is at the goal or cannot reach it.
+        """
+        following = self.next[row * self.cols + col]
+        if following == -1:
+            return None
+        next_row, next_col = divmod(following, self.cols)
+        return OFFSET_DIRECTIONS[(next_row - row, next_col - col)]
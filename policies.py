@@ -0,0 +1,137 @@
+"""
+policies.py
+
+This module contains bots that play the game without a human.
+
+A policy is any callable that takes a GameEngine and returns the next action, so
+it can be plugged straight into TurnScheduler in place of the terminal prompts.
+"""
+from game_engine import DIRECTIONS, STATS, SHOP, resolve_fight
+from game_model import Monster
+
+MOVES = tuple(DIRECTIONS)
+
+
+class RandomPolicy(object):
+    """Wanders the maze at random and never buys anything.
+
+    Attributes:
+        rng (random.Random): Source of randomness
+    """
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def __call__(self, engine):
+        if engine.mode == SHOP:
+            return "leave"
+        return self.rng.choice(MOVES)
+
+
+class GreedyPolicy(object):
+    """Heads for the goal, avoiding fights it would lose.
+
+    On each turn the bot:
+    - drinks a potion when its health falls below heal_below of its maximum
+    - at a shopkeeper, buys a potion if it has none, then upgrades its weakest stat
+    - otherwise moves to the neighbouring cell closest to the goal, skipping cells
+      holding a monster it would not beat, with ties broken at random
+
+    Attributes:
+        rng (random.Random): Source of randomness
+        heal_below (float): Fraction of max health under which the bot heals
+    """
+
+    def __init__(self, rng, heal_below=0.4):
+        self.rng = rng
+        self.heal_below = heal_below
+
+    def __call__(self, engine):
+        hero = engine.hero
+        if engine.mode == SHOP:
+            return self.shop(engine)
+        if hero.potions and hero.health < hero.max_health * self.heal_below:
+            return "heal"
+        return self.move(engine)
+
+    def move(self, engine):
+        """Choose a direction to move in."""
+        hero = engine.hero
+        row, col = engine.hero_position
+        goal_row, goal_col = engine.goal
+        best, best_distance = [], None
+        for direction, (row_offset, col_offset) in DIRECTIONS.items():
+            new_row, new_col = row + row_offset, col + col_offset
+            if not (0 <= new_row < engine.rows and 0 <= new_col < engine.cols):
+                continue
+            cell = engine.grid.cell(new_row, new_col)
+            if isinstance(cell, Monster) and resolve_fight(hero, cell).winner == "enemy":
+                continue
+            distance = abs(goal_row - new_row) + abs(goal_col - new_col)
+            if best_distance is None or distance < best_distance:
+                best, best_distance = [direction], distance
+            elif distance == best_distance:
+                best.append(direction)
+        if not best:
+            # Boxed in by monsters: take the least bad risk
+            return self.rng.choice(MOVES)
+        return self.rng.choice(best)
+
+    def shop(self, engine):
+        hero = engine.hero
+        store = engine.shopkeeper.store
+        if not hero.potions and hero.coins >= store["healing_potion"]:
+            return "potion"
+        stat = min(STATS, key=lambda name: getattr(hero, name))
+        if getattr(hero, stat) < 10 and hero.coins >= store[f"{stat}_boost"]:
+            return stat
+        return "leave"
+
+
+class PlannerPolicy(GreedyPolicy):
+    """Follows the cheapest route to the goal, weighing steps against damage taken.
+
+    The route comes from a pathfinding.DistanceField built on the first turn of
+    each game. Fights depend on the hero's health at the time, so before every
+    move the cell ahead is re-costed, and the field repaired if it has changed.
+    Healing and shopping work as in GreedyPolicy.
+
+    Attributes:
+        rng (random.Random): Source of randomness
+        heal_below (float): Fraction of max health under which the bot heals
+        risk (float): Cost of each point of health lost in a fight
+        field (DistanceField): Routes for the game being played
+    """
+
+    def __init__(self, rng, heal_below=0.4, risk=1.0):
+        super().__init__(rng, heal_below)
+        from pathfinding import DistanceField
+        self.risk = risk
+        self.field = None
+        self._field_type = DistanceField
+
+    def move(self, engine):
+        field = self.field
+        if field is None or field.grid is not engine.grid or field.hero is not engine.hero:
+            field = self.field = self._field_type(engine.grid, engine.hero, engine.goal, self.risk)
+        row, col = engine.hero_position
+        # The cell we stand on may just have been emptied
+        field.update(row, col)
+        while True:
+            direction = field.next_move(row, col)
+            if direction is None:
+                # No safe route: fall back to heading straight for the goal
+                return super().move(engine)
+            row_offset, col_offset = DIRECTIONS[direction]
+            if not field.update(row + row_offset, col + col_offset):
+                return direction
+
+
+def mcts(rng):
+    """Build a mcts.MCTSPolicy, the strongest and slowest bot."""
+    # Imported here because the search itself plays GreedyPolicy rollouts
+    from mcts import MCTSPolicy
+    return MCTSPolicy(rng)
+
+
+POLICIES = {"random": RandomPolicy, "greedy": GreedyPolicy, "planner": PlannerPolicy, "mcts": mcts}
@@ -0,0 +1,260 @@
+"""
+population.py
+
+This module spawns and stores large numbers of monsters compactly.
+
+A MonsterPool keeps one typed NumPy array per stat instead of one Monster object
+per monster, at 9 bytes per monster. Values written through the bulk methods
+are trusted and skip the validation of the Character property setters. Monster
+objects are only built when a single monster is needed, e.g. for a fight in
+GameEngine.
+
+Each kind of monster is described by a MonsterArchetype holding its stat ranges.
+Archetypes are immutable and shared: a pool only stores the index of each
+monster's archetype.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from game_model import Monster
+
+MonsterArchetype = namedtuple("MonsterArchetype", ["name", "health", "power", "defence", "stealth"])
+MonsterArchetype.__doc__ = """The stat ranges of one kind of monster.
+
+Each stat is an inclusive (low, high) range that spawned monsters are rolled from.
+"""
+ARCHETYPE_STATS = ("health", "power", "defence", "stealth")
+
+# The monsters of the maze, as data. Every range sits inside the ranges rolled by
+# Monster.__init__ (health 40-80, power 5-15, defence and stealth 5-8).
+ARCHETYPE_DATA = (
+    {"name": "Orc", "health": (40, 60), "power": (8, 12), "defence": (5, 7), "stealth": (5, 7)},
+    {"name": "Troll", "health": (60, 80), "power": (10, 15), "defence": (6, 8), "stealth": (5, 6)},
+    {"name": "Skeleton", "health": (40, 55), "power": (5, 9), "defence": (5, 6), "stealth": (7, 8)},
+    {"name": "Dragon", "health": (70, 80), "power": (12, 15), "defence": (7, 8), "stealth": (6, 8)},
+)
+
+
+def load_archetypes(data):
+    """Build archetypes from plain data, e.g. loaded from a JSON file.
+
+    Args:
+        data (list): One dict per archetype with the fields of MonsterArchetype
+
+    Returns:
+        tuple: The MonsterArchetype objects, in order
+
+    Raises:
+        ValueError: If a range is empty or outside the limits of a pool
+    """
+    archetypes = []
+    for row in data:
+        archetype = MonsterArchetype(row["name"], *(tuple(row[stat]) for stat in ARCHETYPE_STATS))
+        for stat, limit in zip(ARCHETYPE_STATS, (255, 255, 10, 10)):
+            low, high = getattr(archetype, stat)
+            if not 0 <= low <= high <= limit:
+                raise ValueError(f"Invalid {stat} range for {archetype.name}: {low}-{high}")
+        archetypes.append(archetype)
+    return tuple(archetypes)
+
+
+ARCHETYPES = load_archetypes(ARCHETYPE_DATA)
+
+# Names of the monster kinds. MonsterPool.kind holds an index into ARCHETYPES.
+MONSTER_NAMES = tuple(archetype.name for archetype in ARCHETYPES)
+
+# Every monster has the default Character accuracy
+MONSTER_ACCURACY = 8
+
+# Stat arrays of a MonsterPool and their types
+POOL_FIELDS = (
+    ("kind", np.uint8),
+    ("max_health", np.uint8),
+    ("health", np.float32),
+    ("power", np.uint8),
+    ("defence", np.uint8),
+    ("stealth", np.uint8),
+)
+
+
+class MonsterPool(object):
+    """A population of monsters stored as parallel typed arrays.
+
+    Attributes:
+        archetypes (tuple): The shared archetypes that kind refers to
+        kind (numpy.ndarray): Index into archetypes of each monster
+        max_health (numpy.ndarray): Maximum health of each monster
+        health (numpy.ndarray): Current health of each monster
+        power (numpy.ndarray): How hard each monster hits
+        defence (numpy.ndarray): How well each monster repels attacks
+        stealth (numpy.ndarray): How well each monster dodges attacks
+    """
+    __slots__ = ("archetypes",) + tuple(field for field, _ in POOL_FIELDS)
+
+    def __init__(self, kind, max_health, power, defence, stealth, health=None, archetypes=ARCHETYPES):
+        """Wrap existing stat arrays without copying or validating them.
+
+        Args:
+            kind (array): Index into archetypes of each monster
+            max_health (array): Maximum health of each monster
+            power (array): How hard each monster hits
+            defence (array): How well each monster repels attacks
+            stealth (array): How well each monster dodges attacks
+            health (array): Current health. Defaults to max_health.
+            archetypes (tuple): The archetypes that kind refers to
+        """
+        self.archetypes = archetypes
+        self.kind = np.asarray(kind, dtype=np.uint8)
+        self.max_health = np.asarray(max_health, dtype=np.uint8)
+        self.power = np.asarray(power, dtype=np.uint8)
+        self.defence = np.asarray(defence, dtype=np.uint8)
+        self.stealth = np.asarray(stealth, dtype=np.uint8)
+        if health is None:
+            health = self.max_health
+        self.health = np.array(health, dtype=np.float32)
+
+    @classmethod
+    def empty(cls, n=0):
+        """Create a pool of n monsters with all stats set to 0."""
+        return cls(*(np.zeros(n, dtype=dtype) for field, dtype in POOL_FIELDS if field != "health"))
+
+    @classmethod
+    def from_monsters(cls, monsters, archetypes=ARCHETYPES):
+        """Collect existing Monster objects into a pool.
+
+        Args:
+            monsters (list): Monster objects named after one of the archetypes
+            archetypes (tuple): The archetypes of the pool
+
+        Returns:
+            MonsterPool: The pool
+        """
+        names = [archetype.name for archetype in archetypes]
+        return cls([names.index(m.name) for m in monsters],
+                   [m.max_health for m in monsters],
+                   [m.power for m in monsters],
+                   [m.defence for m in monsters],
+                   [m.stealth for m in monsters],
+                   [m.health for m in monsters],
+                   archetypes)
+
+    @classmethod
+    def from_arrays(cls, arrays, archetypes=ARCHETYPES):
+        """Wrap stat arrays, health included, without copying any of them.
+
+        Args:
+            arrays (dict): One array per field of POOL_FIELDS, of that field's type
+            archetypes (tuple): The archetypes that kind refers to
+
+        Returns:
+            MonsterPool: The pool
+        """
+        pool = cls.__new__(cls)
+        pool.archetypes = archetypes
+        for field, _ in POOL_FIELDS:
+            setattr(pool, field, arrays[field])
+        return pool
+
+    @classmethod
+    def concatenate(cls, pools):
+        """Join several pools that share the same archetypes into one."""
+        arrays = (np.concatenate([getattr(pool, field) for pool in pools])
+                  for field in ("kind", "max_health", "power", "defence", "stealth", "health"))
+        return cls(*arrays, archetypes=pools[0].archetypes)
+
+    def __len__(self):
+        return len(self.kind)
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the pool's arrays in bytes."""
+        return sum(getattr(self, field).nbytes for field, _ in POOL_FIELDS)
+
+    def freeze(self):
+        """Make the stat arrays read-only, for pools shared between games."""
+        for field, _ in POOL_FIELDS:
+            getattr(self, field).flags.writeable = False
+        return self
+
+    def monster(self, index):
+        """Build a Monster object for one monster in the pool.
+
+        Args:
+            index (int): Position of the monster in the pool
+
+        Returns:
+            Monster: A new Monster with that monster's stats
+        """
+        monster = Monster.from_stats(self.archetypes[self.kind[index]].name, int(self.max_health[index]),
+                                     int(self.power[index]), int(self.defence[index]),
+                                     int(self.stealth[index]))
+        health = float(self.health[index])
+        if health != monster.max_health:
+            monster.health = health
+        return monster
+
+    def stat_block(self, indices=slice(None)):
+        """Return stats in the form used by combat.simulate_fights.
+
+        Args:
+            indices: Which monsters to include. Defaults to all of them.
+
+        Returns:
+            dict: One float array per combat stat
+        """
+        health = self.health[indices].astype(np.float64)
+        return {
+            "health": health,
+            "power": self.power[indices].astype(np.float64),
+            "accuracy": np.full(health.shape, float(MONSTER_ACCURACY)),
+            "defence": self.defence[indices].astype(np.float64),
+            "stealth": self.stealth[indices].astype(np.float64),
+        }
+
+
+def spawn_kinds(rng, kind, archetypes=ARCHETYPES):
+    """Spawn monsters of known archetypes, rolling all their stats at once.
+
+    Each stat is drawn for every monster in a single vectorized call, using the
+    range of that monster's archetype.
+
+    Args:
+        rng (numpy.random.Generator): Source of randomness
+        kind (array): Index into archetypes of each monster
+        archetypes (tuple): The archetypes to spawn from
+
+    Returns:
+        MonsterPool: The new monsters, at full health
+    """
+    kind = np.asarray(kind, dtype=np.uint8)
+    stats = []
+    for stat in ARCHETYPE_STATS:
+        ranges = np.array([getattr(archetype, stat) for archetype in archetypes], dtype=np.float64)
+        low = ranges[:, 0][kind]
+        span = (ranges[:, 1] - ranges[:, 0] + 1)[kind]
+        # Scale one uniform draw per monster into its archetype's range. The
+        # product is taken in float64 so it can never round up to high + 1.
+        stats.append((low + np.floor(rng.random(kind.size, dtype=np.float32) * span)).astype(np.uint8))
+    health, power, defence, stealth = stats
+    return MonsterPool(kind, health, power, defence, stealth, archetypes=archetypes)
+
+
+def spawn_monsters(rng, n, weights=None, archetypes=ARCHETYPES):
+    """Spawn n monsters of randomly chosen archetypes.
+
+    Args:
+        rng (numpy.random.Generator): Source of randomness
+        n (int): Number of monsters
+        weights (list): Relative chance of each archetype. Defaults to equal chances.
+        archetypes (tuple): The archetypes to spawn from
+
+    Returns:
+        MonsterPool: The new monsters, at full health
+    """
+    if weights is None:
+        kind = rng.integers(0, len(archetypes), n, dtype=np.uint8)
+    else:
+        weights = np.asarray(weights, dtype=np.float64)
+        kind = rng.choice(len(archetypes), n, p=weights / weights.sum()).astype(np.uint8)
+    return spawn_kinds(rng, kind, archetypes)
@@ -1,12 +1,24 @@
 from game_model import *
 from game_interface import *
+import os
+import re
+import secrets
 import sys
+import time
 
-def main():
+# Every session is recorded to a file in this directory, see replay.py
+REPLAY_DIR = "replays"
+
+def main(endless=False):
     """The main function will execute all the functions required to run the game.
     
     Initialise the game interface by introducing the user to the game.
+
+    Args:
+        endless (bool): Play in the endless world instead of the 5x5 maze
     """
+    # Load the maze's modules while the player answers the questions below
+    preload()
     print("Welcome to Mazes and Monsters!\n")
     while True:
         answer = input("Are you ready to begin? Yes or No.\n").lower()
@@ -30,13 +42,21 @@ def main():
     ask_start()
     # Run the initial welcome message to the user, introducing the gameplay.
     welcome_message()
+    if endless:
+        print("This is an endless maze: there is no finish line, so explore as far as you dare.")
 
-    # Create a game_instance using the hero and grid created.
-    game_instance = Game(hero)
-    
-    # This while block runs the game loop until completion.
-    while True:
-        game_instance.prompt_user()
+    # Record the session, so that it can be replayed with `python replay.py <file>`.
+    from replay import ReplayWriter
+    seed = secrets.randbits(64)
+    os.makedirs(REPLAY_DIR, exist_ok=True)
+    path = os.path.join(REPLAY_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{seed:016x}.mmrl")
+    with ReplayWriter.open(path) as log:
+        # Create a game_instance using the hero and grid created.
+        game_instance = Game(hero, seed=seed, log=log, endless=endless)
+
+        # Run the game loop until completion.
+        game_instance.play()
+    print(f"\nThis game was recorded in {path}")
         
 class QuitGameException(Exception):
     """Custom exception to handle quitting the game."""
@@ -54,21 +74,30 @@ def create_hero(name):
     """
     while True:
         option = input("\nPlease select which class you would like your Hero to be: Warrior/Mage/Archer\n")
-        
-        if re.search("warrior", option, flags=re.IGNORECASE):
-            hero = Warrior(name)
-            break
-        elif re.search("mage", option, flags=re.IGNORECASE):
-            hero = Mage(name)
-            break
-        elif re.search("archer", option, flags=re.IGNORECASE):
-            hero = Archer(name)
-            break
-        else:
-            print("\nPlease enter a valid class.")
-            print("-" * 27)
-            continue 
-    return hero
+        hero = hero_from_choice(name, option)
+        if hero is not None:
+            return hero
+        print("\nPlease enter a valid class.")
+        print("-" * 27)
+
+def hero_from_choice(name, option):
+    """
+    Creates a hero from the player's answer to the class question, without any prompting.
+
+    Args:
+        name (str): The name of the hero.
+        option (str): The player's answer, e.g. "warrior" or "I'll be a Mage".
+
+    Returns:
+        Hero: An instance of the chosen hero class, or None if no class was recognised.
+    """
+    if re.search("warrior", option, flags=re.IGNORECASE):
+        return Warrior(name)
+    elif re.search("mage", option, flags=re.IGNORECASE):
+        return Mage(name)
+    elif re.search("archer", option, flags=re.IGNORECASE):
+        return Archer(name)
+    return None
 
 def ask_start():
     """
@@ -90,23 +119,24 @@ def welcome_message():
     Displays a series of welcome messages to introduce the player to the game mechanics.
     Waits for the user to press Enter after each message.
     """
-    input("""\nWelcome to the Maze! Here you will guide your hero as they navigate their way through the monsters that block the way to the finish line.
-      
-Press Enter to continue.
-""")
-    input("""You will shortly see a display of your hero's starting location. In each cell, your hero may either encounter a monster, healing potion,
-treasure chest or a shopkeeper. 
+    for page in WELCOME_PAGES[:-1]:
+        input(page + "\nPress Enter to continue.\n")
+    print(WELCOME_PAGES[-1])
 
-Press Enter to continue.
-""")
-    input("""The treasure chest contains money that can be used to buy healing potions or special upgrades from the shopkeeper!
-
-Press Enter to continue.
-""")
-    print("""(0,0) is your starting position.
+# The pages of the welcome message, shared by the terminal and the network server.
+WELCOME_PAGES = (
+    """\nWelcome to the Maze! Here you will guide your hero as they navigate their way through the monsters that block the way to the finish line.
+      """,
+    """You will shortly see a display of your hero's starting location. In each cell, your hero may either encounter a monster, healing potion,
+treasure chest or a shopkeeper. 
+""",
+    """The treasure chest contains money that can be used to buy healing potions or special upgrades from the shopkeeper!
+""",
+    """(0,0) is your starting position.
 You can move up, left, right or down, so long as you stay within the maze's boundaries.
-Remember, the goal is to navigate to the bottom-right square, (4,4). Good luck!""")     
+Remember, the goal is to navigate to the bottom-right square, (4,4). Good luck!""",
+)
 
 
 if __name__ == "__main__":
-    main()
+    main(endless="--endless" in sys.argv[1:])
@@ -0,0 +1,290 @@
+"""
+replay.py
+
+This module records every session to a compact binary log and plays logs back.
+
+A game is decided by its seeds, its hero and the actions taken, so that is all a
+log holds: every random draw in the game (the maze's monsters and chests, and
+the combat dice) comes from the seeds. Replaying a log on a fresh GameEngine
+rebuilds the game exactly, to reproduce a bug report or to analyse sessions
+offline without replaying them live.
+
+A log is the MAGIC bytes followed by records, each a varint tag and its payload.
+Varints are unsigned LEB128: seven bits per byte, low bits first, with the top
+bit set on every byte but the last.
+
+    GAME     maze seed, game seed,     the maze is maze.default_maze(maze seed), or
+             undo levels, flags        world.ChunkedMaze(maze seed) if flags bit 1 is
+                                       set; flags bit 0 is set for stochastic combat
+    HERO     class, name               the class is an index into HERO_CLASSES
+    ACTION   text                      an action outside ACTIONS
+    tag >= ACTION_BASE                 ACTIONS[tag - ACTION_BASE], one byte
+
+Nearly every record is a one-byte action. Records are gathered in a buffer and
+written in bulk, and a log is only ever appended to.
+"""
+import sys
+import time
+
+from game_engine import DIRECTIONS, STATS, GameEngine
+from game_model import HERO_CLASSES
+
+MAGIC = b"MMRL\x01"
+
+# Record tags
+GAME = 1
+HERO = 2
+ACTION = 3
+ACTION_BASE = 16
+
+# Flags of a GAME record
+STOCHASTIC = 1
+ENDLESS = 2
+
+# Actions with a one-byte record, by tag - ACTION_BASE
+ACTIONS = tuple(DIRECTIONS) + ("heal", "quit", "potion") + STATS + ("leave", "undo", "redo")
+ACTION_TAGS = {action: ACTION_BASE + code for code, action in enumerate(ACTIONS)}
+
+# Bytes gathered before they are written
+BUFFER_SIZE = 1 << 16
+
+# Action of each tag byte, None for the tags of other records
+_TAG_ACTIONS = tuple(ACTIONS[tag - ACTION_BASE] if ACTION_BASE <= tag < ACTION_BASE + len(ACTIONS) else None
+                     for tag in range(256))
+
+
+def write_varint(buffer, value):
+    """Append a non-negative integer to a bytearray as a varint."""
+    while value > 0x7F:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data, position):
+    """Read a varint.
+
+    Args:
+        data (bytes): The log
+        position (int): Where the varint starts
+
+    Returns:
+        tuple: (value, position just after it)
+    """
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+class ReplayWriter(object):
+    """Appends the records of one session to a binary file.
+
+    Attributes:
+        file: The binary file written to
+        buffer (bytearray): Records not written yet
+        buffer_size (int): Buffered bytes that trigger a write
+    """
+
+    def __init__(self, file, buffer_size=BUFFER_SIZE):
+        """Start a log on an open binary file, writing MAGIC if the file is empty.
+
+        Args:
+            file: A binary file opened for appending
+            buffer_size (int): Buffered bytes that trigger a write
+        """
+        self.file = file
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+        if file.tell() == 0:
+            self.buffer += MAGIC
+
+    @classmethod
+    def open(cls, path, buffer_size=BUFFER_SIZE):
+        """Open a log file for appending, creating it if needed."""
+        return cls(open(path, "ab"), buffer_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def game(self, maze_seed, game_seed, undo_levels=0, stochastic=False, endless=False):
+        """Record the seeds of the maze and of the game, and the game's options."""
+        self.buffer.append(GAME)
+        write_varint(self.buffer, maze_seed)
+        write_varint(self.buffer, game_seed)
+        write_varint(self.buffer, undo_levels)
+        write_varint(self.buffer, (STOCHASTIC if stochastic else 0) | (ENDLESS if endless else 0))
+
+    def hero(self, hero):
+        """Record the hero the player created."""
+        name = hero.name.encode()
+        self.buffer.append(HERO)
+        write_varint(self.buffer, HERO_CLASSES.index(type(hero)))
+        write_varint(self.buffer, len(name))
+        self.buffer += name
+
+    def action(self, action):
+        """Record an action given to GameEngine.step."""
+        buffer = self.buffer
+        tag = ACTION_TAGS.get(action)
+        if tag is not None:
+            buffer.append(tag)
+        else:
+            text = action.encode()
+            buffer.append(ACTION)
+            write_varint(buffer, len(text))
+            buffer += text
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records to the file."""
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class Replay(object):
+    """The contents of a log.
+
+    Attributes:
+        maze_seed (int): Seed of the maze template
+        game_seed (int): Seed of the game's random streams
+        undo_levels (int): The game's undo_levels
+        stochastic (bool): Whether the game rolled its fights with dice
+        hero_class (type): Warrior, Mage or Archer
+        hero_name (str): The hero's name
+        actions (list): The actions, in order
+        endless (bool): Whether the game was played in the endless world
+    """
+
+    def __init__(self, maze_seed, game_seed, undo_levels, stochastic, hero_class, hero_name, actions,
+                 endless=False):
+        self.maze_seed = maze_seed
+        self.game_seed = game_seed
+        self.undo_levels = undo_levels
+        self.stochastic = stochastic
+        self.hero_class = hero_class
+        self.hero_name = hero_name
+        self.actions = actions
+        self.endless = endless
+
+    def start(self, undo_levels=None):
+        """Return a new game in the state the session started in.
+
+        Args:
+            undo_levels (int): Overrides the undo levels of the session
+        """
+        from maze import default_maze
+        from world import ChunkedMaze
+        maze = ChunkedMaze(self.maze_seed) if self.endless else default_maze(self.maze_seed)
+        return GameEngine(self.hero_class(self.hero_name), maze, seed=self.game_seed,
+                          undo_levels=self.undo_levels if undo_levels is None else undo_levels,
+                          stochastic=self.stochastic)
+
+    def play(self, engine=None):
+        """Apply every action to a game, as the session did, with GameEngine.run.
+
+        A new game for a session that never took an action back keeps no undo
+        history while it is replayed, which is faster, so undo can then only take
+        back the actions made after the replay.
+
+        Args:
+            engine (GameEngine): The game to play. Defaults to a new one from start().
+
+        Returns:
+            GameEngine: The game, in the state the session left it
+        """
+        if engine is not None:
+            engine.run(self.actions)
+            return engine
+        actions = self.actions
+        if self.undo_levels and "undo" not in actions and "redo" not in actions:
+            engine = self.start(undo_levels=0)
+            engine.run(actions)
+            engine.undo_levels = self.undo_levels
+            return engine
+        engine = self.start()
+        engine.run(actions)
+        return engine
+
+
+def parse(data) -> Replay:
+    """Decode a log.
+
+    Args:
+        data (bytes): The whole log
+
+    Returns:
+        Replay: Its seeds, hero and actions
+
+    Raises:
+        ValueError: If the data is not a complete log
+    """
+    if not data.startswith(MAGIC):
+        raise ValueError("Not a replay log")
+    maze_seed = game_seed = undo_levels = flags = hero_class = hero_name = None
+    actions = []
+    append = actions.append
+    tag_actions = _TAG_ACTIONS
+    position, end = len(MAGIC), len(data)
+    try:
+        while position < end:
+            tag = data[position]
+            position += 1
+            action = tag_actions[tag]
+            if action is not None:
+                append(action)
+            elif tag == ACTION:
+                length, position = read_varint(data, position)
+                append(data[position:position + length].decode())
+                position += length
+            elif tag == GAME:
+                maze_seed, position = read_varint(data, position)
+                game_seed, position = read_varint(data, position)
+                undo_levels, position = read_varint(data, position)
+                flags, position = read_varint(data, position)
+            elif tag == HERO:
+                index, position = read_varint(data, position)
+                length, position = read_varint(data, position)
+                hero_class = HERO_CLASSES[index]
+                hero_name = data[position:position + length].decode()
+                position += length
+            else:
+                raise ValueError(f"Unknown record {tag} at byte {position - 1}")
+    except IndexError:
+        raise ValueError("The log ends in the middle of a record") from None
+    if position > end:
+        raise ValueError("The log ends in the middle of a record")
+    if game_seed is None or hero_class is None:
+        raise ValueError("The log has no game or no hero")
+    return Replay(maze_seed, game_seed, undo_levels, bool(flags & STOCHASTIC), hero_class, hero_name, actions,
+                  bool(flags & ENDLESS))
+
+
+def load(path) -> Replay:
+    """Read and decode a log file."""
+    with open(path, "rb") as file:
+        return parse(file.read())
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    replay = load(sys.argv[1])
+    engine = replay.play()
+    seconds = time.perf_counter() - start
+    print(f"{replay.hero_name} the {replay.hero_class.__name__}: {engine.outcome or 'still playing'} "
+          f"after {engine.turns} turns at {engine.hero_position}")
+    print(f"{len(replay.actions):,} actions replayed in {seconds * 1000:.1f} ms")
@@ -0,0 +1,115 @@
+"""
+rng.py
+
+This module gives every game its own reproducible random numbers.
+
+A GameRNG is built from one seed. Every named stream ("monsters", "chests",
+"combat", ...) and every child context (one per entity or per worker process) gets
+its own seed, derived by hashing the parent seed with the stream's name. Streams
+never share state, so the same seed reproduces a run bit for bit no matter how many
+workers there are or in which order they run.
+"""
+import hashlib
+import random
+import secrets
+
+# Streams used by the game
+MAZE_STREAM = "maze"
+MONSTER_STREAM = "monsters"
+CHEST_STREAM = "chests"
+COMBAT_STREAM = "combat"
+
+
+def derive_seed(seed, *path) -> int:
+    """Derive an independent 128-bit seed from a parent seed and a path of names.
+
+    Args:
+        seed (int): The parent seed
+        *path: Names or numbers identifying the child, e.g. ("worker", 3)
+
+    Returns:
+        int: The derived seed
+    """
+    digest = hashlib.blake2b(repr((seed,) + path).encode(), digest_size=16).digest()
+    return int.from_bytes(digest, "little")
+
+
+class GameRNG(object):
+    """A tree of independent random streams grown from one seed.
+
+    Attributes:
+        seed (int): The seed this context was built from
+    """
+    __slots__ = ("seed", "_streams", "_generators")
+
+    def __init__(self, seed=None):
+        """Create a random context.
+
+        Args:
+            seed (int): The seed. A fresh random seed is used if not given.
+        """
+        self.seed = seed if seed is not None else secrets.randbits(128)
+        self._streams = {}
+        self._generators = {}
+
+    def seed_for(self, *path) -> int:
+        """Return the seed of a named stream or child."""
+        return derive_seed(self.seed, *path)
+
+    def stream(self, name):
+        """Return the scalar random stream with this name.
+
+        Args:
+            name (str): The stream, e.g. MONSTER_STREAM
+
+        Returns:
+            random.Random: The same object every time for the same name
+        """
+        stream = self._streams.get(name)
+        if stream is None:
+            stream = self._streams[name] = random.Random(self.seed_for(name))
+        return stream
+
+    def generator(self, name):
+        """Return the NumPy random generator with this name, for bulk draws.
+
+        Args:
+            name (str): The stream, e.g. MONSTER_STREAM
+
+        Returns:
+            numpy.random.Generator: The same object every time for the same name
+        """
+        generator = self._generators.get(name)
+        if generator is None:
+            import numpy as np
+            generator = self._generators[name] = np.random.default_rng(self.seed_for("numpy", name))
+        return generator
+
+    def child(self, *path):
+        """Return an independent context for an entity or a sub-task.
+
+        Args:
+            *path: Names or numbers identifying the child, e.g. ("monster", 12)
+
+        Returns:
+            GameRNG: A new context with its own seed
+        """
+        return GameRNG(self.seed_for("child", *path))
+
+    def worker(self, index):
+        """Return the context of one worker process."""
+        return self.child("worker", index)
+
+
+def as_game_rng(seed):
+    """Accept either a seed or an existing GameRNG.
+
+    Args:
+        seed: None, an int seed or a GameRNG
+
+    Returns:
+        GameRNG: The random context
+    """
+    if isinstance(seed, GameRNG):
+        return seed
+    return GameRNG(seed)
@@ -0,0 +1,217 @@
+"""
+savegame.py
+
+This module saves games to a fixed-layout binary file and loads them back.
+
+A save holds a game the way it is kept in memory: the maze template (the
+cell-kind array and the side tables of monster stats and chest coins), a bitmap
+of the cells this game has cleared, and a header with the hero and the engine's
+own fields. Every section sits at an offset worked out from the header alone:
+
+    header      HEADER, padded to a multiple of 8 bytes
+    kinds       uint8 per cell
+    cleared     one bit per cell, cell i is bit i % 8 of byte i // 8
+    monsters    int64 flat index of each monster cell, then one array per field
+                of population.POOL_FIELDS
+    chests      int64 flat index of each chest cell, then uint8 coins
+
+with every section starting on a multiple of 8 bytes. All numbers are little
+endian.
+
+Loading maps the file into memory and wraps the sections as read-only NumPy
+arrays, so opening a maze of any size takes the same few milliseconds and its
+pages are only read when a cell is looked at. Only the cleared bitmap is scanned.
+
+Cells only ever change by being cleared, so a game that saves again to the file
+it was loaded from or last saved to only rewrites the bytes of the bitmap that
+changed, then the header. A first save writes a new file and moves it into place.
+
+The random streams of the game are not saved: a loaded game gets new ones.
+"""
+from collections import namedtuple
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from game_engine import MAZE, SHOP
+from game_model import HERO_CLASSES
+from maze import Maze
+from population import MonsterPool, POOL_FIELDS
+
+MAGIC = b"MMSV"
+VERSION = 1
+
+# magic, version, rows, cols, monsters, chests, hero class, hero name, the 8 stats
+# of Character.get_state, row, col, goal row, goal col, turns, mode, done, outcome,
+# stochastic, undo levels, cleared key
+HEADER = struct.Struct("<4sHQQQQB64s8dQQQQQBBBBQQ")
+
+# Codes of the engine's mode and outcome in the header
+MODES = (MAZE, SHOP)
+OUTCOMES = (None, "won", "lost", "quit")
+
+SavedGame = namedtuple("SavedGame", ["template", "cleared", "hero", "goal", "undo_levels", "stochastic",
+                                     "fields"])
+SavedGame.__doc__ = """A game read from a save by read_game.
+
+template is the maze, read from the file without copying it, and cleared the set
+of flat indices of the cells the game had emptied. fields holds the engine's
+hero_position, turns, mode, done, outcome and cleared_key, in that order.
+"""
+
+# Engine attributes restored from SavedGame.fields
+SAVED_FIELDS = ("hero_position", "turns", "mode", "done", "outcome", "cleared_key")
+
+
+def _align(offset) -> int:
+    return (offset + 7) & ~7
+
+
+def layout(rows, cols, monsters, chests) -> dict:
+    """Work out where each array of a save starts.
+
+    Returns:
+        tuple: (sections, size): section name -> (offset, dtype, length), and the
+            size of the whole file
+    """
+    cells = rows * cols
+    sections = [("kinds", np.uint8, cells), ("cleared", np.uint8, (cells + 7) // 8),
+                ("monster_cells", np.dtype("<i8"), monsters)]
+    sections += [(field, np.dtype(dtype).newbyteorder("<"), monsters) for field, dtype in POOL_FIELDS]
+    sections += [("chest_cells", np.dtype("<i8"), chests), ("chest_coins", np.uint8, chests)]
+    offsets = {}
+    offset = _align(HEADER.size)
+    for name, dtype, length in sections:
+        offsets[name] = (offset, np.dtype(dtype), length)
+        offset = _align(offset + np.dtype(dtype).itemsize * length)
+    return offsets, offset
+
+
+def _header(engine) -> bytes:
+    """Pack the header of a game's save."""
+    template = engine.grid.template
+    hero = engine.hero
+    name = hero.name.encode()
+    if len(name) > 64:
+        raise ValueError("Hero names of more than 64 bytes cannot be saved")
+    return HEADER.pack(MAGIC, VERSION, template.rows, template.cols, len(template.monster_cells),
+                       len(template.chest_cells), HERO_CLASSES.index(type(hero)), name, *hero.get_state(),
+                       *engine.hero_position, *engine.goal, engine.turns, MODES.index(engine.mode),
+                       engine.done, OUTCOMES.index(engine.outcome), engine.stochastic, engine.undo_levels,
+                       engine.cleared_key)
+
+
+def _bitmap(cleared, size):
+    """Pack flat cell indices into a cleared bitmap of size bytes."""
+    bitmap = np.zeros(size, dtype=np.uint8)
+    if cleared:
+        indices = np.fromiter(cleared, dtype=np.int64, count=len(cleared))
+        np.bitwise_or.at(bitmap, indices >> 3, np.left_shift(1, indices & 7).astype(np.uint8))
+    return bitmap
+
+
+def save_game(engine, path):
+    """Save a game, only rewriting what changed if the file holds its last save.
+
+    Args:
+        engine (GameEngine): A game played on a maze template, e.g. generate_maze's
+        path (str): The file to save to
+
+    Raises:
+        ValueError: If the game is played on a hand-built grid
+    """
+    template = getattr(engine.grid, "template", None)
+    if template is None:
+        raise ValueError("Only games played on a maze template can be saved")
+    cleared = engine.grid.cleared
+    saved = engine.saved
+    if saved is not None and saved[0] == path and saved[1] is template and os.path.exists(path):
+        _save_changes(engine, path, saved[2])
+    else:
+        _save_all(engine, path)
+    engine.saved = (path, template, frozenset(cleared))
+
+
+def _save_all(engine, path):
+    """Write a whole save to a new file, then move it into place."""
+    template = engine.grid.template
+    monsters = template.monsters
+    sections, size = layout(template.rows, template.cols, len(template.monster_cells),
+                            len(template.chest_cells))
+    arrays = {"kinds": template.kinds.reshape(-1),
+              "cleared": _bitmap(engine.grid.cleared, sections["cleared"][2]),
+              "monster_cells": template.monster_cells, "chest_cells": template.chest_cells,
+              "chest_coins": template.chest_coins}
+    arrays.update((field, getattr(monsters, field)) for field, _ in POOL_FIELDS)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(_header(engine))
+        for name, (offset, dtype, length) in sections.items():
+            file.write(bytes(offset - file.tell()))
+            file.write(np.ascontiguousarray(arrays[name], dtype=dtype).data)
+        file.write(bytes(size - file.tell()))
+    os.replace(temporary, path)
+
+
+def _save_changes(engine, path, before):
+    """Rewrite the bitmap bytes of the cells cleared or put back since the last save, then the header."""
+    template = engine.grid.template
+    cleared = engine.grid.cleared
+    offset = layout(template.rows, template.cols, len(template.monster_cells),
+                    len(template.chest_cells))[0]["cleared"][0]
+    changed = sorted({index >> 3 for index in cleared.symmetric_difference(before)})
+    with open(path, "r+b") as file:
+        for byte in changed:
+            first = byte << 3
+            value = sum(1 << bit for bit in range(8) if first + bit in cleared)
+            file.seek(offset + byte)
+            file.write(bytes((value,)))
+        # The header goes last, once the maze matches it
+        file.seek(0)
+        file.write(_header(engine))
+
+
+def read_game(path) -> SavedGame:
+    """Open a save, mapping its maze into memory.
+
+    Args:
+        path (str): The save file
+
+    Returns:
+        SavedGame: The game, with a template reading straight from the file
+
+    Raises:
+        ValueError: If the file is not a complete save
+    """
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError("Not a saved game")
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    (magic, version, rows, cols, monsters, chests, hero_class, name, *stats) = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a saved game")
+    if version != VERSION:
+        raise ValueError(f"Saved games of version {version} are not supported")
+    stats, (row, col, goal_row, goal_col, turns, mode, done, outcome, stochastic, undo_levels,
+            cleared_key) = stats[:8], stats[8:]
+    sections, end = layout(rows, cols, monsters, chests)
+    if size < end:
+        raise ValueError("The saved game is cut short")
+    arrays = {name: np.frombuffer(data, dtype, length, offset) if length else np.empty(0, dtype)
+              for name, (offset, dtype, length) in sections.items()}
+
+    bitmap = arrays["cleared"]
+    nonzero = np.flatnonzero(bitmap)
+    bytes_, bits = np.nonzero(np.unpackbits(bitmap[nonzero], bitorder="little").reshape(-1, 8))
+    cleared = set((nonzero[bytes_] * 8 + bits).tolist())
+
+    template = Maze(arrays["kinds"].reshape(rows, cols), arrays["monster_cells"],
+                    MonsterPool.from_arrays(arrays), arrays["chest_cells"], arrays["chest_coins"])
+    hero = HERO_CLASSES[hero_class](name.rstrip(b"\0").decode())
+    # Stats are saved as doubles; whole numbers go back to being ints
+    hero.set_state(tuple(int(stat) if stat.is_integer() else stat for stat in stats))
+    fields = ((row, col), turns, MODES[mode], bool(done), OUTCOMES[outcome], cleared_key)
+    return SavedGame(template, cleared, hero, (goal_row, goal_col), undo_levels, bool(stochastic), fields)
@@ -0,0 +1,210 @@
+"""
+server.py
+
+This module serves the game to many players at once over a local socket.
+
+Each connection owns its own hero and game, playing on its own view of one shared
+maze template. The protocol is line based. The server sends text lines for the
+player, and every reply ends with a status line:
+
+    OK {"position": [0, 1], ...}      waiting for the next action
+    DONE {"outcome": "won", ...}      the game is over and the connection closes
+
+A session starts by sending the hero's name and class, one per line. After that
+every line is an action for GameEngine.step, e.g. "right", "heal", "potion",
+"leave" or "quit".
+
+Usage:
+    python server.py [port | unix socket path] [metrics file] [replay directory]
+
+With a metrics file, the server measures every phase of the game (see
+metrics.py) and saves a snapshot every METRICS_INTERVAL seconds, in the
+Prometheus text format if the file name ends in .prom, otherwise as JSON. A last
+snapshot is saved when the server is stopped with Ctrl-C. With a replay
+directory, every session is recorded to its own file there (see replay.py). Pass
+"-" as the metrics file to record sessions without metrics.
+"""
+import asyncio
+import json
+import os
+import secrets
+import sys
+
+from game_engine import GameEngine
+from game_interface import describe
+from maze import default_maze
+from metrics import Metrics
+from project import hero_from_choice, WELCOME_PAGES
+from replay import ReplayWriter
+
+DEFAULT_PORT = 8765
+
+# Seconds between metrics snapshots
+METRICS_INTERVAL = 10
+
+
+class GameServer(object):
+    """Hosts one game per connection in a single asyncio event loop.
+
+    Attributes:
+        maze (Maze): The maze template shared by every session
+        seed (int): Seed of the default maze, if the server built it from one
+        verbose (bool): Whether fights are reported attack by attack
+        replay_dir (str): Directory each session is recorded to, if any
+        active (int): Number of connected sessions
+        served (int): Number of sessions served so far
+    """
+
+    def __init__(self, maze=None, verbose=True, replay_dir=None, seed=None):
+        """Set up the server.
+
+        Args:
+            maze (Maze): The maze template. Defaults to the default maze.
+            verbose (bool): Whether fights are reported attack by attack
+            replay_dir (str): Record every session to a file in this directory,
+                see replay.py. Needs the default maze.
+            seed (int): Seed of the default maze. Picked at random when recording.
+        """
+        if replay_dir is not None:
+            if maze is not None:
+                raise ValueError("Recorded sessions need the default maze")
+            if seed is None:
+                seed = secrets.randbits(64)
+            os.makedirs(replay_dir, exist_ok=True)
+        self.maze = maze if maze is not None else default_maze(seed)
+        self.seed = seed
+        self.verbose = verbose
+        self.replay_dir = replay_dir
+        self.active = 0
+        self.served = 0
+
+    async def handle(self, reader, writer):
+        """Play one session on a connection."""
+        self.active += 1
+        self.served += 1
+        try:
+            await self.play(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # The server is shutting down; the connection is closed below
+            pass
+        finally:
+            self.active -= 1
+            writer.close()
+
+    async def play(self, reader, writer):
+        """Create the hero, then apply one action per line until the game is done."""
+        send = writer.write
+        send(("Welcome to Mazes and Monsters!\nEnter a name for your hero.\nOK {}\n").encode())
+        name = ""
+        while not name:
+            name = await self.read_line(reader)
+            if name is None:
+                return
+        send(b"Please select which class you would like your Hero to be: Warrior/Mage/Archer\nOK {}\n")
+        hero = None
+        while hero is None:
+            option = await self.read_line(reader)
+            if option is None:
+                return
+            hero = hero_from_choice(name, option)
+            if hero is None:
+                send(b"Please enter a valid class.\nOK {}\n")
+
+        seed = secrets.randbits(64)
+        engine = GameEngine(hero, self.maze, verbose=self.verbose, seed=seed)
+        log = None
+        if self.replay_dir is not None:
+            path = os.path.join(self.replay_dir, f"{self.served:08d}-{seed:016x}.mmrl")
+            log = ReplayWriter.open(path)
+            log.game(self.seed, seed)
+            log.hero(hero)
+        send(("\n".join(WELCOME_PAGES) + "\n" + self.status(engine)).encode())
+        await writer.drain()
+
+        try:
+            while not engine.done:
+                action = await self.read_line(reader)
+                if action is None:
+                    return
+                action = action.lower()
+                if log is not None:
+                    log.action(action)
+                events = engine.step(action)[1]
+                # Events such as "moved" have nothing to say
+                lines = [text for text in map(describe, events) if text]
+                lines.append(self.status(engine))
+                send("\n".join(lines).encode())
+                await writer.drain()
+        finally:
+            if log is not None:
+                log.close()
+
+    async def read_line(self, reader):
+        """Read one stripped line, or None once the client has gone.
+
+        A line longer than the reader's limit also ends the session, and bytes
+        that are not UTF-8 are replaced rather than failing the session.
+        """
+        try:
+            line = await reader.readline()
+        except ValueError:
+            # readline raises ValueError for a line over the limit
+            return None
+        if not line:
+            return None
+        return line.decode(errors="replace").strip()
+
+    def status(self, engine):
+        """Return the status line that ends every reply."""
+        observation = engine.observation()
+        return ("DONE " if engine.done else "OK ") + json.dumps(observation) + "\n"
+
+    async def serve(self, port=DEFAULT_PORT, path=None):
+        """Start listening on a local TCP port, or on a Unix socket if a path is given.
+
+        Returns:
+            asyncio.Server: The running server
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path, backlog=4096)
+        return await asyncio.start_server(self.handle, "127.0.0.1", port, backlog=4096)
+
+
+async def save_metrics(metrics, path, interval=METRICS_INTERVAL):
+    """Save a metrics snapshot every interval seconds, and once more when cancelled."""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            metrics.write(path)
+    finally:
+        metrics.write(path)
+
+
+async def main(target, metrics_path=None, replay_dir=None):
+    server = GameServer(replay_dir=replay_dir)
+    if target.isdigit():
+        listener = await server.serve(port=int(target))
+    else:
+        listener = await server.serve(path=target)
+    print(f"Serving Mazes and Monsters on {target}")
+    metrics = saver = None
+    if metrics_path not in (None, "-"):
+        metrics = Metrics()
+        metrics.install()
+        saver = asyncio.create_task(save_metrics(metrics, metrics_path))
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        if saver is not None:
+            saver.cancel()
+            await asyncio.gather(saver, return_exceptions=True)
+            metrics.uninstall()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else str(DEFAULT_PORT),
+                     sys.argv[2] if len(sys.argv) > 2 else None,
+                     sys.argv[3] if len(sys.argv) > 3 else None))
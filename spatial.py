@@ -0,0 +1,187 @@
+"""
+spatial.py
+
+This module indexes where the monsters, chests, potions and shopkeepers of a
+maze are, so they can be found without stepping on or scanning every cell.
+
+The maze is divided into square buckets of cells. For each kind of cell the
+index keeps the set of occupied cells in every bucket, plus a running count.
+Queries only look at the buckets near the hero, and emptying a cell removes it
+from its bucket in O(1). Distances are Manhattan distances, i.e. the number of
+moves between two cells on an open maze.
+"""
+import numpy as np
+
+from game_model import Monster, TreasureChest, HealingPotion, Shopkeeper
+from maze import MazeView, EMPTY, MONSTER, CHEST, POTION, SHOPKEEPER
+
+# Kinds of cell that are indexed
+INDEXED_KINDS = (MONSTER, CHEST, POTION, SHOPKEEPER)
+
+# Width and height of a bucket, in cells
+BUCKET_SIZE = 16
+
+
+def kind_of(cell) -> int:
+    """Return the kind of a game object as one of the maze cell kinds."""
+    if isinstance(cell, Monster):
+        return MONSTER
+    if isinstance(cell, TreasureChest):
+        return CHEST
+    if isinstance(cell, HealingPotion):
+        return POTION
+    if isinstance(cell, Shopkeeper):
+        return SHOPKEEPER
+    return EMPTY
+
+
+class SpatialIndex(object):
+    """Bucketed index of the occupied cells of a maze, by kind.
+
+    Attributes:
+        rows (int): Number of rows
+        cols (int): Number of columns
+        bucket_size (int): Width and height of a bucket, in cells
+        buckets (dict): kind -> {bucket number: set of flat cell indices}
+        counts (dict): kind -> number of cells of that kind
+    """
+
+    def __init__(self, grid, bucket_size=BUCKET_SIZE):
+        """Index every occupied cell of a maze.
+
+        Args:
+            grid: The maze. A maze.Maze, a maze.MazeView or any object with rows,
+                cols and cell().
+            bucket_size (int): Width and height of a bucket, in cells
+        """
+        self.rows = grid.rows
+        self.cols = grid.cols
+        self.bucket_size = bucket_size
+        self.bucket_cols = -(-self.cols // bucket_size)
+        self.buckets = {kind: {} for kind in INDEXED_KINDS}
+        self.counts = dict.fromkeys(INDEXED_KINDS, 0)
+
+        template = grid.template if isinstance(grid, MazeView) else grid
+        if hasattr(template, "kinds"):
+            kinds = template.kinds.reshape(-1)
+            for kind in INDEXED_KINDS:
+                self._add_cells(kind, np.flatnonzero(kinds == kind))
+            if isinstance(grid, MazeView):
+                for index in grid.cleared:
+                    self.remove(*divmod(index, self.cols))
+        else:
+            cells = {kind: [] for kind in INDEXED_KINDS}
+            for row in range(self.rows):
+                for col in range(self.cols):
+                    kind = kind_of(grid.cell(row, col))
+                    if kind != EMPTY:
+                        cells[kind].append(row * self.cols + col)
+            for kind, found in cells.items():
+                self._add_cells(kind, np.array(found, dtype=np.int64))
+
+    def _add_cells(self, kind, cells):
+        """Add the flat indices of cells of one kind, grouped into buckets in bulk."""
+        if not cells.size:
+            return
+        rows, cols = np.divmod(cells, self.cols)
+        numbers = (rows // self.bucket_size) * self.bucket_cols + cols // self.bucket_size
+        order = np.argsort(numbers, kind="stable")
+        numbers, cells = numbers[order], cells[order]
+        starts = np.flatnonzero(np.diff(numbers, prepend=-1))
+        buckets = self.buckets[kind]
+        for number, group in zip(numbers[starts].tolist(), np.split(cells, starts[1:])):
+            buckets.setdefault(number, set()).update(group.tolist())
+        self.counts[kind] += cells.size
+
+    def _bucket(self, row, col) -> int:
+        return (row // self.bucket_size) * self.bucket_cols + col // self.bucket_size
+
+    def add(self, row, col, kind):
+        """Record that a cell now holds something of the given kind."""
+        bucket = self.buckets[kind].setdefault(self._bucket(row, col), set())
+        index = row * self.cols + col
+        if index not in bucket:
+            bucket.add(index)
+            self.counts[kind] += 1
+
+    def remove(self, row, col):
+        """Record that a cell has been emptied. Does nothing if it was not indexed."""
+        index = row * self.cols + col
+        number = self._bucket(row, col)
+        for kind, buckets in self.buckets.items():
+            bucket = buckets.get(number)
+            if bucket and index in bucket:
+                bucket.remove(index)
+                self.counts[kind] -= 1
+                return
+
+    def count(self, kind) -> int:
+        """Return the number of cells of a kind, e.g. the unlooted chests."""
+        return self.counts[kind]
+
+    def nearest(self, kind, row, col):
+        """Find the closest cell of a kind.
+
+        Buckets are searched in rings of growing size around the cell, stopping
+        once no unsearched bucket could hold anything closer.
+
+        Args:
+            kind (int): MONSTER, CHEST, POTION or SHOPKEEPER
+            row (int): Row to search from
+            col (int): Column to search from
+
+        Returns:
+            tuple: (row, col, distance) of the closest cell, ties broken by
+                position, or None if there are none left
+        """
+        if not self.counts[kind]:
+            return None
+        buckets = self.buckets[kind]
+        size = self.bucket_size
+        bucket_row, bucket_col = row // size, col // size
+        last_row = (self.rows - 1) // size
+        last_col = self.bucket_cols - 1
+        best = None
+        ring = 0
+        while ring <= max(bucket_row, last_row - bucket_row, bucket_col, last_col - bucket_col):
+            # Every cell in this ring is at least this far away
+            if best is not None and (ring - 1) * size + 1 > best[0]:
+                break
+            for other_row in range(max(bucket_row - ring, 0), min(bucket_row + ring, last_row) + 1):
+                edge = abs(other_row - bucket_row) == ring
+                step = 1 if edge else 2 * ring
+                for other_col in range(bucket_col - ring, bucket_col + ring + 1, step):
+                    if not 0 <= other_col <= last_col:
+                        continue
+                    for index in buckets.get(other_row * self.bucket_cols + other_col, ()):
+                        found_row, found_col = divmod(index, self.cols)
+                        candidate = (abs(found_row - row) + abs(found_col - col), index)
+                        if best is None or candidate < best:
+                            best = candidate
+            ring += 1
+        distance, index = best
+        return (*divmod(index, self.cols), distance)
+
+    def within(self, kind, row, col, radius):
+        """List the cells of a kind at most radius moves away.
+
+        Args:
+            kind (int): MONSTER, CHEST, POTION or SHOPKEEPER
+            row (int): Row to search from
+            col (int): Column to search from
+            radius (int): Greatest distance to include
+
+        Returns:
+            list: (row, col) of every matching cell, in row-major order
+        """
+        buckets = self.buckets[kind]
+        size = self.bucket_size
+        found = []
+        for bucket_row in range(max(row - radius, 0) // size, min(row + radius, self.rows - 1) // size + 1):
+            for bucket_col in range(max(col - radius, 0) // size, min(col + radius, self.cols - 1) // size + 1):
+                for index in buckets.get(bucket_row * self.bucket_cols + bucket_col, ()):
+                    found_row, found_col = divmod(index, self.cols)
+                    if abs(found_row - row) + abs(found_col - col) <= radius:
+                        found.append(index)
+        found.sort()
+        return [divmod(index, self.cols) for index in found]
@@ -0,0 +1,80 @@
+"""
+test_batch.py
+
+This test suite verifies the lockstep batch of games in batch.py.
+
+The focus is on testing:
+- Every game in a batch plays exactly like its own GameEngine, with and
+  without dice
+- Invalid actions and finished games are ignored
+- Resetting some games leaves the others alone
+"""
+
+import numpy as np
+import pytest
+
+from game_model import *
+from game_engine import GameEngine
+from maze import generate_maze, maze_from_layout
+from batch import *
+from dice import combat_dice
+
+
+def play_batch_and_engines(stochastic):
+    maze = generate_maze(8, 8, seed=4, shopkeeper_density=0.1)
+    classes = (Warrior, Mage, Archer)
+    games = 150
+    dice = combat_dice(range(games)) if stochastic else None
+    batch = BatchGame(maze, [classes[i % 3]("Bot") for i in range(games)], dice=dice)
+    engines = [GameEngine(classes[i % 3]("Bot"), maze, seed=i, stochastic=stochastic)
+               for i in range(games)]
+    rng = np.random.default_rng(0)
+    for _ in range(150):
+        actions = np.where(rng.random(games) < 0.6, rng.integers(0, 4, games),
+                           rng.integers(0, len(ACTIONS), games))
+        actions = np.where((actions == QUIT) & (rng.random(games) < 0.99), 0, actions)
+        batch.step(actions)
+        for engine, action in zip(engines, actions):
+            engine.step(ACTIONS[action])
+    return maze, batch, engines
+
+
+@pytest.mark.parametrize("stochastic", [False, True])
+def test_batch_matches_engine(stochastic):
+    maze, batch, engines = play_batch_and_engines(stochastic)
+    assert set(batch.outcome) >= {PLAYING, WON, LOST}
+    for i, engine in enumerate(engines):
+        observation = engine.observation()
+        assert (batch.row[i], batch.col[i]) == observation["position"]
+        assert batch.health[i] == observation["health"]
+        assert ("shop" if batch.mode[i] == SHOP_MODE else "maze") == observation["mode"]
+        assert OUTCOMES[batch.outcome[i]] == observation["outcome"]
+        for field in ("accuracy", "defence", "stealth", "coins", "potions", "turns"):
+            assert getattr(batch, field)[i] == observation[field]
+        bits = np.unpackbits(batch.cleared[i], bitorder="little")[:maze.rows * maze.cols]
+        assert set(np.flatnonzero(bits).tolist()) == engine.grid.cleared
+
+
+def test_invalid_and_finished_games_ignored():
+    maze = maze_from_layout(("..", ".."))
+    batch = BatchGame(maze, Mage("Bot"), size=3)
+    actions = np.array([ACTIONS.index("leave"), ACTIONS.index("right"), ACTIONS.index("quit")])
+    observation, reward, done = batch.step(actions)
+    assert list(observation["turns"]) == [0, 1, 1]
+    assert list(done) == [False, False, True]
+    _, reward, done = batch.step(np.full(3, ACTIONS.index("down")))
+    assert list(reward) == [0, 1, 0]
+    assert list(batch.outcome) == [PLAYING, WON, QUIT_GAME]
+    assert list(batch.turns) == [1, 2, 1]
+
+
+def test_reset_some_games():
+    maze = maze_from_layout((".C", ".."))
+    batch = BatchGame(maze, Warrior("Bot"), size=2)
+    batch.step(np.full(2, ACTIONS.index("right")))
+    assert list(batch.coins) == [maze.chest_coins[0]] * 2
+    batch.reset(np.array([True, False]))
+    assert list(batch.coins) == [0, maze.chest_coins[0]]
+    assert list(batch.col) == [0, 1]
+    assert not batch.is_cleared(np.array([0]), np.array([1]))[0]
+    assert batch.is_cleared(np.array([1]), np.array([1]))[0]
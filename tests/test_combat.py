@@ -0,0 +1,123 @@
+"""
+test_combat.py
+
+This test suite verifies the batch fight simulator in combat.py.
+
+The focus is on testing:
+- Equivalence with the scalar GameEngine.fight loop
+- Stalemates and broadcasting of a single hero against many monsters
+- Stochastic fights rolling the same dice one at a time and in a batch
+"""
+
+from game_model import *
+from game_engine import GameEngine, roll_fight
+from combat import *
+from dice import combat_dice
+import numpy as np
+import random
+
+
+def fight_scalar(hero, monster):
+    """Fight with the scalar engine and return (outcome, rounds, hero health, monster health)."""
+    engine = GameEngine(hero, [[None, monster]], goal=(-1, -1), verbose=True)
+    events = engine.step("right")[1]
+    rounds = sum(1 for event in events if event[0] in ("hero_attack", "hero_miss"))
+    if events[-1][0] == "stalemate":
+        outcome = STALEMATE
+    elif events[-1][0] == "monster_slain":
+        outcome = HERO_WINS
+    else:
+        outcome = MONSTER_WINS
+    return outcome, rounds, hero.health, monster.health
+
+
+def random_hero(rng):
+    hero = rng.choice([Warrior, Mage, Archer])("Hero")
+    hero.health = rng.randint(1, hero.max_health)
+    hero.accuracy = rng.randint(0, 10)
+    hero.defence = rng.randint(0, 10)
+    hero.stealth = rng.randint(0, 10)
+    return hero
+
+
+def test_batch_matches_scalar_fight():
+    rng = random.Random(50)
+    heroes, monsters, expected = [], [], []
+    for i in range(2000):
+        random.seed(i)
+        hero, monster = random_hero(rng), Monster("Blob")
+        heroes.append(hero)
+        monsters.append(monster)
+    hero_stats, monster_stats = stat_block(heroes), stat_block(monsters)
+    for hero, monster in zip(heroes, monsters):
+        expected.append(fight_scalar(hero, monster))
+
+    results = simulate_fights(hero_stats, monster_stats)
+    outcome, rounds, hero_health, monster_health = zip(*expected)
+    assert results.outcome.tolist() == list(outcome)
+    assert results.rounds.tolist() == list(rounds)
+    assert results.hero_health.tolist() == list(hero_health)
+    assert results.monster_health.tolist() == list(monster_health)
+
+
+def test_stalemate():
+    hero = stat_block([Warrior("Stuck")])
+    hero["stealth"][:] = 10
+    monster = {"health": 50, "power": 10, "accuracy": 8, "defence": 8, "stealth": 8}
+    results = simulate_fights(hero, monster)
+    assert results.outcome.tolist() == [STALEMATE]
+    assert results.rounds.tolist() == [0]
+
+
+def test_one_hero_against_many_monsters():
+    monsters = roll_monsters(10_000, np.random.default_rng(1))
+    results = simulate_fights(stat_block([Mage("Many")]), monsters)
+    assert results.outcome.shape == (10_000,)
+    assert set(np.unique(results.outcome)) <= {HERO_WINS, MONSTER_WINS}
+    assert 0 <= win_rate(Mage("Many"), 1000, np.random.default_rng(2)) <= 1
+
+
+def test_dice_rows_match_scalar_draws():
+    # A small block, so that lanes are refilled part way through
+    scalar, batch = combat_dice([1, 2, 3], block_size=12), combat_dice([1, 2, 3], block_size=12)
+    for count in (6, 6, 5, 6):
+        rows = batch.draw_rows(np.array([2, 0]), count)
+        assert rows.tolist() == [scalar.draw(count, 2), scalar.draw(count, 0)]
+    assert batch.draw(6, 1) == scalar.draw(6, 1)
+
+
+def test_roll_fights_match_roll_fight():
+    rng = random.Random(7)
+    heroes, monsters = [], []
+    for i in range(500):
+        random.seed(i)
+        heroes.append(random_hero(rng))
+        monsters.append(Monster("Blob"))
+    hero_stats, monster_stats = stat_block(heroes), stat_block(monsters)
+    lanes = np.arange(len(heroes))
+    batch_dice = combat_dice(lanes.tolist(), block_size=60)
+    results = [roll_fights(hero_stats, monster_stats, batch_dice, lanes) for _ in range(2)]
+
+    for lane, (hero, monster) in enumerate(zip(heroes, monsters)):
+        dice = combat_dice([lane], block_size=60)
+        for result in results:
+            expected = roll_fight(hero, monster, dice)
+            outcome = {"hero": HERO_WINS, "enemy": MONSTER_WINS, None: STALEMATE}[expected.winner]
+            assert result.outcome[lane] == outcome
+            assert result.rounds[lane] == expected.rounds
+            assert result.hero_health[lane] == expected.hero_health
+            assert result.monster_health[lane] == expected.enemy_health
+    assert {HERO_WINS, MONSTER_WINS} <= set(results[0].outcome.tolist())
+
+
+def test_stochastic_attacks_land_with_hit_chance():
+    hero, monster = Mage("Lucky"), Monster("Blob")
+    for character in (hero, monster):
+        character.max_health = character.health = 10 ** 9
+    events = []
+    roll_fight(hero, monster, combat_dice([3]), events=events)
+    attacks = [event for event in events if event[0] in ("hero_attack", "hero_miss")]
+    landed = [event[1] for event in attacks if event[0] == "hero_attack"]
+    assert len(attacks) == 1000
+    assert abs(len(landed) / len(attacks) - hero.hit_chance(monster)) < 0.05
+    assert set(landed) == {hero.power * 1.5, hero.power, hero.power * 0.5}
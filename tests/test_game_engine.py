@@ -0,0 +1,427 @@
+"""
+test_game_engine.py
+
+This test suite verifies the headless rules engine defined in game_engine.py.
+
+The focus is on testing:
+- Movement, bounds and winning
+- Cell encounters (chests, potions, monsters, shopkeepers)
+- Healing and shopping actions
+- That the engine never prints or exits
+"""
+
+from game_model import *
+from game_engine import GameEngine, TurnScheduler, resolve_fight, MAZE, SHOP
+import random
+import traceback
+
+import pytest
+
+
+def make_monster(name="Blob", health=40, power=10, defence=5, stealth=5):
+    """Create a Monster with known stats."""
+    monster = Monster(name)
+    monster.max_health = health
+    monster.health = health
+    monster.power = power
+    monster.defence = defence
+    monster.stealth = stealth
+    return monster
+
+
+def make_engine(grid, hero=None):
+    return GameEngine(hero or Warrior("Tester"), grid)
+
+
+def test_move_to_empty_cell():
+    engine = make_engine([[None, None, None], [None, None, None]])
+    observation, events, done = engine.step("right")
+    assert observation["position"] == (0, 1)
+    assert events == [("moved", (0, 1)), ("empty",)]
+    assert not done
+
+
+def test_move_out_of_bounds_is_blocked():
+    engine = make_engine([[None, None], [None, None]])
+    observation, events, done = engine.step("up")
+    assert observation["position"] == (0, 0)
+    assert events == [("blocked", "up")]
+
+
+def test_reaching_goal_wins():
+    engine = make_engine([[None, None], [None, None]])
+    engine.step("right")
+    observation, events, done = engine.step("down")
+    assert done
+    assert observation["outcome"] == "won"
+    assert events == [("won", (1, 1))]
+
+
+def test_invalid_action():
+    engine = make_engine([[None, None], [None, None]])
+    observation, events, done = engine.step("dance")
+    assert events == [("invalid_action", "dance")]
+    assert observation["turns"] == 0
+
+
+def test_chest_adds_coins_and_is_emptied():
+    chest = TreasureChest()
+    grid = [[None, chest, None], [None, None, None]]
+    engine = make_engine(grid)
+    engine.hero.coins = 5
+    observation, events, done = engine.step("right")
+    assert observation["coins"] == 5 + chest.num_of_coins
+    assert ("chest", chest.num_of_coins) in events
+    assert grid[0][1] is None
+
+
+def test_potion_pickup_and_heal():
+    grid = [[None, HealingPotion(), None], [None, None, None]]
+    engine = make_engine(grid)
+    observation, events, done = engine.step("right")
+    assert observation["potions"] == 2
+    assert grid[0][1] is None
+
+    observation, events, done = engine.step("heal")
+    assert events == [("full_health",)]
+
+    engine.hero.health = 50
+    observation, events, done = engine.step("heal")
+    assert events == [("healed", 70)]
+    assert observation["potions"] == 1
+
+
+def test_heal_without_potions():
+    engine = make_engine([[None, None], [None, None]])
+    engine.hero.potions = 0
+    observation, events, done = engine.step("heal")
+    assert events == [("no_potions",)]
+
+
+def test_fight_hero_wins():
+    grid = [[None, make_monster(health=40)], [None, None]]
+    engine = make_engine(grid)
+    observation, events, done = engine.step("right")
+    assert ("monster_slain", "Blob") in events
+    assert grid[0][1] is None
+    assert not done
+    assert observation["health"] < 100
+
+
+def test_fight_hero_loses():
+    grid = [[None, make_monster(health=80, power=15, defence=8, stealth=8)], [None, None]]
+    engine = make_engine(grid)
+    engine.hero.health = 10
+    observation, events, done = engine.step("right")
+    assert done
+    assert observation["outcome"] == "lost"
+    assert events[-1] == ("defeated",)
+
+
+def test_fight_stalemate_leaves_monster():
+    monster = make_monster(defence=8, stealth=8)
+    grid = [[None, monster], [None, None]]
+    hero = Warrior("Tester")
+    hero.stealth = 10
+    engine = make_engine(grid, hero)
+    observation, events, done = engine.step("right")
+    assert events[-1] == ("stalemate", "Blob")
+    assert grid[0][1] is monster
+    assert not done
+
+
+def fight_by_attacks(hero, enemy):
+    """The original round-by-round fight loop, using attack()."""
+    rounds = 0
+    while hero.health > 0 and enemy.health > 0:
+        rounds += 1
+        hero.attack(enemy)
+        if enemy.health <= 0:
+            break
+        enemy.attack(hero)
+    return rounds
+
+
+def test_resolve_fight_matches_attack_loop():
+    rng = random.Random(4)
+    for i in range(500):
+        random.seed(i)
+        hero = rng.choice([Warrior, Mage, Archer])("Hero")
+        hero.health = rng.randint(1, hero.max_health)
+        hero.accuracy = rng.randint(3, 10)
+        enemy = Monster("Blob")
+        result = resolve_fight(hero, enemy)
+        if result.winner is None:
+            continue
+        rounds = fight_by_attacks(hero, enemy)
+        assert result.rounds == rounds
+        assert result.hero_health == hero.health
+        assert result.enemy_health == enemy.health
+        assert result.winner == ("hero" if enemy.health <= 0 else "enemy")
+
+
+def test_verbose_fight_replays_rounds():
+    grid = [[None, make_monster(health=40)], [None, None]]
+    engine = GameEngine(Warrior("Tester"), grid, verbose=True)
+    events = engine.step("right")[1]
+    kinds = [event[0] for event in events]
+    assert kinds.count("hero_attack") == events[-2][1]
+    assert events[-2][0] == "fight"
+
+
+def test_stochastic_fight_same_seed_same_rolls():
+    outcomes = []
+    for _ in range(2):
+        grid = [[None, make_monster(health=60)], [None, None]]
+        engine = GameEngine(Warrior("Tester"), grid, verbose=True, seed=9, stochastic=True)
+        events = engine.step("right")[1]
+        fight = [event for event in events if event[0] == "fight"][0]
+        attacks = [event for event in events if event[0] in ("hero_attack", "hero_miss")]
+        assert len(attacks) == fight[1]
+        outcomes.append(events)
+    assert outcomes[0] == outcomes[1]
+    # The hero can hit the monster, which resolve_fight would call a stalemate
+    hero = Warrior("Tester")
+    hero.accuracy = 3
+    grid = [[None, make_monster(health=10, power=0)], [None, None]]
+    events = GameEngine(hero, grid, seed=1, stochastic=True).step("right")[1]
+    assert ("monster_slain", "Blob") in events
+
+
+def test_shop_buy_potion_and_upgrade():
+    grid = [[None, Shopkeeper(), None], [None, None, None]]
+    engine = make_engine(grid)
+    engine.hero.coins = 30
+    observation, events, done = engine.step("right")
+    assert observation["mode"] == SHOP
+
+    observation, events, done = engine.step("right")
+    assert events == [("invalid_action", "right")]
+
+    observation, events, done = engine.step("potion")
+    assert observation["potions"] == 2
+    assert observation["coins"] == 20
+
+    observation, events, done = engine.step("accuracy")
+    assert events == [("upgraded", "accuracy", 8, 0)]
+
+    observation, events, done = engine.step("stealth")
+    assert events == [("not_enough_coins",)]
+
+    observation, events, done = engine.step("leave")
+    assert observation["mode"] == MAZE
+
+
+def test_shop_stat_already_maxed():
+    grid = [[None, Shopkeeper(), None], [None, None, None]]
+    engine = make_engine(grid)
+    engine.hero.coins = 20
+    engine.step("right")
+    observation, events, done = engine.step("defence")
+    assert events == [("stat_maxed", "defence")]
+    assert observation["coins"] == 20
+
+
+def test_quit_and_step_after_done(capsys):
+    engine = make_engine([[None, None], [None, None]])
+    observation, events, done = engine.step("quit")
+    assert done
+    assert observation["outcome"] == "quit"
+    assert engine.step("right") == (engine.observation(), [], True)
+    assert capsys.readouterr().out == ""
+
+
+# --------------------------
+# TURN SCHEDULER TESTS
+# --------------------------
+
+def test_scheduler_runs_until_done():
+    engine = make_engine([[None, None], [None, None]])
+    actions = iter(["right", None, "down"])
+    seen = []
+    done = TurnScheduler(engine, lambda engine: next(actions), seen.extend).run()
+    assert done
+    assert seen[-1] == ("won", (1, 1))
+
+
+def test_scheduler_stack_depth_stays_flat():
+    """A long session must not grow the stack."""
+    engine = make_engine([[None] * 3 for _ in range(3)])
+    depths = set()
+
+    def bounce(engine):
+        depths.add(len(traceback.extract_stack()))
+        return "right" if engine.hero_position[1] == 0 else "left"
+
+    TurnScheduler(engine, bounce).run(max_ticks=2000)
+    assert engine.turns == 2000
+    assert len(depths) == 1
+
+
+def test_clone_is_independent():
+    monster = make_monster(health=10)
+    engine = GameEngine(Warrior("Hero"), [[None, monster], [TreasureChest(30), None]])
+    twin = engine.clone()
+    twin.step("right")
+    twin.step("left")
+    twin.step("down")
+    assert twin.hero.coins == 30
+    assert engine.hero_position == (0, 0)
+    assert engine.hero.coins == 0
+    assert engine.hero.health == engine.hero.max_health
+    assert engine.turns == 0
+    assert monster.health == 10
+    assert isinstance(engine.grid.cell(0, 1), Monster)
+    assert isinstance(engine.grid.cell(1, 0), TreasureChest)
+
+
+def test_stochastic_clone_keeps_parent_rolls():
+    def make_stochastic():
+        # Stalemates use 6000 numbers each, so fights soon run into a new block
+        grid = [[None] + [make_monster(health=10 ** 6, power=0) for _ in range(3)]]
+        return GameEngine(Warrior("Hero"), grid, goal=(-1, -1), verbose=True, seed=4, stochastic=True)
+
+    engine, untouched = make_stochastic(), make_stochastic()
+    twin = engine.clone()
+    first = untouched.step("right")[1]
+    # The clone rolls what the game would have rolled, without using up its dice
+    assert twin.step("right")[1] == first
+    for _ in range(2):
+        assert twin.step("right")[1][-1] == ("stalemate", "Blob")
+    assert twin.dice.refills > engine.dice.refills
+    assert engine.step("right")[1] == first
+    assert engine.step("right")[1] == untouched.step("right")[1]
+
+
+def test_undo_rolls_the_same_fight_again():
+    grid = [[None, make_monster(health=10 ** 6, power=0)] for _ in range(2)]
+    engine = GameEngine(Warrior("Hero"), grid, verbose=True, seed=5, stochastic=True, undo_levels=4)
+    fights = [engine.step("right")[1]]
+    engine.step("undo")
+    fights.append(engine.step("right")[1])
+    engine.step("undo")
+    engine.step("down")
+    engine.step("undo")
+    fights.append(engine.step("right")[1])
+    assert fights[0] == fights[1] == fights[2]
+
+
+def test_snapshot_restore_branches():
+    from maze import generate_maze
+    engine = GameEngine(Warrior("Hero"), generate_maze(12, 12, seed=5))
+    start = engine.snapshot()
+    rng = random.Random(2)
+    branches = []
+    for _ in range(3):
+        engine.restore(start)
+        for _ in range(30):
+            engine.step(rng.choice(("down", "right", "heal")))
+        branches.append((engine.snapshot(), engine.observation(), set(engine.grid.cleared),
+                         engine.cleared_key))
+    # Jump between the branches in any order
+    for token, observation, cleared, key in branches[::-1] + branches:
+        engine.restore(token)
+        assert engine.observation() == observation
+        assert engine.grid.cleared == cleared
+        assert engine.cleared_key == key
+    engine.restore(start)
+    assert not engine.grid.cleared
+    assert engine.turns == 0
+
+
+def test_restore_lost_fight_on_object_grid():
+    monster = make_monster(health=200, power=40)
+    engine = GameEngine(Mage("Hero"), [[None, monster], [None, None]])
+    token = engine.snapshot()
+    engine.step("right")
+    assert engine.outcome == "lost"
+    engine.restore(token)
+    assert not engine.done
+    assert engine.hero.health == engine.hero.max_health
+    assert monster.health == 200
+    assert engine.grid.cell(0, 1) is monster
+
+
+def test_undo_redo():
+    chest = TreasureChest(30)
+    engine = GameEngine(Warrior("Hero"), [[None, chest, None], [None, None, None]], undo_levels=2)
+    engine.step("right")
+    engine.step("right")
+    assert engine.step("undo")[1] == [("undone", (0, 1))]
+    assert engine.step("undo")[1] == [("undone", (0, 0))]
+    assert engine.hero.coins == 0
+    assert engine.grid.cell(0, 1) is chest
+    assert engine.step("undo")[1] == [("nothing_to_undo",)]
+    assert engine.step("redo")[1] == [("redone", (0, 1))]
+    assert engine.hero.coins == 30
+    # A new action forgets what could be redone
+    engine.step("down")
+    assert engine.step("redo")[1] == [("nothing_to_redo",)]
+    assert engine.turns == 2
+
+
+def test_undo_levels_limit():
+    engine = GameEngine(Warrior("Hero"), [[None] * 5], undo_levels=2)
+    for _ in range(3):
+        engine.step("right")
+    engine.step("undo")
+    engine.step("undo")
+    assert engine.step("undo")[1] == [("nothing_to_undo",)]
+    assert engine.hero_position == (0, 1)
+    assert GameEngine(Warrior("Hero"), [[None] * 5]).step("undo")[1] == [("invalid_action", "undo")]
+
+
+def test_history_is_only_kept_for_undo():
+    engine = GameEngine(Warrior("Hero"), [[None] + [TreasureChest(5) for _ in range(9)]])
+    engine.step("right")
+    assert engine.change is None
+    token = engine.snapshot()
+    engine.step("right")
+    assert engine.change is not None
+    engine.restore(token)
+    assert engine.hero.coins == 5 and isinstance(engine.grid.cell(0, 2), TreasureChest)
+
+    engine = GameEngine(Warrior("Hero"), [[None] + [TreasureChest(5) for _ in range(9)]], goal=(-1, -1),
+                        undo_levels=2)
+    for _ in range(9):
+        engine.step("right")
+    # The history goes back no further than the oldest state undo can reach, after 7 chests
+    change, kept = engine.change, 0
+    while change is not None:
+        change, kept = change.parent, kept + 1
+    assert kept == 3
+    engine.step("undo")
+    engine.step("undo")
+    assert engine.hero.coins == 35 and engine.hero_position == (0, 7)
+
+
+def test_restore_refuses_snapshots_older_than_undo():
+    grid = [[None] + [TreasureChest(5) for _ in range(9)]]
+    engine = GameEngine(Warrior("Hero"), grid, goal=(-1, -1), undo_levels=2)
+    tokens = []
+    for _ in range(2):
+        engine.step("right")
+        tokens.append(engine.snapshot())
+    for _ in range(5):
+        engine.step("right")
+    row = list(engine.grid.cells[0])
+    for token in tokens:
+        with pytest.raises(ValueError):
+            engine.restore(token)
+    # The refused restores changed nothing
+    assert engine.grid.cells[0] == row
+    assert engine.hero_position == (0, 7) and engine.hero.coins == 35
+    engine.step("undo")
+    engine.step("undo")
+    assert engine.hero_position == (0, 5) and engine.hero.coins == 25
+
+
+def test_restore_keeps_spatial_index():
+    from maze import generate_maze, CHEST
+    engine = GameEngine(Warrior("Hero"), generate_maze(10, 10, seed=1))
+    index = engine.spatial_index()
+    token = engine.snapshot()
+    for action in ["right"] * 9 + ["down"] * 8:
+        engine.step(action)
+    engine.restore(token)
+    assert index.count(CHEST) == engine.grid.count(CHEST)
@@ -232,6 +232,42 @@ def test_hit_chance_archer():
     assert round(archer.hit_chance(enemy_1), 3) == 0.585
     assert round(archer.hit_chance(enemy_2), 3) == 0.675
     assert round(archer.hit_chance(enemy_3), 3) == 0.522
+
+
+def test_damage_table_matches_hit_chance():
+    """Every entry of the damage table uses the hit chance thresholds."""
+    attacker, defender = Mage("Table"), Monster("Blob")
+    for accuracy in range(11):
+        for defence in range(11):
+            for stealth in range(11):
+                attacker.accuracy, defender.defence, defender.stealth = accuracy, defence, stealth
+                expected = tier_multiplier(attacker.hit_chance(defender))
+                assert damage_multiplier(attacker, defender) == expected
+                assert attacker.damage_against(defender) == attacker.power * expected
+
+
+def test_attack_after_upgrade():
+    """Buying a stat upgrade changes the damage of the next attack."""
+    warrior = Warrior("Buyer")
+    warrior.coins = 100
+    monster = Monster.from_stats("Blob", 80, 10, 6, 6)
+    assert warrior.attack(monster) == warrior.power * 0.5
+    Shopkeeper().upgrade_stat(warrior, "accuracy")
+    assert warrior.attack(monster) == warrior.power
+    assert monster.health == 80 - warrior.power * 1.5
+    warrior.stealth = 10
+    assert monster.attack(warrior) == "The enemy's accuracy is too low to harm you."
+
+
+
+def test_shopkeeper_reports_failures(capsys):
+    """A failed purchase returns why, without printing anything."""
+    shopkeeper, warrior = Shopkeeper(), Warrior("Broke")
+    assert shopkeeper.sell_potion(warrior) == "Not enough coins!"
+    assert shopkeeper.upgrade_stat(warrior, "accuracy") == "Not enough coins!"
+    assert shopkeeper.upgrade_stat(warrior, "power") == "Invalid stat!"
+    assert warrior.potions == 1 and warrior.accuracy == 7
+    assert capsys.readouterr().out == ""
     
 def test_str(capsys):
     warrior_1 = Warrior("Bob")
@@ -0,0 +1,131 @@
+"""
+test_maze.py
+
+This test suite verifies the maze generator and compact grid in maze.py.
+
+The focus is on testing:
+- Reproducible generation and configurable densities
+- Building game objects from the side tables
+- Playing a generated maze with GameEngine
+"""
+
+from game_model import *
+from game_engine import GameEngine
+from maze import *
+from population import MONSTER_NAMES
+import numpy as np
+import pytest
+import sys
+
+
+def test_same_seed_same_maze():
+    first = generate_maze(50, 40, seed=3)
+    second = generate_maze(50, 40, seed=3)
+    assert (first.rows, first.cols) == (50, 40)
+    assert np.array_equal(first.kinds, second.kinds)
+    assert np.array_equal(first.monsters.power, second.monsters.power)
+    assert np.array_equal(first.monsters.health, second.monsters.health)
+    assert np.array_equal(first.chest_coins, second.chest_coins)
+
+
+def test_start_and_goal_are_empty():
+    maze = generate_maze(30, 30, seed=1, monster_density=1.0, chest_density=0,
+                         potion_density=0, shopkeeper_density=0)
+    assert maze.cell(0, 0) is None
+    assert maze.cell(29, 29) is None
+    assert maze.count(MONSTER) == 30 * 30 - 2
+
+
+def test_densities():
+    maze = generate_maze(200, 200, seed=2, monster_density=0.2, chest_density=0.1,
+                         potion_density=0.05, shopkeeper_density=0.01)
+    cells = 200 * 200
+    assert maze.count(MONSTER) / cells == pytest.approx(0.2, abs=0.01)
+    assert maze.count(CHEST) / cells == pytest.approx(0.1, abs=0.01)
+    assert maze.count(POTION) / cells == pytest.approx(0.05, abs=0.01)
+    assert maze.count(SHOPKEEPER) / cells == pytest.approx(0.01, abs=0.005)
+    assert len(maze.monster_cells) == maze.count(MONSTER)
+
+
+def test_invalid_densities():
+    with pytest.raises(ValueError):
+        generate_maze(10, 10, monster_density=0.9, chest_density=0.2)
+
+
+def test_cells_become_game_objects():
+    maze = generate_maze(40, 40, seed=5)
+    for row in range(40):
+        for col in range(40):
+            cell = maze.cell(row, col)
+            kind = maze.kind(row, col)
+            if kind == MONSTER:
+                assert isinstance(cell, Monster)
+                assert 40 <= cell.health <= 80
+                assert 5 <= cell.power <= 15
+                assert cell.name in MONSTER_NAMES
+            elif kind == CHEST:
+                assert 20 <= cell.num_of_coins <= 50
+            elif kind == POTION:
+                assert isinstance(cell, HealingPotion)
+            elif kind == SHOPKEEPER:
+                assert isinstance(cell, Shopkeeper)
+            else:
+                assert cell is None
+
+
+def test_engine_plays_generated_maze():
+    maze = generate_maze(5, 5, seed=0, monster_density=0, chest_density=1.0,
+                         potion_density=0, shopkeeper_density=0)
+    engine = GameEngine(Warrior("Walker"), maze)
+    observation, events, done = engine.step("right")
+    assert events[1][0] == "chest"
+    assert engine.grid.kind(0, 1) == EMPTY
+    assert maze.kind(0, 1) == CHEST
+    assert engine.goal == (4, 4)
+
+
+# --------------------------
+# SHARED TEMPLATE TESTS
+# --------------------------
+
+def test_template_is_read_only():
+    maze = generate_maze(10, 10, seed=1)
+    with pytest.raises(ValueError):
+        maze.kinds[1, 1] = EMPTY
+
+
+def test_sessions_do_not_share_cleared_cells():
+    maze = maze_from_layout(["..", "PC"])
+    first, second = GameEngine(Warrior("A"), maze), GameEngine(Warrior("B"), maze)
+    first.step("down")
+    assert first.grid.cell(1, 0) is None
+    assert isinstance(second.grid.cell(1, 0), HealingPotion)
+    assert first.grid.count(POTION) == 0
+    assert second.grid.count(POTION) == 1
+    assert first.grid.count(EMPTY) == 3
+
+
+def test_default_games_start_with_full_maze(capsys):
+    from game_interface import Game
+    first = Game(Warrior("A"))
+    first.hero_position = (0, 0)
+    first.step("right")
+    assert first.grid.cell(0, 1) is None
+    second = Game(Warrior("B"))
+    assert isinstance(second.grid.cell(0, 1), TreasureChest)
+    assert first.grid.template is second.grid.template
+
+
+def test_default_maze_cache_is_bounded():
+    assert default_maze(1) is default_maze(1)
+    for seed in range(1000, 1000 + 2 * DEFAULT_MAZE_CACHE):
+        default_maze(seed)
+    assert default_maze.cache_info().currsize == DEFAULT_MAZE_CACHE
+
+
+def test_session_overlay_is_small():
+    maze = generate_maze(300, 300, seed=9)
+    view = maze.session()
+    view.clear(0, 1)
+    view.clear(5, 5)
+    assert sys.getsizeof(view) + sys.getsizeof(view.cleared) < 1024
@@ -0,0 +1,102 @@
+"""
+test_mcts.py
+
+This test suite verifies the Monte Carlo tree search bot in mcts.py.
+
+The focus is on testing:
+- Only sensible actions are searched
+- Searching never changes the real game, nor the dice it will roll
+- A search ends even when its table is too small to keep the root
+- The bot wins small mazes, searching in this process or in workers, and plays
+  the same games every time with a fixed number of games per decision
+"""
+
+import random
+
+from game_model import *
+from game_engine import GameEngine, TurnScheduler
+from maze import generate_maze, maze_from_layout
+from mcts import *
+
+
+def test_legal_actions():
+    engine = GameEngine(Mage("Bot"), maze_from_layout(("..S", "...", "...")))
+    assert legal_actions(engine) == ["down", "right"]
+    engine.step("right")
+    engine.step("right")
+    assert legal_actions(engine) == ["leave"]
+    engine.hero.coins = 20
+    assert legal_actions(engine) == ["leave", "potion", "accuracy", "defence", "stealth"]
+
+
+def test_search_leaves_game_unchanged():
+    engine = GameEngine(Mage("Bot"), generate_maze(8, 8, seed=1))
+    before = engine.observation()
+    search = TreeSearch(random.Random(0))
+    edges = search.search(engine, games=200)
+    assert set(edges) == set(legal_actions(engine))
+    assert sum(visits for visits, _ in edges.values()) > 0
+    assert engine.observation() == before
+    assert not engine.grid.cleared
+    assert search.table.stats()["hits"] > 0
+
+
+def test_search_ends_when_table_is_full():
+    engine = GameEngine(Mage("Bot"), generate_maze(8, 8, seed=1))
+    search = TreeSearch(random.Random(0), table_size=2)
+    search.search(engine, budget=0.001)
+    edges = search.search(engine, games=50)
+    # The root stayed in the table, so it has the statistics of both searches
+    assert sum(visits for visits, _ in edges.values()) == search.iterations > 50
+
+
+def test_search_leaves_stochastic_rolls_unchanged():
+    def make_engine():
+        return GameEngine(Warrior("Bot"), generate_maze(8, 8, seed=4), seed=4, stochastic=True)
+
+    engine, actions = make_engine(), []
+    bot = MCTSPolicy(random.Random(0), games=20)
+
+    def recording(engine):
+        actions.append(bot(engine))
+        return actions[-1]
+
+    TurnScheduler(engine, recording).run(max_ticks=40)
+    assert bot.iterations > 0
+    # The game rolls the same dice as one played without searching
+    replayed = make_engine()
+    for action in actions:
+        replayed.step(action)
+    assert replayed.observation() == engine.observation()
+    assert replayed.dice.positions.tolist() == engine.dice.positions.tolist()
+
+
+def test_mcts_wins():
+    maze = generate_maze(8, 8, seed=2)
+    engine = GameEngine(Archer("Bot"), maze)
+    bot = MCTSPolicy(random.Random(0), games=100)
+    TurnScheduler(engine, bot).run(max_ticks=100)
+    assert engine.outcome == "won"
+    assert bot.iterations > 0 and bot.steps > bot.iterations
+
+
+def test_mcts_in_workers():
+    def play():
+        engine = GameEngine(Warrior("Bot"), generate_maze(6, 6, seed=3))
+        bot = MCTSPolicy(random.Random(0), games=50, workers=2)
+        actions = []
+
+        def recording(engine):
+            actions.append(bot(engine))
+            return actions[-1]
+
+        try:
+            TurnScheduler(engine, recording).run(max_ticks=50)
+        finally:
+            bot.close()
+        assert bot.iterations == 2 * 50 * len(actions)
+        return engine, actions
+
+    engine, actions = play()
+    assert engine.outcome == "won"
+    assert play()[1] == actions
@@ -0,0 +1,136 @@
+"""
+test_metrics.py
+
+This test suite verifies the opt-in instrumentation in metrics.py.
+
+The focus is on testing:
+- Latencies, fights, encounters and shop actions being counted while installed
+- The original methods being back in place after uninstall
+- Games played with GameEngine.run, as replays are, being measured too
+- JSON and Prometheus snapshots
+"""
+
+import io
+import json
+
+import pytest
+
+from game_model import *
+from game_engine import GameEngine, TurnScheduler
+from game_interface import Game
+import game_engine
+from metrics import *
+from replay import ReplayWriter, parse
+
+
+def make_monster(health=40):
+    return Monster.from_stats("Blob", health, 10, 5, 5)
+
+
+SCRIPT = ("right", "right", "down", "potion", "accuracy", "leave", "down")
+
+
+def make_grid():
+    return [[None, TreasureChest(30), make_monster()],
+            [None, None, Shopkeeper()],
+            [None, None, None]]
+
+
+def play_scripted_game():
+    engine = GameEngine(Warrior("Tester"), make_grid(), verbose=True)
+    for action in SCRIPT:
+        engine.step(action)
+    return engine
+
+
+def test_counts_while_installed():
+    with Metrics() as metrics:
+        assert metrics.installed
+        engine = play_scripted_game()
+    assert engine.outcome == "won"
+    snapshot = metrics.snapshot()
+    assert snapshot["phases"]["step"]["count"] == 7
+    assert snapshot["phases"]["fight"]["count"] == 1
+    assert snapshot["phases"]["trade"]["count"] == 3
+    assert snapshot["encounters"] == {"empty": 0, "monster": 1, "chest": 1, "potion": 0,
+                                      "shopkeeper": 1, "unknown": 0}
+    assert snapshot["fights"]["won"] == 1
+    assert sum(snapshot["fight_rounds"].values()) == 1
+    assert snapshot["shop"]["potion"] == snapshot["shop"]["upgrade"] == snapshot["shop"]["leave"] == 1
+    assert metrics.dominant_phases()[0][0] == "step"
+
+
+def test_uninstall_restores_methods():
+    originals = (GameEngine.step, GameEngine.fight, GameEngine.trade, Game.game_turn, game_engine.resolve_fight)
+    metrics = Metrics()
+    metrics.install()
+    try:
+        assert GameEngine.fight is not originals[1]
+        with pytest.raises(RuntimeError):
+            Metrics().install()
+    finally:
+        metrics.uninstall()
+    assert (GameEngine.step, GameEngine.fight, GameEngine.trade, Game.game_turn,
+            game_engine.resolve_fight) == originals
+    play_scripted_game()
+    assert metrics.snapshot()["phases"]["step"]["count"] == 0
+
+
+def test_every_phase_is_counted(capsys):
+    with Metrics() as metrics:
+        game = Game(Warrior("Tester"), make_grid())
+        actions = iter(SCRIPT)
+        TurnScheduler(game, lambda engine: next(actions), game.game_turn).run()
+        # Stochastic fights are timed with the others
+        GameEngine(Warrior("Tester"), [[None, make_monster()]], goal=(-1, -1), stochastic=True).step("right")
+    assert game.outcome == "won"
+    phases = metrics.snapshot()["phases"]
+    assert set(phases) == set(PHASES)
+    assert all(phase["count"] > 0 for phase in phases.values())
+    assert phases["move"]["count"] == 5
+    assert phases["fight"]["count"] == phases["resolve_fight"]["count"] == 2
+
+
+def test_run_is_counted():
+    with Metrics() as stepped:
+        play_scripted_game()
+    with Metrics() as metrics:
+        engine = GameEngine(Warrior("Tester"), make_grid(), verbose=True)
+        engine.run(SCRIPT)
+    assert engine.outcome == "won"
+    counts, expected = metrics.snapshot(), stepped.snapshot()
+    assert ({name: phase["count"] for name, phase in counts["phases"].items()} ==
+            {name: phase["count"] for name, phase in expected["phases"].items()})
+    assert counts["phases"]["step"]["count"] == 7
+    for key in ("fights", "encounters", "shop", "fight_rounds"):
+        assert counts[key] == expected[key]
+
+
+def test_replay_is_counted():
+    log = io.BytesIO()
+    writer = ReplayWriter(log)
+    writer.game(7, 8)
+    writer.hero(Warrior("Tester"))
+    for action in ("right", "down", "down", "heal", "right"):
+        writer.action(action)
+    writer.flush()
+    with Metrics() as metrics:
+        parse(log.getvalue()).play()
+    assert metrics.snapshot()["phases"]["step"]["count"] == 5
+
+
+def test_export(tmp_path):
+    with Metrics() as metrics:
+        play_scripted_game()
+    metrics.write(str(tmp_path / "metrics.json"))
+    snapshot = json.loads((tmp_path / "metrics.json").read_text())
+    assert snapshot["encounters"]["chest"] == 1
+
+    metrics.write(str(tmp_path / "metrics.prom"))
+    text = (tmp_path / "metrics.prom").read_text()
+    assert 'maze_phase_seconds_count{phase="step"} 7' in text
+    assert 'maze_phase_seconds_bucket{phase="step",le="+Inf"} 7' in text
+    assert 'maze_encounters_total{cell="monster"} 1' in text
+    assert "maze_fight_rounds_count 1" in text
+    with pytest.raises(ValueError):
+        metrics.write(str(tmp_path / "metrics.txt"), format="csv")
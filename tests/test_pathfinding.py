@@ -0,0 +1,106 @@
+"""
+test_pathfinding.py
+
+This test suite verifies the risk-weighted route finding in pathfinding.py.
+
+The focus is on testing:
+- Cell costs match the closed-form fights, in bulk and cell by cell
+- A* and the distance field agree on the cheapest route
+- Incremental updates give the same field as a full rebuild
+- The planner bot reaches the goal
+"""
+
+import math
+import random
+
+import numpy as np
+
+from game_model import *
+from game_engine import ObjectGrid
+from maze import generate_maze
+from pathfinding import *
+from tournament import play_game
+
+
+def test_cell_costs_match_cell_cost():
+    maze = generate_maze(12, 12, seed=3)
+    hero = Mage("Bot")
+    hero.health = 30
+    view = maze.session()
+    view.clear(0, 1)
+    costs = cell_costs(view, hero, risk=0.5)
+    for row in range(maze.rows):
+        for col in range(maze.cols):
+            assert math.isclose(costs[row, col], cell_cost(view, hero, row, col, risk=0.5))
+    assert np.isinf(costs).any()
+
+
+def test_object_grid_costs():
+    monster = Monster.from_stats("Orc", 50, 10, 5, 5)
+    grid = ObjectGrid([[None, monster], [TreasureChest(20), None]])
+    hero = Warrior("Bot")
+    costs = cell_costs(grid, hero)
+    assert costs[1, 0] == 1.0
+    assert costs[0, 1] > 1.0
+
+
+def test_route_avoids_deadly_monster():
+    dragon = Monster.from_stats("Dragon", 80, 15, 8, 8)
+    grid = ObjectGrid([[None, dragon, None],
+                       [None, None, None],
+                       [None, None, None]])
+    hero = Mage("Bot")
+    path, cost = find_path(grid, hero, goal=(0, 2))
+    assert (0, 1) not in path
+    assert cost == 4
+    field = DistanceField(grid, hero, goal=(0, 2))
+    assert field.distance_to_goal(0, 0) == 4
+    assert field.next_move(0, 0) == "down"
+
+
+def test_astar_matches_distance_field():
+    maze = generate_maze(25, 25, seed=7, monster_density=0.4)
+    hero = Archer("Bot")
+    field = DistanceField(maze.session(), hero)
+    costs = cell_costs(maze, hero)
+    for start in ((0, 0), (5, 17), (24, 0)):
+        path, cost = find_path(maze, hero, start=start, costs=costs)
+        assert math.isclose(cost, field.distance_to_goal(*start))
+        assert math.isclose(route_cost(costs, field.route(*start)), cost)
+
+
+def test_updates_match_rebuild():
+    maze = generate_maze(30, 30, seed=11, monster_density=0.35)
+    hero = Mage("Bot")
+    view = maze.session()
+    field = DistanceField(view, hero, risk=2.0)
+    rng = random.Random(0)
+    monsters = [divmod(int(index), maze.cols) for index in maze.monster_cells]
+
+    # Cheaper cells: slay some monsters
+    for row, col in rng.sample(monsters, 40):
+        view.clear(row, col)
+        field.update(row, col)
+    # Dearer cells: the hero is hurt, and the cells are re-costed one by one
+    hero.health = 25
+    for row, col in monsters:
+        field.update(row, col)
+
+    fresh = DistanceField(view, hero, risk=2.0)
+    assert field.cost == fresh.cost
+    for got, expected in zip(field.distance, fresh.distance):
+        assert got == expected or math.isclose(got, expected)
+
+
+def test_update_unchanged_cell():
+    maze = generate_maze(10, 10, seed=2)
+    field = DistanceField(maze.session(), Warrior("Bot"))
+    assert not field.update(3, 3)
+    assert not field.update(9, 9)
+
+
+def test_planner_wins():
+    maze = generate_maze(20, 20, seed=5)
+    for seed in range(5):
+        engine = play_game("Mage", maze, "planner", seed=seed, max_turns=500)
+        assert engine.outcome == "won"
@@ -0,0 +1,109 @@
+"""
+test_population.py
+
+This test suite verifies MonsterPool in population.py and the slotted
+Character classes in game_model.py.
+
+The focus is on testing:
+- Characters carry no per-instance __dict__
+- Converting between Monster objects and a MonsterPool
+- Using a pool with the batch combat simulator
+- Spawning monsters from archetypes
+"""
+
+from game_model import *
+from population import *
+from combat import simulate_fights, stat_block
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("character", [Warrior("A"), Mage("B"), Archer("C"), Monster("Orc")])
+def test_characters_have_no_dict(character):
+    assert not hasattr(character, "__dict__")
+    with pytest.raises(AttributeError):
+        character.pouch = {}
+
+
+def test_round_trip_through_pool():
+    random.seed(7)
+    monsters = [Monster(name) for name in MONSTER_NAMES]
+    monsters[1].health = 12.5
+    pool = MonsterPool.from_monsters(monsters)
+    assert len(pool) == 4
+    for index, monster in enumerate(monsters):
+        copy = pool.monster(index)
+        assert copy.name == monster.name
+        assert copy.health == monster.health
+        assert copy.max_health == monster.max_health
+        assert (copy.power, copy.defence, copy.stealth) == (monster.power, monster.defence, monster.stealth)
+
+
+def test_pool_is_compact():
+    pool = spawn_monsters(np.random.default_rng(0), 1_000_000)
+    assert pool.nbytes == 9 * 1_000_000
+    assert 40 <= pool.max_health.min() and pool.max_health.max() <= 80
+    assert 5 <= pool.defence.min() and pool.defence.max() <= 8
+
+
+def test_frozen_pool_is_read_only():
+    pool = spawn_kinds(np.random.default_rng(0), [0, 1]).freeze()
+    with pytest.raises(ValueError):
+        pool.health[0] = 1
+
+
+def test_pool_stat_block_matches_objects():
+    random.seed(3)
+    monsters = [Monster("Troll") for _ in range(50)]
+    pool = MonsterPool.from_monsters(monsters)
+    hero = stat_block([Archer("Robin")])
+    from_pool = simulate_fights(hero, pool.stat_block())
+    from_objects = simulate_fights(hero, stat_block(monsters))
+    assert np.array_equal(from_pool.outcome, from_objects.outcome)
+    assert np.array_equal(from_pool.rounds, from_objects.rounds)
+
+
+# --------------------------
+# SPAWNING TESTS
+# --------------------------
+
+def test_spawned_stats_follow_archetypes():
+    pool = spawn_monsters(np.random.default_rng(1), 100_000)
+    for index, archetype in enumerate(ARCHETYPES):
+        mine = pool.kind == index
+        assert mine.any()
+        for stat, values in (("health", pool.max_health), ("power", pool.power),
+                             ("defence", pool.defence), ("stealth", pool.stealth)):
+            low, high = getattr(archetype, stat)
+            assert values[mine].min() == low
+            assert values[mine].max() == high
+
+
+def test_spawn_weights():
+    pool = spawn_monsters(np.random.default_rng(2), 10_000, weights=[0, 0, 0, 1])
+    assert set(pool.kind.tolist()) == {3}
+    assert pool.monster(0).name == "Dragon"
+
+
+def test_spawn_is_reproducible():
+    first = spawn_monsters(np.random.default_rng(5), 1000)
+    second = spawn_monsters(np.random.default_rng(5), 1000)
+    assert np.array_equal(first.kind, second.kind)
+    assert np.array_equal(first.power, second.power)
+
+
+def test_custom_archetypes_are_shared():
+    archetypes = load_archetypes([
+        {"name": "Slime", "health": [10, 10], "power": [1, 2], "defence": [0, 1], "stealth": [0, 0]},
+    ])
+    pool = spawn_monsters(np.random.default_rng(0), 50, archetypes=archetypes)
+    assert pool.archetypes is archetypes
+    slime = pool.monster(7)
+    assert slime.name == "Slime"
+    assert slime.health == 10
+
+
+def test_invalid_archetype():
+    with pytest.raises(ValueError):
+        load_archetypes([{"name": "Bad", "health": [5, 1], "power": [1, 1],
+                          "defence": [0, 0], "stealth": [0, 0]}])
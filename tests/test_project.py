@@ -1,3 +1,7 @@
+import os
+import subprocess
+import sys
+
 import pytest
 from project import welcome_message, ask_start, create_hero
 from game_model import Warrior, Mage, Archer
@@ -57,4 +61,16 @@ def test_create_hero_invalid_then_valid(monkeypatch):
         # Check that the final print statement is present
         assert "(1,1) is your starting position." in captured.out
         assert "You can move up, left, right or down" in captured.out
-        assert "Remember, the goal is to navigate to the bottom-right square, (4,4). Good luck!" in captured.out
\ No newline at end of file
+        assert "Remember, the goal is to navigate to the bottom-right square, (4,4). Good luck!" in captured.out
+
+def test_import_is_side_effect_free():
+    # Import in a fresh interpreter: nothing slow is loaded and nothing random is drawn
+    code = ("import random, sys\n"
+            "state = random.getstate()\n"
+            "import project\n"
+            "assert random.getstate() == state\n"
+            "assert not {'numpy', 'maze', 'world'} & set(sys.modules), sys.modules.keys()\n"
+            "project.preload().join()\n"
+            "assert 'maze' in sys.modules\n")
+    subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   check=True)
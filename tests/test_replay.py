@@ -0,0 +1,176 @@
+"""
+test_replay.py
+
+This test suite verifies the binary replay logs in replay.py.
+
+The focus is on testing:
+- Varints and records surviving a round trip
+- A recorded game replaying to the same state, with and without dice
+- The fast path of GameEngine.run matching act
+- Errors on data that is not a complete log
+"""
+
+import io
+import random
+
+import pytest
+
+from game_model import *
+from game_engine import GameEngine, DIRECTIONS
+from game_interface import Game
+from maze import default_maze
+from replay import *
+from world import ChunkedMaze
+
+MOVES = ("right", "down", "down", "right", "left", "up", "heal", "right", "right", "down", "down")
+
+
+def record(actions, seed=7, stochastic=False, hero=None):
+    """Play actions on the default maze while recording them, returning (log bytes, engine)."""
+    hero = hero if hero is not None else Warrior("Rec")
+    file = io.BytesIO()
+    log = ReplayWriter(file)
+    log.game(seed, seed + 1, 0, stochastic)
+    log.hero(hero)
+    engine = GameEngine(hero, default_maze(seed), seed=seed + 1, stochastic=stochastic)
+    for action in actions:
+        log.action(action)
+        engine.step(action)
+    log.flush()
+    return file.getvalue(), engine
+
+
+def test_varint_round_trip():
+    buffer = bytearray()
+    values = (0, 1, 127, 128, 300, 2 ** 32, 2 ** 64 - 1)
+    for value in values:
+        write_varint(buffer, value)
+    assert len(buffer) == 1 + 1 + 1 + 2 + 2 + 5 + 10
+    position = 0
+    for value in values:
+        read, position = read_varint(buffer, position)
+        assert read == value
+    assert position == len(buffer)
+
+
+def test_records_round_trip():
+    data, _ = record(MOVES + ("dance", "potion"), hero=Mage("Zoë"))
+    replay = parse(data)
+    assert (replay.maze_seed, replay.game_seed, replay.undo_levels, replay.stochastic) == (7, 8, 0, False)
+    assert (replay.hero_class, replay.hero_name) == (Mage, "Zoë")
+    assert replay.actions == list(MOVES) + ["dance", "potion"]
+    # One byte per known action
+    assert data.index(b"\x03\x05dance") == len(data) - 1 - 7
+
+
+@pytest.mark.parametrize("stochastic", [False, True])
+def test_replay_reproduces_game(stochastic):
+    actions = MOVES * 5
+    data, engine = record(actions, seed=11, stochastic=stochastic)
+    replayed = parse(data).play()
+    assert replayed.hero_position == engine.hero_position
+    assert replayed.turns == engine.turns
+    assert replayed.outcome == engine.outcome
+    assert replayed.observation() == engine.observation()
+
+
+# Mostly moves, with every other action now and then, but never quit. The first 32 are moves.
+CHOICES = tuple(DIRECTIONS) * 8 + tuple(action for action in ACTIONS if action != "quit") + ("dance",)
+
+
+def history(engine):
+    """Return what a game's undo and redo histories hold, for comparing games.
+
+    The shopkeeper is left out: every endless world has its own.
+    """
+    return [[(token.hero, token.fields[:2], token.fields[3:]) for token in stack]
+            for stack in (engine.undo_stack, engine.redo_stack)]
+
+
+@pytest.mark.parametrize("stochastic,undo_levels", [(False, 0), (True, 0), (False, 3), (True, 20)])
+def test_run_matches_act(stochastic, undo_levels):
+    rng = random.Random(5)
+    mazes = [lambda seed: default_maze(seed)] * 2 + [
+        lambda seed: ChunkedMaze(seed, chunk_size=8, capacity=4, monster_density=0.02)]
+    for seed in range(30):
+        make_maze = mazes[seed % len(mazes)]
+        actions = [rng.choice(CHOICES) for _ in range(2000)]
+        games = [GameEngine(Archer("Run"), make_maze(seed), seed=seed, stochastic=stochastic,
+                            undo_levels=undo_levels) for _ in range(2)]
+        games[0].run(actions)
+        for action in actions:
+            games[1].act(action, [])
+        assert games[0].observation() == games[1].observation()
+        assert games[0].cleared_key == games[1].cleared_key
+        assert games[0].hero.get_state() == games[1].hero.get_state()
+        assert history(games[0]) == history(games[1])
+        # Taking everything back leads through the same states
+        while games[1].undo_stack and not games[1].done:
+            for game in games:
+                game.act("undo", [])
+            assert games[0].observation() == games[1].observation()
+        assert games[0].cleared_key == games[1].cleared_key
+
+
+def test_terminal_sessions_replay(capsys):
+    rng = random.Random(8)
+    for actions in ([rng.choice(CHOICES[:32]) for _ in range(300)], [rng.choice(CHOICES) for _ in range(300)]):
+        file = io.BytesIO()
+        log = ReplayWriter(file)
+        game = Game(Warrior("Rec"), seed=3, log=log)
+        for action in actions:
+            game.step(action)
+        log.flush()
+        replayed = parse(file.getvalue()).play()
+        assert replayed.undo_levels == game.undo_levels
+        assert replayed.observation() == game.observation()
+        assert replayed.cleared_key == game.cleared_key
+
+
+def test_game_records_itself(tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / "game.mmrl")
+    with ReplayWriter.open(path) as log:
+        game = Game(Archer("Rec"), seed=5, log=log)
+        for action in ("right", "undo", "down", "redo", "quit"):
+            game.step(action)
+    replay = load(path)
+    assert replay.undo_levels == game.undo_levels
+    assert replay.actions == ["right", "undo", "down", "redo", "quit"]
+    replayed = replay.play()
+    assert replayed.hero_position == game.hero_position
+    assert replayed.outcome == "quit"
+    assert game.clone().log is None
+    with pytest.raises(ValueError):
+        Game(Archer("Rec"), log=ReplayWriter(io.BytesIO()))
+
+
+def test_writer_buffers_and_appends(tmp_path):
+    path = str(tmp_path / "log.mmrl")
+    log = ReplayWriter.open(path, buffer_size=32)
+    log.game(1, 2)
+    log.hero(Warrior("W"))
+    log.action("right")
+    assert (tmp_path / "log.mmrl").stat().st_size == 0
+    for _ in range(24):
+        log.action("down")
+    assert (tmp_path / "log.mmrl").stat().st_size > 0
+    log.close()
+    with ReplayWriter.open(path) as log:
+        log.action("left")
+    data = (tmp_path / "log.mmrl").read_bytes()
+    assert data.count(MAGIC) == 1
+    assert parse(data).actions == ["right"] + ["down"] * 24 + ["left"]
+
+
+def test_parse_errors():
+    data, _ = record(("right",))
+    with pytest.raises(ValueError):
+        parse(b"nope" + data)
+    with pytest.raises(ValueError):
+        parse(data[:len(MAGIC) + 3])
+    with pytest.raises(ValueError):
+        parse(MAGIC + bytes([ACTION, 10]) + b"abc")
+    with pytest.raises(ValueError):
+        parse(data + bytes([200]))
+    with pytest.raises(ValueError):
+        parse(MAGIC + bytes([ACTION_BASE]))
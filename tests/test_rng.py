@@ -0,0 +1,66 @@
+"""
+test_rng.py
+
+This test suite verifies the random streams in rng.py.
+
+The focus is on testing:
+- Same seed, same numbers; different streams, different numbers
+- Reproducible monsters, chests and mazes from a seed
+- Workers reproducing the same results in separate processes
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from game_model import *
+from maze import generate_maze
+from rng import *
+import numpy as np
+
+
+def worker_rolls(seed, index):
+    """Roll some numbers in a worker's stream."""
+    rng = GameRNG(seed).worker(index)
+    return [rng.stream(COMBAT_STREAM).random() for _ in range(5)]
+
+
+def test_same_seed_same_streams():
+    first, second = GameRNG(42), GameRNG(42)
+    assert first.stream(MONSTER_STREAM).random() == second.stream(MONSTER_STREAM).random()
+    assert np.array_equal(first.generator(CHEST_STREAM).integers(0, 100, 10),
+                          second.generator(CHEST_STREAM).integers(0, 100, 10))
+
+
+def test_streams_are_independent():
+    rng = GameRNG(42)
+    assert rng.stream(MONSTER_STREAM) is rng.stream(MONSTER_STREAM)
+    assert rng.seed_for(MONSTER_STREAM) != rng.seed_for(CHEST_STREAM)
+    assert rng.child("monster", 1).seed != rng.child("monster", 2).seed
+
+    # Drawing from one stream does not move another
+    untouched = GameRNG(42).stream(CHEST_STREAM).random()
+    rng.stream(MONSTER_STREAM).random()
+    assert rng.stream(CHEST_STREAM).random() == untouched
+
+
+def test_monsters_and_chests_from_streams():
+    first, second = GameRNG(7), GameRNG(7)
+    monster_a = Monster("Orc", first.stream(MONSTER_STREAM))
+    monster_b = Monster("Orc", second.stream(MONSTER_STREAM))
+    assert (monster_a.health, monster_a.power, monster_a.defence, monster_a.stealth) == \
+        (monster_b.health, monster_b.power, monster_b.defence, monster_b.stealth)
+    assert TreasureChest(rng=first.stream(CHEST_STREAM)).num_of_coins == \
+        TreasureChest(rng=second.stream(CHEST_STREAM)).num_of_coins
+
+
+def test_maze_from_game_rng():
+    first = generate_maze(30, 30, seed=GameRNG(3))
+    second = generate_maze(30, 30, seed=3)
+    assert np.array_equal(first.kinds, second.kinds)
+    assert np.array_equal(first.monsters.health, second.monsters.health)
+
+
+def test_workers_reproduce_across_processes():
+    expected = [worker_rolls(99, index) for index in range(4)]
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(worker_rolls, [99] * 4, range(4)))
+    assert results == expected
+    assert expected[0] != expected[1]
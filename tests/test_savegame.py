@@ -0,0 +1,126 @@
+"""
+test_savegame.py
+
+This test suite verifies saving and loading games with savegame.py.
+
+The focus is on testing:
+- A loaded game being the same as the saved one, and playing on the same way
+- The maze being mapped from the file, not copied
+- Saving again only writing what changed, with the same result as a full save
+- Errors on grids that cannot be saved and on files that are not saves
+"""
+
+import numpy as np
+import pytest
+
+from game_model import *
+from game_engine import GameEngine, SHOP
+from game_interface import Game
+from maze import generate_maze
+from savegame import *
+
+# Every move is followed by "leave", in case it opened a shop
+ACTIONS = tuple(action for move in ("right", "down", "right", "down", "right", "right", "down", "down", "right",
+                                    "down") for action in (move, "leave"))
+
+
+def make_engine(**options):
+    maze = generate_maze(30, 40, seed=3, monster_density=0.05, chest_density=0.3, shopkeeper_density=0.05)
+    return GameEngine(Mage("Saver"), maze, seed=3, **options)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "game.mmsv")
+    engine = make_engine(undo_levels=4)
+    for action in ACTIONS:
+        engine.step(action)
+    assert engine.grid.cleared
+    engine.save(path)
+    loaded = GameEngine.load(path)
+    assert loaded.observation() == engine.observation()
+    assert loaded.hero.get_state() == engine.hero.get_state()
+    assert type(loaded.hero) is Mage and loaded.hero.name == "Saver"
+    assert loaded.grid.cleared == engine.grid.cleared
+    assert (loaded.turns, loaded.cleared_key, loaded.undo_levels) == (engine.turns, engine.cleared_key, 4)
+    for action in ("down", "down", "right", "right", "up", "left", "down"):
+        assert loaded.step(action)[1:] == engine.step(action)[1:]
+
+
+def test_maze_is_mapped(tmp_path):
+    path = str(tmp_path / "game.mmsv")
+    engine = make_engine()
+    engine.save(path)
+    template = GameEngine.load(path).grid.template
+    assert not template.kinds.flags.writeable and not template.kinds.flags.owndata
+    assert not template.monsters.health.flags.owndata
+    original = engine.grid.template
+    assert np.array_equal(template.kinds, original.kinds)
+    assert np.array_equal(template.chest_coins, original.chest_coins)
+    assert np.array_equal(template.monsters.power, original.monsters.power)
+    assert template.cell(5, 7).__class__ is original.cell(5, 7).__class__
+
+
+def test_shop_mode_survives(tmp_path):
+    path = str(tmp_path / "game.mmsv")
+    maze = generate_maze(3, 3, seed=0, monster_density=0, chest_density=0, potion_density=0,
+                         shopkeeper_density=1)
+    engine = GameEngine(Warrior("Buyer"), maze)
+    engine.step("right")
+    assert engine.mode == SHOP
+    engine.save(path)
+    loaded = GameEngine.load(path)
+    assert loaded.mode == SHOP and isinstance(loaded.shopkeeper, Shopkeeper)
+    assert loaded.step("leave")[1] == [("shop_closed",)]
+
+
+def test_incremental_save_matches_full_save(tmp_path):
+    incremental, full = str(tmp_path / "incremental.mmsv"), str(tmp_path / "full.mmsv")
+    engine = make_engine(undo_levels=4)
+    engine.save(incremental)
+    for action in ACTIONS:
+        engine.step(action)
+        engine.save(incremental)
+    engine.step("undo")
+    engine.save(incremental)
+    assert engine.saved[0] == incremental
+    engine.clone().save(full)
+    with open(incremental, "rb") as first, open(full, "rb") as second:
+        assert first.read() == second.read()
+    assert GameEngine.load(incremental).grid.cleared == engine.grid.cleared
+
+
+def test_incremental_save_after_load(tmp_path, monkeypatch):
+    path = str(tmp_path / "game.mmsv")
+    engine = make_engine()
+    engine.save(path)
+    loaded = GameEngine.load(path)
+    for action in ACTIONS:
+        loaded.step(action)
+    monkeypatch.setattr("savegame._save_all", None)
+    loaded.save(path)
+    again = GameEngine.load(path)
+    assert again.grid.cleared == loaded.grid.cleared
+    assert again.observation() == loaded.observation()
+
+
+def test_game_load(tmp_path, capsys):
+    path = str(tmp_path / "game.mmsv")
+    game = Game(Archer("Rec"), seed=5)
+    game.step("down")
+    game.save(path)
+    loaded = Game.load(path)
+    assert isinstance(loaded, Game) and loaded.log is None and loaded.verbose
+    assert loaded.hero_position == (1, 0)
+
+
+def test_errors(tmp_path):
+    path = tmp_path / "game.mmsv"
+    with pytest.raises(ValueError):
+        GameEngine(Warrior("W"), [[None, None]]).save(str(path))
+    path.write_bytes(b"not a save" * 50)
+    with pytest.raises(ValueError):
+        GameEngine.load(str(path))
+    make_engine().save(str(path))
+    path.write_bytes(path.read_bytes()[:HEADER.size + 100])
+    with pytest.raises(ValueError):
+        GameEngine.load(str(path))
@@ -0,0 +1,130 @@
+"""
+test_server.py
+
+This test suite verifies the multi-session asyncio server in server.py and the
+load generator in loadgen.py.
+
+The focus is on testing:
+- A session creates its hero, plays actions and ends with a DONE line
+- Sessions are independent of each other
+- Bytes that are not UTF-8 and over-long lines do not break the server, and
+  the session's replay log is still saved
+- The load generator completes a short run without errors
+"""
+
+import asyncio
+import json
+import os
+
+from replay import load
+from server import GameServer
+from loadgen import read_reply, run
+
+
+async def start():
+    listener = await GameServer().serve(port=0)
+    return listener, listener.sockets[0].getsockname()[1]
+
+
+async def session(port, *lines):
+    """Send the given lines and return the final (kind, observation) reply."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    reply = await read_reply(reader)
+    for line in lines:
+        writer.write(line.encode() + b"\n")
+        reply = await read_reply(reader)
+    writer.close()
+    return reply
+
+
+def test_session_plays_and_quits():
+    async def scenario():
+        listener, port = await start()
+        kind, observation = await session(port, "Ann", "Wizard", "Mage", "right")
+        assert kind == "OK"
+        assert observation["position"] == [0, 1]
+        assert observation["max_health"] == 75
+        kind, observation = await session(port, "Bob", "Warrior", "quit")
+        assert kind == "DONE"
+        assert observation["outcome"] == "quit"
+        listener.close()
+        await listener.wait_closed()
+
+    asyncio.run(scenario())
+
+
+def test_sessions_are_independent():
+    async def scenario():
+        listener, port = await start()
+        first = session(port, "Ann", "Archer", "down", "down")
+        second = session(port, "Bob", "Archer", "right")
+        (_, one), (_, two) = await asyncio.gather(first, second)
+        assert one["position"] == [2, 0]
+        assert two["position"] == [0, 1]
+        listener.close()
+        await listener.wait_closed()
+
+    asyncio.run(scenario())
+
+
+def test_status_line_is_json():
+    async def scenario():
+        listener, port = await start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for line in (b"Ann\n", b"Warrior\n"):
+            writer.write(line)
+        lines = []
+        while not lines or not lines[-1].startswith(b"OK {\""):
+            lines.append(await reader.readline())
+        assert json.loads(lines[-1][3:])["mode"] == "maze"
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+
+    asyncio.run(scenario())
+
+
+def test_bad_bytes_are_replaced():
+    async def scenario():
+        listener, port = await start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await read_reply(reader)
+        for line in (b"\xff\n", b"Warrior\n", b"\xff\n"):
+            writer.write(line)
+            kind, observation = await read_reply(reader)
+        assert kind == "OK"
+        assert observation["position"] == [0, 0]
+        writer.close()
+        kind, observation = await session(port, "Ann", "Warrior", "right")
+        assert observation["position"] == [0, 1]
+        listener.close()
+        await listener.wait_closed()
+
+    asyncio.run(scenario())
+
+
+def test_long_line_ends_session_and_keeps_replay(tmp_path):
+    async def scenario():
+        listener = await GameServer(replay_dir=str(tmp_path)).serve(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await read_reply(reader)
+        for line in (b"Ann\n", b"Warrior\n", b"right\n"):
+            writer.write(line)
+            await read_reply(reader)
+        writer.write(b"x" * 100_000 + b"\n")
+        assert await reader.read() == b""
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+
+    asyncio.run(scenario())
+    [name] = os.listdir(tmp_path)
+    assert load(os.path.join(tmp_path, name)).actions == ["right"]
+
+
+def test_load_generator_short_run():
+    result = asyncio.run(run(sessions=20, seconds=0.5, think=0.05, ramp=0.1))
+    assert result["errors"] == 0
+    assert result["turns"] > 0
+    assert result["p99_ms"] >= result["p50_ms"]
@@ -0,0 +1,72 @@
+"""
+test_spatial.py
+
+This test suite verifies the spatial index of maze cells in spatial.py.
+
+The focus is on testing:
+- Nearest and within-radius queries agree with a scan of the grid
+- Counts and queries stay correct as the engine empties cells
+"""
+
+import random
+
+from game_model import *
+from game_engine import GameEngine
+from maze import generate_maze, MONSTER, CHEST, POTION, SHOPKEEPER
+from spatial import *
+
+
+def scan(grid, kind):
+    """Every cell of a kind, found the slow way."""
+    return [(row, col) for row in range(grid.rows) for col in range(grid.cols)
+            if kind_of(grid.cell(row, col)) == kind]
+
+
+def test_queries_match_scan():
+    maze = generate_maze(70, 45, seed=8)
+    view = maze.session()
+    index = SpatialIndex(view, bucket_size=8)
+    rng = random.Random(1)
+    for kind in INDEXED_KINDS:
+        cells = scan(view, kind)
+        assert index.count(kind) == len(cells)
+        for _ in range(20):
+            row, col = rng.randrange(maze.rows), rng.randrange(maze.cols)
+            distance, cell = min((abs(r - row) + abs(c - col), (r, c)) for r, c in cells)
+            assert index.nearest(kind, row, col) == (*cell, distance)
+            radius = rng.randrange(12)
+            assert index.within(kind, row, col, radius) == [
+                (r, c) for r, c in cells if abs(r - row) + abs(c - col) <= radius]
+
+
+def test_object_grid_index():
+    grid = [[None, TreasureChest(20), None],
+            [Shopkeeper(), None, Monster.from_stats("Orc", 50, 10, 5, 5)],
+            [None, TreasureChest(30), None]]
+    index = SpatialIndex(GameEngine(Warrior("Bot"), grid).grid)
+    assert index.count(CHEST) == 2
+    assert index.count(POTION) == 0
+    assert index.nearest(POTION, 0, 0) is None
+    assert index.nearest(SHOPKEEPER, 2, 2) == (1, 0, 3)
+    assert index.within(MONSTER, 0, 0, 2) == []
+    assert index.within(MONSTER, 0, 0, 3) == [(1, 2)]
+
+
+def test_index_follows_engine():
+    maze = generate_maze(20, 20, seed=3)
+    engine = GameEngine(Warrior("Bot"), maze)
+    index = engine.spatial_index()
+    chests = index.count(CHEST)
+    row, col, _ = index.nearest(CHEST, 0, 0)
+    engine.clear_cell(row, col)
+    assert index.count(CHEST) == chests - 1
+    assert index.nearest(CHEST, row, col)[:2] != (row, col)
+    assert index.count(CHEST) == engine.grid.count(CHEST)
+
+
+def test_index_built_after_clearing():
+    maze = generate_maze(20, 20, seed=3)
+    engine = GameEngine(Warrior("Bot"), maze)
+    cells = scan(engine.grid, POTION)
+    engine.clear_cell(*cells[0])
+    assert engine.spatial_index().count(POTION) == len(cells) - 1
@@ -0,0 +1,64 @@
+"""
+test_tournament.py
+
+This test suite verifies the bots in policies.py and the parallel tournament
+runner in tournament.py.
+
+The focus is on testing:
+- Bots only choose valid actions and finish games
+- Importing the bots does not load NumPy
+- Tournament totals add up and are reproducible from a seed
+"""
+
+import os
+import subprocess
+import sys
+
+from game_model import *
+from game_engine import GameEngine, TurnScheduler, MAZE_ACTIONS, SHOP_ACTIONS, SHOP
+from maze import generate_maze
+from policies import *
+from tournament import *
+import random
+
+
+def test_import_policies_without_numpy():
+    code = "import sys, policies\nassert 'numpy' not in sys.modules, sorted(sys.modules)\n"
+    subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   check=True)
+
+
+def test_bots_choose_valid_actions():
+    maze = generate_maze(8, 8, seed=4)
+    for policy in POLICIES.values():
+        engine = GameEngine(Mage("Bot"), maze)
+        bot = policy(random.Random(1))
+
+        def checked(engine):
+            action = bot(engine)
+            assert action in (SHOP_ACTIONS if engine.mode == SHOP else MAZE_ACTIONS)
+            return action
+
+        TurnScheduler(engine, checked).run(max_ticks=500)
+
+
+def test_greedy_bot_wins_empty_maze():
+    maze = generate_maze(6, 6, seed=0, monster_density=0, chest_density=0,
+                         potion_density=0, shopkeeper_density=0)
+    engine = play_game("Warrior", maze, "greedy", seed=1, max_turns=100)
+    assert engine.outcome == "won"
+    assert engine.turns == 10
+
+
+def test_tournament_totals_are_reproducible():
+    options = dict(size=6, maze_seeds=(1, 2), seed=3, workers=2, chunk_size=7)
+    first = run_tournament(30, **options)
+    second = run_tournament(30, **options)
+    assert first == second
+    assert sum(row[0] for row in first.values()) == 30
+    for played, won, lost, timeout, turns, coins in first.values():
+        assert won + lost + timeout == played
+
+    summary = summarise(first)
+    assert set(summary) == set(HERO_CLASSES_BY_NAME)
+    assert sum(stats["games"] for stats in summary.values()) == 30
@@ -0,0 +1,68 @@
+"""
+test_transposition.py
+
+This test suite verifies the state keys and transposition table in
+transposition.py.
+
+The focus is on testing:
+- Different move orders that reach the same state give the same key
+- Different states give different keys
+- The table evicts the least recently used state and counts hits and evictions
+"""
+
+import pytest
+
+from game_model import *
+from game_engine import GameEngine
+from maze import maze_from_layout
+from transposition import *
+
+LAYOUT = (".C.",
+          "C..",
+          "...")
+
+
+def play(*actions):
+    engine = GameEngine(Warrior("Bot"), maze_from_layout(LAYOUT, seed=1))
+    for action in actions:
+        engine.step(action)
+    return engine
+
+
+def test_same_state_same_key():
+    # Both chests looted, in either order, ending in the same cell
+    first = play("right", "left", "down")
+    second = play("down", "up", "right", "left", "down")
+    assert first.hero.coins == second.hero.coins
+    assert state_key(first) == state_key(second)
+    assert first.cleared_key != 0
+
+
+def test_different_states_different_keys():
+    keys = {state_key(play()), state_key(play("right")), state_key(play("down")),
+            state_key(play("right", "left")), state_key(play("down", "up"))}
+    assert len(keys) == 5
+
+
+def test_cell_keys_are_distinct():
+    keys = {cell_key(index) for index in range(100000)}
+    assert len(keys) == 100000
+    assert all(0 <= key < 1 << 64 for key in keys)
+
+
+def test_table_lru_and_metrics():
+    table = TranspositionTable(capacity=2)
+    table.put("a", 1)
+    table.put("b", 2)
+    assert table.get("a") == 1          # "b" is now least recently used
+    table.put("c", 3)
+    assert "b" not in table
+    assert table.get("b") is None
+    assert table.get("c") == 3
+    assert table.stats() == {"size": 2, "capacity": 2, "hits": 2, "misses": 1,
+                             "hit_rate": 2 / 3, "evictions": 1}
+
+
+def test_table_needs_capacity():
+    with pytest.raises(ValueError):
+        TranspositionTable(capacity=0)
@@ -0,0 +1,140 @@
+"""
+test_world.py
+
+This test suite verifies the endless chunked maze in world.py.
+
+The focus is on testing:
+- Chunks coming out the same every time they are generated
+- Memory holding at most `capacity` chunks, whatever the distance walked
+- The whole game, history included, staying the same size on a long walk
+- Cleared cells surviving eviction through the spill files
+- Games, copies and replays on the endless world
+"""
+
+import io
+import tracemalloc
+
+import pytest
+
+from game_model import *
+from game_engine import GameEngine
+from game_interface import Game
+from maze import EMPTY, CHEST
+from replay import ReplayWriter, parse
+from world import *
+
+# Chests everywhere, so that every step changes the chunk it lands in
+CHESTS = {"monster_density": 0, "chest_density": 1, "potion_density": 0, "shopkeeper_density": 0}
+
+
+def test_chunks_are_deterministic():
+    first, second, other = ChunkedMaze(5, chunk_size=8), ChunkedMaze(5, chunk_size=8), ChunkedMaze(6, chunk_size=8)
+    cells = [(row, col) for row in range(0, 40, 3) for col in range(0, 40, 7)]
+    kinds = [first.kind(row, col) for row, col in cells]
+    assert kinds == [second.kind(row, col) for row, col in cells]
+    assert kinds != [other.kind(row, col) for row, col in cells]
+    # Evicted and generated again
+    world = ChunkedMaze(5, chunk_size=8, capacity=4)
+    assert [world.kind(row, col) for row, col in cells] == kinds
+    assert world.generated > len(world.chunks) == 4
+    assert world.kind(0, 0) == EMPTY
+
+
+def test_untouched_chunks_are_dropped():
+    world = ChunkedMaze(1, chunk_size=4, capacity=4)
+    for col in range(0, 400, 4):
+        world.kind(0, col)
+    assert len(world.chunks) == 4
+    assert world.generated == 100
+    assert world.spilled == 0 and world.directory is None
+
+
+def test_cleared_cells_are_spilled(tmp_path):
+    world = ChunkedMaze(2, chunk_size=4, capacity=4, directory=str(tmp_path), **CHESTS)
+    assert world.kind(1, 1) == CHEST
+    world.clear(1, 1)
+    for col in range(4, 40, 4):
+        world.kind(0, col)
+    assert (0, 0) not in world.chunks
+    assert world.spilled == 1 and (tmp_path / "0_0.chunk").exists()
+    assert world.kind(1, 1) == EMPTY and world.cell(1, 1) is None
+    assert not (tmp_path / "0_0.chunk").exists()
+    world.put(1, 1, None)
+    assert isinstance(world.cell(1, 1), TreasureChest)
+
+
+def test_game_walks_far_in_bounded_memory():
+    world = ChunkedMaze(3, chunk_size=8, capacity=4, **CHESTS)
+    engine = GameEngine(Warrior("Walker"), world, seed=3, undo_levels=2)
+    assert engine.step("up")[1] == [("blocked", "up")]
+    for turn in range(200):
+        engine.step("right" if turn % 2 else "down")
+    assert engine.hero_position == (100, 100)
+    assert len(world.chunks) == 4 and world.spilled > 0
+    assert engine.hero.coins > 0 and not engine.done
+    # Undo puts back a chest in a chunk that may have been evicted since
+    engine.step("undo")
+    assert isinstance(world.cell(100, 100), TreasureChest)
+    assert engine.hero_position == (100, 99)
+
+
+def test_long_walk_memory_is_bounded():
+    def walk(steps, undo_levels):
+        world = ChunkedMaze(3, chunk_size=8, capacity=4, **CHESTS)
+        engine = GameEngine(Warrior("Walker"), world, seed=3, undo_levels=undo_levels)
+        for turn in range(steps):
+            engine.step("right" if turn % 2 else "down")
+        return engine
+
+    def held(steps, undo_levels):
+        """Return the memory allocated by a walk and still held at its end."""
+        tracemalloc.start()
+        try:
+            engine = walk(steps, undo_levels)
+            return tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+    # Untraced, this sets up what later walks reuse, down to the free lists of tuples
+    walk(2500, 3)
+    for undo_levels in (0, 3):
+        short, long = held(300, undo_levels), held(1500, undo_levels)
+        # Every step opens a chest, so a history of every change would take some 300 kB more
+        assert long - short < 50_000
+
+
+def test_copy_is_independent():
+    world = ChunkedMaze(4, chunk_size=4, capacity=4, **CHESTS)
+    world.clear(0, 1)
+    for col in range(4, 40, 4):
+        world.clear(0, col)
+    twin = world.copy()
+    assert twin.directory != world.directory
+    twin.put(0, 1, None)
+    world.clear(2, 2)
+    assert world.kind(0, 1) == EMPTY and twin.kind(0, 1) == CHEST
+    assert twin.kind(2, 2) == CHEST
+    assert [twin.kind(0, col) for col in range(4, 40, 4)] == [EMPTY] * 9
+
+
+def test_endless_game_replays(capsys):
+    file = io.BytesIO()
+    log = ReplayWriter(file)
+    game = Game(Archer("Far"), seed=9, log=log, endless=True)
+    assert isinstance(game.grid, ChunkedMaze)
+    for action in ("right", "down", "leave") * 30:
+        game.step(action)
+    log.flush()
+    replay = parse(file.getvalue())
+    assert replay.endless
+    replayed = replay.play()
+    assert replayed.observation() == game.observation()
+    with pytest.raises(ValueError):
+        Game(Archer("Far"), grid=[[None]], endless=True)
+
+
+def test_invalid_options():
+    with pytest.raises(ValueError):
+        ChunkedMaze(chunk_size=512)
+    with pytest.raises(ValueError):
+        ChunkedMaze(capacity=2)
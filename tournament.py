@@ -0,0 +1,176 @@
+"""
+tournament.py
+
+This module plays many complete games in parallel to measure class balance.
+
+Games are split into chunks and each chunk is played by a worker process, which
+sends back one small table of totals per chunk instead of one result per game.
+Totals are kept per hero class and per maze seed and merged as chunks finish.
+
+Usage:
+    python tournament.py [games] [maze size] [number of maze seeds] [policy]
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+import sys
+
+from game_model import HERO_CLASSES
+from game_engine import GameEngine, TurnScheduler
+from maze import generate_maze
+from policies import POLICIES
+from rng import GameRNG
+
+# Hero classes by the name games are listed with
+HERO_CLASSES_BY_NAME = {cls.__name__: cls for cls in HERO_CLASSES}
+
+# Columns of a results row
+RESULT_FIELDS = ("games", "won", "lost", "timeout", "turns", "coins")
+
+# Mazes built by this process, by (size, seed)
+_mazes = {}
+
+
+def get_maze(size, seed):
+    """Return the shared maze template for a size and seed, building it once per process."""
+    maze = _mazes.get((size, seed))
+    if maze is None:
+        maze = _mazes[(size, seed)] = generate_maze(size, size, seed=seed)
+    return maze
+
+
+def play_game(hero_class, maze, policy, seed, max_turns):
+    """Play one complete game with a bot.
+
+    Args:
+        hero_class (str): A key of HERO_CLASSES_BY_NAME
+        maze (Maze): The maze template
+        policy (str): A key of policies.POLICIES
+        seed (int): Seed for the game and the bot
+        max_turns (int): Turns after which an unfinished game counts as a timeout
+
+    Returns:
+        GameEngine: The finished (or timed out) game
+    """
+    engine = GameEngine(HERO_CLASSES_BY_NAME[hero_class](hero_class), maze, seed=seed)
+    bot = POLICIES[policy](engine.rng.stream("policy"))
+    TurnScheduler(engine, bot).run(max_ticks=max_turns)
+    return engine
+
+
+def play_chunk(games, size, policy, max_turns):
+    """Play a chunk of games and total up their results.
+
+    Args:
+        games (list): (hero class, maze seed, game seed) for each game
+        size (int): Width and height of the mazes
+        policy (str): A key of policies.POLICIES
+        max_turns (int): Turn limit of each game
+
+    Returns:
+        dict: (hero class, maze seed) -> list of totals in RESULT_FIELDS order
+    """
+    totals = {}
+    for hero_class, maze_seed, game_seed in games:
+        engine = play_game(hero_class, get_maze(size, maze_seed), policy, game_seed, max_turns)
+        row = totals.setdefault((hero_class, maze_seed), [0] * len(RESULT_FIELDS))
+        row[0] += 1
+        if engine.outcome == "won":
+            row[1] += 1
+        elif engine.outcome == "lost":
+            row[2] += 1
+        else:
+            row[3] += 1
+        row[4] += engine.turns
+        row[5] += engine.hero.coins
+    return totals
+
+
+def schedule(games, maze_seeds, seed):
+    """List every game to play, cycling through the classes and maze seeds.
+
+    Returns:
+        list: (hero class, maze seed, game seed) for each game
+    """
+    rng = GameRNG(seed)
+    classes = list(HERO_CLASSES_BY_NAME)
+    return [(classes[i % len(classes)], maze_seeds[(i // len(classes)) % len(maze_seeds)],
+             rng.seed_for("game", i))
+            for i in range(games)]
+
+
+def merge(totals, chunk):
+    """Add the totals of one chunk into the running totals."""
+    for key, row in chunk.items():
+        mine = totals.setdefault(key, [0] * len(RESULT_FIELDS))
+        for index, value in enumerate(row):
+            mine[index] += value
+    return totals
+
+
+def iter_tournament(games, size=10, maze_seeds=(0,), policy="greedy", seed=0,
+                    max_turns=1000, workers=None, chunk_size=250):
+    """Play a tournament, yielding the running totals as each chunk finishes.
+
+    Args:
+        games (int): Number of games to play
+        size (int): Width and height of the mazes
+        maze_seeds (tuple): Seeds of the mazes to play on
+        policy (str): A key of policies.POLICIES
+        seed (int): Seed of the tournament, which fixes every game's seed
+        max_turns (int): Turn limit of each game
+        workers (int): Number of worker processes. Defaults to one per CPU.
+        chunk_size (int): Number of games per chunk
+
+    Yields:
+        dict: (hero class, maze seed) -> totals, after each chunk
+    """
+    plan = schedule(games, list(maze_seeds), seed)
+    chunks = [plan[start:start + chunk_size] for start in range(0, len(plan), chunk_size)]
+    totals = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(play_chunk, chunk, size, policy, max_turns) for chunk in chunks]
+        for future in as_completed(futures):
+            yield merge(totals, future.result())
+
+
+def run_tournament(games, **options):
+    """Play a tournament and return the final totals. Takes the options of iter_tournament."""
+    totals = {}
+    for totals in iter_tournament(games, **options):
+        pass
+    return totals
+
+
+def summarise(totals):
+    """Combine per-maze totals into per-class statistics.
+
+    Returns:
+        dict: hero class -> dict of games, win_rate, loss_rate, timeout_rate,
+            mean_turns and mean_coins
+    """
+    by_class = {}
+    for (hero_class, _), row in totals.items():
+        merge(by_class, {hero_class: row})
+    summary = {}
+    for hero_class, (played, won, lost, timeout, turns, coins) in sorted(by_class.items()):
+        summary[hero_class] = {
+            "games": played,
+            "win_rate": won / played,
+            "loss_rate": lost / played,
+            "timeout_rate": timeout / played,
+            "mean_turns": turns / played,
+            "mean_coins": coins / played,
+        }
+    return summary
+
+
+if __name__ == "__main__":
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    seeds = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    policy = sys.argv[4] if len(sys.argv) > 4 else "greedy"
+    totals = run_tournament(games, size=size, maze_seeds=tuple(range(seeds)), policy=policy)
+    for hero_class, stats in summarise(totals).items():
+        print(f"{hero_class:8} games {stats['games']:6}  win {stats['win_rate']:6.1%}  "
+              f"lost {stats['loss_rate']:6.1%}  timeout {stats['timeout_rate']:6.1%}  "
+              f"turns {stats['mean_turns']:7.1f}  coins {stats['mean_coins']:6.1f}")
@@ -0,0 +1,126 @@
+"""
+transposition.py
+
+This module lets search-based bots recognise game states they have seen before.
+
+A game state is fully described by the hero's position and stats, its coins and
+potions, the engine's mode and outcome, and which cells have been emptied. Many
+move orders lead to the same state, so a solver that remembers what it worked
+out for a state can reuse it instead of replaying fights and shopping again.
+
+The emptied cells are summarised by a Zobrist hash: every cell has a random
+64-bit key, and the hash is the XOR of the keys of the emptied cells. XOR does
+not care about order, and emptying one more cell updates the hash in O(1), so
+GameEngine keeps it up to date as it plays. The cell keys come from a hash of
+the cell's index rather than a table, so they cost no memory on large mazes.
+"""
+from collections import OrderedDict
+
+MASK = (1 << 64) - 1
+
+
+def cell_key(index) -> int:
+    """Return the random 64-bit Zobrist key of a cell, from its flat index.
+
+    This is the SplitMix64 output for the index, so keys are well mixed and the
+    same in every process.
+    """
+    z = ((index + 1) * 0x9E3779B97F4A7C15) & MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+    return z ^ (z >> 31)
+
+
+def state_key(engine) -> tuple:
+    """Return a hashable key for the state of a game.
+
+    Two games on the same maze with the same key are in the same state. Keys of
+    games on different mazes should not be compared.
+
+    Args:
+        engine (GameEngine): The game
+
+    Returns:
+        tuple: Zobrist hash of the emptied cells, then the position, mode,
+            outcome and the hero's health, stats, coins and potions
+    """
+    hero = engine.hero
+    return (engine.cleared_key, engine.hero_position, engine.mode, engine.outcome,
+            hero.health, hero.accuracy, hero.defence, hero.stealth, hero.coins, hero.potions)
+
+
+class TranspositionTable(object):
+    """A size-limited map from state keys to whatever a solver computed for them.
+
+    When full, storing a new state evicts the least recently used one.
+
+    Attributes:
+        capacity (int): Greatest number of states kept
+        hits (int): Lookups that found their state
+        misses (int): Lookups that did not
+        evictions (int): States dropped to make room
+    """
+
+    def __init__(self, capacity=100000):
+        if capacity < 1:
+            raise ValueError("A transposition table needs room for at least one state")
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Look up a state, counting a hit or a miss.
+
+        Args:
+            key (tuple): A key from state_key
+            default: Returned if the state is not in the table
+
+        Returns:
+            The stored value, or default
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store the value for a state, evicting the least recently used state if full."""
+        entries = self._entries
+        if key in entries:
+            entries.move_to_end(key)
+        elif len(entries) >= self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+        entries[key] = value
+
+    def clear(self):
+        """Forget every state. The counters are kept."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return the table's size and counters.
+
+        Returns:
+            dict: size, capacity, hits, misses, hit_rate and evictions
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
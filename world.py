@@ -0,0 +1,177 @@
+"""
+world.py
+
+This module provides the endless maze, built from chunks generated on demand.
+
+The world is cut into square chunks of CHUNK_SIZE cells. Each chunk is a small
+maze.Maze generated from the world seed and the chunk's coordinates, so a chunk
+comes out the same every time it is generated, and is played on its own
+MazeView, which records the cells the game has cleared in it.
+
+Only the chunks used last are kept in memory. When there are more than
+`capacity`, the least recently used one is evicted: an untouched chunk is simply
+dropped, to be generated again if the hero comes back, and a chunk with cleared
+cells is spilled to disk. Everything else in a chunk can be generated again, so
+only its cleared cells are written. Memory stays the same however far the hero
+walks; the spill files grow with the number of chunks the hero has changed.
+
+The world starts at (0, 0) and stretches WORLD_SIZE cells down and to the right,
+far beyond anything a game can walk, so its goal is never reached.
+"""
+from collections import OrderedDict
+import os
+import shutil
+import tempfile
+import weakref
+
+import numpy as np
+
+from maze import generate_maze
+from rng import as_game_rng
+
+# Cells along each side of a chunk. Spill files store cells as uint16, so at most 256.
+CHUNK_SIZE = 64
+
+# Chunks kept in memory. The hero can see at most 4 at once.
+CHUNK_CAPACITY = 64
+
+# Cells along each side of the world
+WORLD_SIZE = 1 << 32
+
+
+class ChunkedMaze(object):
+    """An endless maze for GameEngine, generated and evicted one chunk at a time.
+
+    Provides the grid interface GameEngine plays on: rows, cols, cell(), clear(),
+    put() and copy().
+
+    Attributes:
+        rng (GameRNG): The world's random streams; each chunk gets a child
+        chunk_size (int): Cells along each side of a chunk
+        capacity (int): Chunks kept in memory
+        densities (dict): Options passed on to maze.generate_maze for each chunk
+        rows (int): Number of rows, WORLD_SIZE
+        cols (int): Number of columns, WORLD_SIZE
+        chunks (OrderedDict): (chunk row, chunk col) -> MazeView of the chunks in
+            memory, least recently used first
+        directory (str): Where changed chunks are spilled, None until the first spill
+        generated (int): Number of chunks generated so far
+        spilled (int): Number of chunks spilled to disk so far
+    """
+
+    def __init__(self, seed=None, chunk_size=CHUNK_SIZE, capacity=CHUNK_CAPACITY, directory=None, **densities):
+        """Create a world. No chunk is generated until a cell is looked at.
+
+        Args:
+            seed (int): Seed, or a rng.GameRNG, for the whole world
+            chunk_size (int): Cells along each side of a chunk, from 2 to 256
+            capacity (int): Chunks kept in memory, at least 4
+            directory (str): Where to spill changed chunks. Defaults to a temporary
+                directory, removed with the world.
+            **densities: monster_density, chest_density, ... for generate_maze
+        """
+        if not 2 <= chunk_size <= 256:
+            raise ValueError("Chunks must have 2 to 256 cells along each side")
+        if capacity < 4:
+            raise ValueError("At least 4 chunks must fit in memory")
+        self.rng = as_game_rng(seed)
+        self.chunk_size = chunk_size
+        self.capacity = capacity
+        self.densities = densities
+        self.rows = self.cols = WORLD_SIZE
+        self.chunks = OrderedDict()
+        self.directory = directory
+        self.generated = 0
+        self.spilled = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def chunk(self, row, col):
+        """Return the view of the chunk holding a cell, loading it if needed.
+
+        Returns:
+            tuple: (MazeView, row in the chunk, column in the chunk)
+        """
+        key = (row // self.chunk_size, col // self.chunk_size)
+        chunks = self.chunks
+        view = chunks.get(key)
+        if view is None:
+            view = chunks[key] = self.load(key)
+            while len(chunks) > self.capacity:
+                self.evict(*chunks.popitem(last=False))
+        else:
+            chunks.move_to_end(key)
+        return view, row % self.chunk_size, col % self.chunk_size
+
+    def load(self, key):
+        """Generate a chunk, then clear the cells saved in its spill file, if any.
+
+        Args:
+            key (tuple): (chunk row, chunk col)
+
+        Returns:
+            MazeView: The chunk
+        """
+        template = generate_maze(self.chunk_size, self.chunk_size, seed=self.rng.child("chunk", *key),
+                                 **self.densities)
+        self.generated += 1
+        view = template.session()
+        path = self.spill_path(key)
+        if path is not None and os.path.exists(path):
+            view.cleared = set(np.fromfile(path, dtype="<u2").tolist())
+            # The chunk in memory is the only copy again until it is next evicted
+            os.remove(path)
+        return view
+
+    def evict(self, key, view):
+        """Drop a chunk from memory, spilling it to disk if the game changed it."""
+        if not view.cleared:
+            return
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="maze-chunks-")
+            weakref.finalize(self, shutil.rmtree, self.directory, ignore_errors=True)
+        np.array(sorted(view.cleared), dtype="<u2").tofile(self.spill_path(key))
+        self.spilled += 1
+
+    def spill_path(self, key):
+        """Return the spill file of a chunk, or None if nothing was ever spilled."""
+        if self.directory is None:
+            return None
+        return os.path.join(self.directory, f"{key[0]}_{key[1]}.chunk")
+
+    def kind(self, row, col) -> int:
+        """Return the kind of a cell (maze.EMPTY, MONSTER, ...)."""
+        view, row, col = self.chunk(row, col)
+        return view.kind(row, col)
+
+    def cell(self, row, col):
+        """Return a game object for a cell, or None if it is empty."""
+        view, row, col = self.chunk(row, col)
+        return view.cell(row, col)
+
+    def clear(self, row, col):
+        """Empty a cell."""
+        view, row, col = self.chunk(row, col)
+        view.clear(row, col)
+
+    def put(self, row, col, cell):
+        """Undo clearing a cell. The cell gets back its generated contents."""
+        view, row, col = self.chunk(row, col)
+        view.put(row, col, cell)
+
+    def copy(self):
+        """Return an independent world with the same cells cleared.
+
+        The chunks in memory are copied, and so are any spill files, into a new
+        temporary directory.
+        """
+        world = ChunkedMaze(self.rng, self.chunk_size, self.capacity, **self.densities)
+        world.chunks = OrderedDict((key, view.copy()) for key, view in self.chunks.items())
+        if self.directory is not None:
+            names = [name for name in os.listdir(self.directory) if name.endswith(".chunk")]
+            if names:
+                world.directory = tempfile.mkdtemp(prefix="maze-chunks-")
+                weakref.finalize(world, shutil.rmtree, world.directory, ignore_errors=True)
+                for name in names:
+                    shutil.copyfile(os.path.join(self.directory, name), os.path.join(world.directory, name))
+        return world